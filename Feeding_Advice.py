@@ -1,84 +1,117 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from google.cloud import translate_v2 as translate
 from dotenv import load_dotenv
+import argparse
+import contextlib
+import csv
+import importlib.util
+import io
 import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple
+from breed_repository import BREED_NAMES_EN, BREEDS_CSV, CSV_COLUMNS
+from translation_memory import TranslationMemory
+from http_cache import ConditionalHttpCache
 
+# petmd 品種頁面的網址前綴（測試時可指向本機 HTTP 伺服器）
+PETMD_BREEDS_URL = "https://www.petmd.com/dog/breeds/"
 
-# 中文轉英文的字典
+# 有安裝 lxml 時使用較快的 lxml 解析器
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"}
+
+# petmd 頁面的 HTTP 回應快取目錄；互動查詢與批次匯入共用同一個有條件式請求的快取
+PETMD_CACHE_DIR = os.getenv('PETMD_CACHE_DIR', '.petmd_cache')
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+# Google 翻譯 API 客戶端與翻譯記憶（由 main / ingest 的命令列入口建立）
+translate_client = None
+translation_memory = None
+
+
+# 中文品種名稱轉英文（對照表見 breed_repository.BREED_NAMES_EN）
 def translate_breed_to_english(breed_input):
-    breed_dict = {
-        "吉娃娃": "Chihuahua",
-        "博美犬": "Pomeranian",
-        "約克夏": "Yorkshire Terrier",
-        "西施犬": "Shih Tzu",
-        "馬爾濟斯": "Maltese",
-        "臘腸犬": "Dachshund",
-        "玩具貴賓犬": "Toy Poodle",
-        "巨型貴賓犬": "Standard Poodle",
-        "柴犬": "Shiba Inu",
-        "雪納瑞": "Miniature Schnauzer",
-        "拉布拉多": "Labrador Retriever",
-        "黃金獵犬": "Golden Retriever",
-        "法國鬥牛犬": "French Bulldog",
-        "比熊犬": "Bichon Frise",
-        "西高地白梗": "West Highland White Terrier",
-        "柯基": "Pembroke Welsh Corgi",
-        "哈士奇": "Siberian Husky",
-        "薩摩耶": "Samoyed",
-        "杜賓犬": "Doberman Pinscher",
-        "大丹犬": "Great Dane",
-        "羅威納": "Rottweiler",
-        "鬆獅犬": "Chow Chow",
-        "米格魯": "Beagle",
-        "邊境牧羊犬": "Border Collie",
-    }
-    
-    breed_in_english = breed_dict.get(breed_input)
+    breed_in_english = BREED_NAMES_EN.get(breed_input)
     return breed_in_english if breed_in_english else "未找到對應的英文品種名稱"
 
 
-# 爬取品種資訊
-def fetch_breed_info(breed_input):
+# 品種頁面的網址
+def breed_url(breed_in_english, base_url=PETMD_BREEDS_URL):
+    return f"{base_url.rstrip('/')}/{breed_in_english.lower().replace(' ', '-')}"
+
+
+# 取得共用的 ConditionalHttpCache（第一次呼叫時以傳入的設定建立）
+def get_http_cache(per_host_limit=4, pool_size=10):
+    global _http_cache
+    with _http_cache_lock:
+        if _http_cache is None:
+            _http_cache = ConditionalHttpCache(PETMD_CACHE_DIR, per_host_limit=per_host_limit, pool_size=pool_size)
+        return _http_cache
+
+
+# 下載品種頁面（session 預設為共用的 ConditionalHttpCache），失敗時返回 None
+def fetch_breed_page(breed_input, base_url=PETMD_BREEDS_URL, session=None, verbose=True):
     breed_in_english = translate_breed_to_english(breed_input)
-    
+
     if breed_in_english == "未找到對應的英文品種名稱":
         print("未找到該品種的資訊，請確認品種名稱是否正確。")
         return None
-    
-    breed_in_english_url = breed_in_english.lower().replace(" ", "-")
-    url = f"https://www.petmd.com/dog/breeds/{breed_in_english_url}"
-    print(f"發送請求到: {url}")
 
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"}
+    url = breed_url(breed_in_english, base_url)
+    if verbose:
+        print(f"發送請求到: {url}")
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = (session or get_http_cache()).get(url, headers=HEADERS, timeout=10)
         if response.status_code == 200:
-            print(f"請求成功，狀態碼: {response.status_code}")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            return soup
+            if verbose:
+                print(f"請求成功，狀態碼: {response.status_code}")
+            return response
         else:
-            print(f"請求失敗，狀態碼: {response.status_code}")
+            print(f"請求失敗，狀態碼: {response.status_code}（{url}）")
             return None
     except requests.exceptions.Timeout:
-        print("請求超時！")
+        print(f"請求超時！（{url}）")
         return None
     except requests.exceptions.RequestException as e:
         print(f"請求錯誤：{e}")
         return None
 
 
-# 翻譯文本為繁體中文
+# 爬取品種資訊
+def fetch_breed_info(breed_input, base_url=PETMD_BREEDS_URL, session=None, verbose=True):
+    response = fetch_breed_page(breed_input, base_url, session, verbose)
+    if response is None:
+        return None
+    return BeautifulSoup(response.text, 'html.parser')
+
+
+# 翻譯文本為繁體中文（有翻譯記憶時先查表）
 def translate_text_to_chinese(text):
+    if text and translation_memory is not None:
+        return translation_memory.translate(text)
     if text:
         result = translate_client.translate(text, target_language='zh-TW')
         return result['translatedText']
     return text
 
 
-# 處理 "What To Feed" 的資訊並翻譯
+# 取出段落文字（移除換行與不換行空白）
+def _paragraph_text(tag):
+    return tag.get_text(strip=False).replace('\n', ' ').strip().replace('\u00A0', ' ')
+
+
+def _list_items(tag):
+    return [li.get_text(strip=True).replace('\u00A0', ' ') for li in tag.find_all('li')]
+
+
+# 取出 "What To Feed" 的段落（英文原文）
 def get_what_to_feed_info(soup):
     if not soup:
         print("沒有有效的頁面內容，無法繼續處理。")
@@ -86,61 +119,53 @@ def get_what_to_feed_info(soup):
 
     # 使用正則表達式進行匹配
     whattofeed_title = soup.find('h2', string=re.compile(r'What\s*To\s*Feed', re.IGNORECASE))
-    
-    if whattofeed_title:
-        #print("\n標題:", translate_text_to_chinese(whattofeed_title.get_text(strip=False)))
 
+    if whattofeed_title:
         paragraphs = []
         current_tag = whattofeed_title.find_next_sibling()
 
         while current_tag and current_tag.name != 'h3':
             if current_tag.name == 'p':
-                paragraph_text = current_tag.get_text(strip=False).replace('\n', ' ').strip()
-                paragraph_text = paragraph_text.replace('\u00A0', ' ')
-                paragraphs.append(translate_text_to_chinese(paragraph_text))
+                paragraphs.append(_paragraph_text(current_tag))
             elif current_tag.name == 'ul':
-                list_items = [translate_text_to_chinese(li.get_text(strip=True).replace('\u00A0', ' ')) for li in current_tag.find_all('li')]
-                paragraphs.extend(list_items)
+                paragraphs.extend(_list_items(current_tag))
             current_tag = current_tag.find_next_sibling()
 
-        if paragraphs:
-            for paragraph in paragraphs:
-                print(paragraph)
-        else:
+        if not paragraphs:
             print("未提取到任何段落內容。")
+        return paragraphs
     else:
         print("未找到包含 'What To Feed' 的 <h2> 標籤")
+        return []
 
 
-# 處理 "How To Feed" 的資訊並翻譯
+# 取出 "How To Feed" 的段落（英文原文）
 def get_how_to_feed_info(soup):
     if not soup:
         print("沒有有效的頁面內容，無法繼續處理。")
         return None
 
     h3_title = soup.find('h3', string=re.compile(r'How\s*To\s*Feed', re.IGNORECASE))
-    
+
     if h3_title:
-        #print("\n標題:", translate_text_to_chinese(h3_title.get_text(strip=False)))
+        paragraphs = []
         current_tag = h3_title.find_next_sibling()
 
         while current_tag:
             if current_tag.name == 'p':
-                paragraph_text = current_tag.get_text(strip=False).replace('\n', ' ').strip()
-                paragraph_text = paragraph_text.replace('\u00A0', ' ')
-                print(translate_text_to_chinese(paragraph_text))
+                paragraphs.append(_paragraph_text(current_tag))
             elif current_tag.name == 'ul':
-                list_items = [translate_text_to_chinese(li.get_text(strip=True).replace('\u00A0', ' ')) for li in current_tag.find_all('li')]
-                for item in list_items:
-                    print(item)
+                paragraphs.extend(_list_items(current_tag))
             elif current_tag.name == 'h3':
                 break
             current_tag = current_tag.find_next_sibling()
+        return paragraphs
     else:
         print("未找到 'How To Feed' 相關的 <h3> 標籤，繼續處理後續內容。")
+        return []
 
 
-# 處理 "Nutritional Tips" 的資訊並翻譯
+# 取出 "Nutritional Tips" 的段落（英文原文）
 def get_nutritional_tips_info(soup):
     if not soup:
         print("沒有有效的頁面內容，無法繼續處理。")
@@ -149,49 +174,372 @@ def get_nutritional_tips_info(soup):
     h3_title = soup.find('h3', string=lambda x: x and 'Nutritional Tips' in x)
 
     if h3_title:
-        #print("\n標題:", translate_text_to_chinese(h3_title.get_text(strip=False)))
-
+        paragraphs = []
         current_tag = h3_title.find_next_sibling()
 
         while current_tag:
             if current_tag.name == 'p':
-                paragraph_text = current_tag.get_text(strip=False).replace('\n', ' ').strip()
-                paragraph_text = paragraph_text.replace('\u00A0', ' ')
-                print(translate_text_to_chinese(paragraph_text))
+                paragraphs.append(_paragraph_text(current_tag))
             elif current_tag.name == 'ul':
-                list_items = [translate_text_to_chinese(li.get_text(strip=True).replace('\u00A0', ' ')) for li in current_tag.find_all('li')]
-                for item in list_items:
-                    print(item)
+                paragraphs.extend(_list_items(current_tag))
             elif current_tag.name == 'h3':
                 break
             current_tag = current_tag.find_next_sibling()
+        return paragraphs
     else:
         print("未找到 'Nutritional Tips' 相關的標籤")
+        return []
+
+
+# dog_breeds.csv 欄位 -> 取出該段落的函數
+SECTIONS = {
+    'what_to_feed': get_what_to_feed_info,
+    'how_to_feed': get_how_to_feed_info,
+    'nutritional_tips': get_nutritional_tips_info,
+}
+
+
+# 取出三個段落（英文原文），返回 {欄位: [段落, ...]}
+def extract_sections(soup):
+    return {column: get_section(soup) or [] for column, get_section in SECTIONS.items()}
+
+
+# ---- 單次走訪的段落擷取 ----
+
+class SectionItem(NamedTuple):
+    """段落中的一項：kind 為 'paragraph'（<p>）或 'list_item'（<li>）"""
+    kind: str
+    text: str
+
+
+class BreedSections(NamedTuple):
+    """品種頁面的三個段落（英文原文）"""
+    what_to_feed: tuple
+    how_to_feed: tuple
+    nutritional_tips: tuple
+
+    def texts(self):
+        """轉成與 extract_sections 相同的 {欄位: [文字, ...]}"""
+        return {column: [item.text for item in items] for column, items in self._asdict().items()}
+
+
+# 各段落的標題：(欄位, 標籤, 比對標題文字的正規表示式)
+SECTION_HEADINGS = (
+    ('what_to_feed', 'h2', re.compile(r'What\s*To\s*Feed', re.IGNORECASE)),
+    ('how_to_feed', 'h3', re.compile(r'How\s*To\s*Feed', re.IGNORECASE)),
+    ('nutritional_tips', 'h3', re.compile(r'Nutritional Tips')),
+)
+
+# 先只解析 <article>；頁面沒有 <article>（或標題不在其中）時才解析整頁
+ARTICLE_CONTAINER = SoupStrainer('article')
+
+
+def _article_container(html, parser):
+    """返回 "What To Feed" 標題所在的容器元素，找不到時返回 None"""
+    _, heading, pattern = SECTION_HEADINGS[0]
+    for parse_only in (ARTICLE_CONTAINER, None):
+        soup = BeautifulSoup(html, parser, parse_only=parse_only)
+        title = soup.find(lambda tag: tag.name == heading and pattern.search(tag.get_text()))
+        if title is not None:
+            return title.parent
+    return None
+
+
+def extract_breed_sections(html, parser=None):
+    """
+    只走訪一次文章容器的直接子元素，取出三個段落
+    容器外（導覽列、頁尾）與巢狀在其他元素中的 <p> 都不會被收進段落。
+    參數:
+        html (str): 品種頁面 HTML
+        parser (str): BeautifulSoup 解析器（預設為 HTML_PARSER）
+    返回:
+        BreedSections: 各段落的 SectionItem；任何 h2 / h3 標題或容器結尾都會結束目前的段落
+    """
+    items = {column: [] for column, _, _ in SECTION_HEADINGS}
+    container = _article_container(html, parser or HTML_PARSER)
+    found = set()
+    current = None
+    for tag in container.find_all(['h2', 'h3', 'p', 'ul'], recursive=False) if container is not None else ():
+        if tag.name in ('h2', 'h3'):
+            if current is not None and len(found) == len(SECTION_HEADINGS):
+                break  # 三個段落都取完了
+            current = None
+            title = tag.get_text()
+            for column, heading, pattern in SECTION_HEADINGS:
+                if tag.name == heading and column not in found and pattern.search(title):
+                    current = column
+                    found.add(column)
+                    break
+        elif current is None:
+            continue
+        elif tag.name == 'p':
+            items[current].append(SectionItem('paragraph', _paragraph_text(tag)))
+        else:
+            items[current].extend(SectionItem('list_item', text) for text in _list_items(tag))
+    return BreedSections(**{column: tuple(values) for column, values in items.items()})
+
+
+def benchmark_extractors(pages_dir, rounds=10):
+    """
+    以存檔的品種頁面比較三次走訪（get_*_info）與單次走訪（extract_breed_sections）
+    返回:
+        dict: 頁面數、兩種方式每頁平均毫秒數，以及結果不同的頁面
+    """
+    pages = {}
+    for name in sorted(os.listdir(pages_dir)):
+        with open(os.path.join(pages_dir, name), 'r', encoding='utf-8') as f:
+            pages[name] = f.read()
+
+    # 舊的擷取函數找不到標題時會 print，量測時略過這些輸出
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            baseline = {name: extract_sections(BeautifulSoup(html, 'html.parser')) for name, html in pages.items()}
+        three_pass = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        single = {name: extract_breed_sections(html).texts() for name, html in pages.items()}
+    single_pass = time.perf_counter() - start
+
+    runs = max(len(pages) * rounds, 1)
+    return {
+        'pages': len(pages),
+        'parser': HTML_PARSER,
+        'three_pass_ms': round(three_pass / runs * 1000, 3),
+        'single_pass_ms': round(single_pass / runs * 1000, 3),
+        'mismatched_pages': [name for name in pages if baseline[name] != single[name]],
+    }
+
+
+# 翻譯 extract_sections 的結果；有翻譯記憶時整個品種的段落一次查表，未命中的合併成批次請求
+def translate_sections(sections, translator=None):
+    translator = translator or translation_memory
+    if translator is None:
+        return {column: [translate_text_to_chinese(paragraph) for paragraph in paragraphs] for column, paragraphs in sections.items()}
+    translated = iter(translator.translate_many([paragraph for paragraphs in sections.values() for paragraph in paragraphs]))
+    return {column: [next(translated) for _ in paragraphs] for column, paragraphs in sections.items()}
+
+
+# ---- 批次匯入：平行抓取所有品種並更新 dog_breeds.csv ----
+
+class StageTimer:
+    """累計各階段（fetch / parse / translate / write）的耗時"""
+
+    STAGES = ('fetch', 'parse', 'translate', 'write')
+
+    def __init__(self):
+        self.totals = dict.fromkeys(self.STAGES, 0.0)
+        self.max = dict.fromkeys(self.STAGES, 0.0)
+
+    def add(self, stage, seconds):
+        self.totals[stage] += seconds
+        self.max[stage] = max(self.max[stage], seconds)
+
+    def summary(self):
+        return {stage: {'total_seconds': round(self.totals[stage], 3), 'max_seconds': round(self.max[stage], 3)}
+                for stage in self.STAGES}
+
+
+# _ingest_one 的結果：頁面未變動（304）且 dog_breeds.csv 已有內容，不需重新解析與翻譯
+UNCHANGED = 'unchanged'
+
 
+def _ingest_one(breed, base_url, fetcher, translator, existing):
+    timings = {}
+    start = time.perf_counter()
+    response = fetch_breed_page(breed, base_url=base_url, session=fetcher, verbose=False)
+    timings['fetch'] = time.perf_counter() - start
+    if response is None:
+        return breed, None, timings
+    if getattr(response, 'not_modified', False) and breed in existing:
+        return breed, UNCHANGED, timings
+
+    start = time.perf_counter()
+    sections = extract_breed_sections(response.text).texts()
+    timings['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if translator is not False:
+        sections = translate_sections(sections, translator)
+    timings['translate'] = time.perf_counter() - start
+    return breed, sections, timings
+
+
+def upsert_breed_rows(csv_path, updates):
+    """
+    更新或新增 dog_breeds.csv 的列後以原子替換寫回（讀取端不會看到寫到一半的檔案）
+    參數:
+        updates (dict): {breed_name: {欄位: 值}}
+    """
+    rows = []
+    if os.path.exists(csv_path):
+        with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            fieldnames = reader.fieldnames or list(CSV_COLUMNS)
+            rows = list(reader)
+    else:
+        fieldnames = list(CSV_COLUMNS)
+    by_name = {row['breed_name']: row for row in rows}
+    next_id = max((int(row['id']) for row in rows if str(row.get('id', '')).isdigit()), default=0) + 1
+    for breed_name, values in updates.items():
+        row = by_name.get(breed_name)
+        if row is None:
+            row = dict.fromkeys(fieldnames, '')
+            row.update(id=str(next_id), breed_name=breed_name)
+            next_id += 1
+            rows.append(row)
+            by_name[breed_name] = row
+        row.update(values)
+
+    tmp_path = csv_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_ALL, lineterminator='\r\n')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, csv_path)
+
+
+# dog_breeds.csv 中三個段落都有內容的品種
+def _breeds_with_content(csv_path):
+    if not os.path.exists(csv_path):
+        return set()
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        return {row['breed_name'] for row in csv.DictReader(f) if all(row.get(column) for column in SECTIONS)}
+
+
+def ingest_breeds(breeds=None, csv_path=BREEDS_CSV, base_url=PETMD_BREEDS_URL, max_workers=4, translator=None,
+                  cache_dir=None, per_host_limit=4, force=False):
+    """
+    以最多 max_workers 個執行緒平行抓取、解析並翻譯各品種頁面，
+    每完成一個品種就更新 dog_breeds.csv 中該品種的 what_to_feed / how_to_feed / nutritional_tips
+    頁面以條件式請求抓取，伺服器回 304 且該品種已有內容時跳過解析與翻譯。
+    參數:
+        breeds (list): 中文品種名稱（預設為所有有英文名稱的品種）
+        translator (TranslationMemory): 翻譯記憶（預設為模組的 translation_memory；False 表示保留英文原文）
+        cache_dir (str): HTTP 回應快取目錄（預設使用共用的快取，目錄為 PETMD_CACHE_DIR）
+        per_host_limit (int): 對同一個主機最多同時進行的請求數
+        force (bool): 頁面未變動也重新解析與翻譯
+    返回:
+        dict: 更新 / 未變動 / 失敗的品種、各階段耗時與總耗時
+    """
+    breeds = breeds or list(BREED_NAMES_EN)
+    existing = set() if force else _breeds_with_content(csv_path)
+    timer = StageTimer()
+    result = {'updated': [], 'unchanged': [], 'failed': []}
+    start = time.perf_counter()
+    if cache_dir is None:
+        fetcher = get_http_cache(per_host_limit=per_host_limit, pool_size=max_workers)
+    else:
+        fetcher = ConditionalHttpCache(cache_dir, per_host_limit=per_host_limit, pool_size=max_workers)
+    http_before = fetcher.stats()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="breed-ingest") as executor:
+            futures = {executor.submit(_ingest_one, breed, base_url, fetcher, translator, existing): breed for breed in breeds}
+            for future in as_completed(futures):
+                try:
+                    breed, sections, timings = future.result()
+                except Exception as e:
+                    print(f"處理 {futures[future]} 時發生錯誤：{e}")
+                    result['failed'].append(futures[future])
+                    continue
+                for stage, seconds in timings.items():
+                    timer.add(stage, seconds)
+                if sections == UNCHANGED:
+                    result['unchanged'].append(breed)
+                    continue
+                if not sections or not any(sections.values()):
+                    result['failed'].append(breed)
+                    continue
+                # 每個品種完成就寫入，中斷時已完成的品種不會遺失
+                write_start = time.perf_counter()
+                upsert_breed_rows(csv_path, {breed: {column: '\n'.join(paragraphs) for column, paragraphs in sections.items()}})
+                timer.add('write', time.perf_counter() - write_start)
+                result['updated'].append(breed)
+                print(f"已更新：{breed}")
+    finally:
+        if cache_dir is not None:
+            fetcher.close()
+    result['stages'] = timer.summary()
+    result['http'] = {key: value - http_before[key] for key, value in fetcher.stats().items()}
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    translator = translation_memory if translator is None else translator
+    if translator:
+        result['translation'] = translator.stats()
+    return result
 
 
 # 主程序
 def main():
     while True:
         breed_input = input("請輸入品種名稱：")
-        soup = fetch_breed_info(breed_input)
-        
-        if soup:
-            get_what_to_feed_info(soup)
-            get_how_to_feed_info(soup)
-            get_nutritional_tips_info(soup)
+        response = fetch_breed_page(breed_input)
+
+        if response:
+            for paragraphs in translate_sections(extract_breed_sections(response.text).texts()).values():
+                for paragraph in paragraphs:
+                    print(paragraph)
             break
         else:
             print("請重新輸入正確的品種名稱。\n")
 
 
+def ingest_main(argv=None):
+    parser = argparse.ArgumentParser(description="平行抓取 petmd 品種頁面並更新 dog_breeds.csv")
+    parser.add_argument('breeds', nargs='*', help="中文品種名稱（預設為全部）")
+    parser.add_argument('--csv', default=BREEDS_CSV, help="要更新的品種資料檔")
+    parser.add_argument('--base-url', default=PETMD_BREEDS_URL, help="品種頁面網址前綴（可指向本機測試伺服器）")
+    parser.add_argument('--workers', type=int, default=4, help="同時處理的品種數")
+    parser.add_argument('--no-translate', action='store_true', help="不翻譯，保留英文原文")
+    parser.add_argument('--cache-dir', default=None, help="HTTP 回應快取目錄（預設為 PETMD_CACHE_DIR）")
+    parser.add_argument('--per-host', type=int, default=4, help="對同一個主機最多同時進行的請求數")
+    parser.add_argument('--force', action='store_true', help="頁面未變動也重新解析與翻譯")
+    args = parser.parse_args(argv)
+    translator = False if args.no_translate else None
+    result = ingest_breeds(args.breeds, args.csv, args.base_url, args.workers, translator,
+                           cache_dir=args.cache_dir, per_host_limit=args.per_host, force=args.force)
+    print(f"更新 {len(result['updated'])} 個品種，未變動 {len(result['unchanged'])} 個，失敗 {len(result['failed'])} 個，耗時 {result['seconds']} 秒")
+    for stage, timing in result['stages'].items():
+        print(f"  {stage}: 累計 {timing['total_seconds']} 秒，單一品種最長 {timing['max_seconds']} 秒")
+    http = result['http']
+    print(f"  HTTP：{http['requests']} 次請求，304 {http['not_modified']} 次（省下 {http['bytes_saved']} 位元組），下載 {http['bytes_downloaded']} 位元組")
+    if 'translation' in result:
+        translation = result['translation']
+        print(f"  翻譯記憶：命中率 {translation['hit_rate']:.1%}（{translation['hits']}/{translation['hits'] + translation['misses']}），"
+              f"省下 {translation['saved_characters']} 字元，送出 {translation['api_calls']} 次請求共 {translation['translated_characters']} 字元")
+
+
+def benchmark_main(argv=None):
+    parser = argparse.ArgumentParser(description="比較三次走訪與單次走訪的段落擷取速度")
+    parser.add_argument('pages_dir', help="存檔的品種頁面目錄")
+    parser.add_argument('--rounds', type=int, default=10, help="每頁重複次數")
+    args = parser.parse_args(argv)
+    result = benchmark_extractors(args.pages_dir, args.rounds)
+    speedup = result['three_pass_ms'] / result['single_pass_ms'] if result['single_pass_ms'] else float('inf')
+    print(f"{result['pages']} 頁（解析器：{result['parser']}）")
+    print(f"三次走訪：每頁 {result['three_pass_ms']} 毫秒")
+    print(f"單次走訪：每頁 {result['single_pass_ms']} 毫秒，快 {speedup:.1f} 倍")
+    print(f"結果不同的頁面：{', '.join(result['mismatched_pages']) or '無'}")
+
 
 if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'benchmark':
+        benchmark_main(sys.argv[2:])
+        sys.exit(0)
+
     # 加載環境變數
     load_dotenv('information.env')
 
-    # Google 翻譯 API 客戶端
-    translate_client = translate.Client.from_service_account_json(os.getenv('GOOGLE_Translation_API_KEY'))
-
-    main()
+    # 「python Feeding_Advice.py ingest ...」為批次匯入，否則為互動查詢
+    ingest = len(sys.argv) > 1 and sys.argv[1] == 'ingest'
+    if not (ingest and '--no-translate' in sys.argv):
+        # Google 翻譯 API 客戶端；翻譯結果存在 SQLite 翻譯記憶中，重跑時不再重複付費
+        translate_client = translate.Client.from_service_account_json(os.getenv('GOOGLE_Translation_API_KEY'))
+        translation_memory = TranslationMemory(translate_client, db_path=os.getenv('TRANSLATION_MEMORY_DB', 'translation_memory.db'))
 
+    if ingest:
+        ingest_main(sys.argv[2:])
+    else:
+        main()
@@ -1,17 +1,28 @@
-from flask import Flask, request, abort, render_template, redirect, url_for
+from flask import Flask, request, abort, render_template, redirect, url_for, jsonify, Response, stream_with_context
 import os
-import logging
-import pandas as pd
-from linebot.v3 import WebhookHandler
+import bot_logging
 from linebot.v3.exceptions import InvalidSignatureError
-from linebot.v3.messaging import Configuration, ApiClient, MessagingApi, MessagingApiBlob, ReplyMessageRequest, TextMessage
+from linebot.v3.messaging import Configuration, ReplyMessageRequest, TextMessage
 from linebot.v3.webhooks import MessageEvent, TextMessageContent, ImageMessageContent
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 import daily_calories
 import packageOCR
 import dogdietyolo
 import petmap
+import data_transfer
+import daily_summary
+from breed_repository import BreedRepository
+from ocr_image import ImageOptions
+from ocr_cache import OcrResultCache
+from db_connections import connections
+from dog_storage import (init_db, get_all_dogs, get_dog_data, get_dog_targets, dog_exists, create_dog, save_dog_data,
+                         update_dog, delete_dog as delete_dog_data, record_intake, get_daily_record, get_intake_history,
+                         HISTORY_GRANULARITIES, RECORD_TZ, local_now, today, writer_stats)
+import state_store
+from conversation import ConversationEngine, STAY
+from line_client import LineApiClient
+from webhook_worker import DispatchingWebhookHandler, WebhookWorkerPool
 from dotenv import load_dotenv
 import re
 from linebot.v3.messaging import QuickReply, QuickReplyItem, CameraAction, CameraRollAction, MessageAction
@@ -23,11 +34,12 @@ import requests
 import json
 import time
 import threading
+import hmac
 
 app = Flask(__name__)
 
-# 設置日誌
-logging.basicConfig(level=logging.INFO)
+# 設置日誌（佇列式非同步寫入，JSON 格式，可依類別取樣）
+bot_logging.setup_logging()
 
 # 載入環境變數
 load_dotenv('information.env')
@@ -41,8 +53,42 @@ channel_secret = os.getenv('LINE_CHANNEL_SECRET')
 if not ACCESS_TOKEN or not channel_secret:
     raise ValueError("LINE_CHANNEL_ACCESS_TOKEN or LINE_CHANNEL_SECRET not found in environment variables.")
 
-configuration = Configuration(access_token=ACCESS_TOKEN)
-handler = WebhookHandler(channel_secret)
+bot_logging.add_secret(ACCESS_TOKEN)
+bot_logging.add_secret(channel_secret)
+
+# LINE_API_HOST 可指向本機的 LINE API 替身（測試用），未設定時使用正式的 api.line.me
+configuration = Configuration(access_token=ACCESS_TOKEN, host=os.getenv('LINE_API_HOST'))
+# 全程序共用的 LINE API 客戶端（保持連線、429/5xx 自動重試）
+line_client = LineApiClient(
+    configuration,
+    pool_size=int(os.getenv('LINE_POOL_SIZE', '10')),
+    max_retries=int(os.getenv('LINE_MAX_RETRIES', '3'))
+)
+handler = DispatchingWebhookHandler(channel_secret)
+
+# Webhook 處理模式：WEBHOOK_ASYNC=true 時驗證簽章後立即回覆 200，事件交由背景工作執行緒處理；
+# 關閉時仍由工作執行緒依使用者分組平行處理，但等全部處理完才回覆（處理失敗時回覆 500，LINE 會重送）
+WEBHOOK_ASYNC = os.getenv('WEBHOOK_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+webhook_pool = WebhookWorkerPool(
+    handler.dispatch,
+    num_workers=int(os.getenv('WEBHOOK_WORKERS', '4')),
+    max_queue_size=int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+)
+
+# 每日攝取摘要推播：設定 DAILY_SUMMARY_TIME（HH:MM，RECORD_TZ 的當地時間）才啟用；多程序部署時只在一個程序設定
+# 排程與紀錄日期使用同一個時區，摘要讀取的一定是使用者當天的紀錄
+DAILY_SUMMARY_TIME = os.getenv('DAILY_SUMMARY_TIME')
+summary_scheduler = None
+if DAILY_SUMMARY_TIME:
+    summary_scheduler = daily_summary.DailySummaryScheduler(
+        lambda date: daily_summary.run_daily_summary(
+            line_client, date,
+            checkpoint_path=os.getenv('DAILY_SUMMARY_CHECKPOINT', 'daily_summary_checkpoint.json'),
+            rps=float(os.getenv('DAILY_SUMMARY_RPS', '20'))
+        ),
+        at=DAILY_SUMMARY_TIME,
+        tz=RECORD_TZ
+    )
 
 # 全局初始化 Google Cloud Vision 客戶端
 google_api_key_path = os.getenv('GOOGLE_Translation_API_KEY')
@@ -51,24 +97,29 @@ if not google_api_key_path or not os.path.exists(google_api_key_path):
 credentials = service_account.Credentials.from_service_account_file(google_api_key_path)
 vision_client = vision.ImageAnnotatorClient(credentials=credentials)
 
-# 讀取 dog_breeds.csv 文件
-dog_breeds_df = pd.read_csv('dog_breeds.csv')
-breeds = dog_breeds_df['breed_name'].tolist()
-statuses = [
-    '正在發育的幼犬(4個月以下)', 
-    '正在發育的幼犬(4個月-1歲)', 
-    '結紮成年犬(1-7歲)', 
-    '未結紮成年犬(1-7歲)', 
-    '輕度減肥成年犬', 
-    '重度減肥成年犬', 
-    '過瘦成年犬', 
-    '輕度活動量', 
-    '劇烈活動量', 
-    '高齡犬', 
-    '懷孕中的狗媽媽', 
-    '哺乳中的狗媽媽', 
-    '生病成年犬'
-]
+# 包裝照片送進 Vision 前先縮小並重新編碼（OCR_MAX_SIDE=0 表示送出原始圖片）
+OCR_MAX_SIDE = int(os.getenv('OCR_MAX_SIDE', '1600'))
+ocr_image_options = ImageOptions(
+    max_side=OCR_MAX_SIDE,
+    quality=int(os.getenv('OCR_JPEG_QUALITY', '85')),
+    grayscale=os.getenv('OCR_GRAYSCALE', 'false').lower() in ('1', 'true', 'yes'),
+    enhance_contrast=os.getenv('OCR_ENHANCE_CONTRAST', 'false').lower() in ('1', 'true', 'yes')
+) if OCR_MAX_SIDE > 0 else None
+
+# 同一款包裝的照片以感知雜湊比對，命中時直接使用先前的辨識結果（OCR_CACHE_SIZE=0 表示停用）
+OCR_CACHE_SIZE = int(os.getenv('OCR_CACHE_SIZE', '2000'))
+ocr_cache = OcrResultCache(
+    db_path=os.getenv('OCR_CACHE_PATH', 'ocr_cache.db'),
+    capacity=OCR_CACHE_SIZE,
+    max_distance=int(os.getenv('OCR_CACHE_MAX_DISTANCE', '6')),
+    audit_rate=float(os.getenv('OCR_CACHE_AUDIT_RATE', '0.05'))
+) if OCR_CACHE_SIZE > 0 else None
+
+# 讀取 dog_breeds.csv 文件（以品種名稱為鍵，飲食建議文字已預先組好）
+# 背景執行緒每 BREEDS_RELOAD_INTERVAL 秒檢查檔案 mtime，有變動時載入新版本並整份替換
+breed_repository = BreedRepository('dog_breeds.csv', poll_interval=float(os.getenv('BREEDS_RELOAD_INTERVAL', '30')))
+breed_repository.start()
+statuses = daily_calories.STATUSES
 
 # 載入 YOLO 模型
 model_path = "best.pt"
@@ -91,8 +142,11 @@ welcome_message = """嗨嗨！我是你的寵物飲食小助手 🐾
 ----------------------
 隨時輸入「退出」回到這裡哦 🏠"""
 
-# 用於暫存用戶狀態
-user_states = {}
+# 用於暫存用戶狀態（STATE_STORE=memory 為單一程序的 LRU+TTL，sqlite 可跨 worker 共用）
+user_states = state_store.create_state_store()
+
+# 啟動時先將共用資料庫遷移到最新版本，之後每次呼叫 init_db 都不需再執行 SQL
+init_db()
 
 # 函數：從 ngrok API 獲取公開 URL
 def get_ngrok_url():
@@ -125,6 +179,19 @@ def update_base_url_periodically():
 # 啟動背景執行緒來定時更新 global_base_url
 threading.Thread(target=update_base_url_periodically, daemon=True).start()
 
+# 管理用端點需在 X-Admin-Token 標頭帶入 ADMIN_TOKEN（未設定時一律拒絕）
+def is_admin_request():
+    admin_token = os.getenv('ADMIN_TOKEN')
+    return bool(admin_token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token)
+
+# 管理端點：重新載入 dog_breeds.csv（在背景執行緒解析，完成後整份替換）
+@app.route('/admin/reload_breeds', methods=['POST'])
+def reload_breeds():
+    if not is_admin_request():
+        return "重新載入品種資料需要管理權限", 403
+    breed_repository.request_reload()
+    return jsonify(dict(breed_repository.stats(), status='reload requested')), 202
+
 # API 端點：手動更新 global_base_url
 @app.route('/update_base_url', methods=['POST'])
 def update_base_url():
@@ -136,139 +203,18 @@ def update_base_url():
     app.logger.info(f"Updated global_base_url to: {global_base_url}")
     return "global_base_url 已更新", 200
 
-# 初始化 SQLite 資料庫（根據 user_id）
-def init_db(user_id):
-    db_name = f'dog_database_{user_id}.db'
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
-
-    # 創建 dogs 表（如果不存在）
-    c.execute('''CREATE TABLE IF NOT EXISTS dogs (
-        name TEXT PRIMARY KEY,
-        birthday TEXT,
-        weight REAL
-    )''')
-
-    # 檢查並添加 breed 欄位
-    c.execute("PRAGMA table_info(dogs)")
-    columns = [col[1] for col in c.fetchall()]
-    if 'breed' not in columns:
-        c.execute("ALTER TABLE dogs ADD COLUMN breed TEXT")
-        print(f"Added 'breed' column to dogs table for user {user_id}")
-
-    # 檢查並添加 status 欄位
-    if 'status' not in columns:
-        c.execute("ALTER TABLE dogs ADD COLUMN status TEXT")
-        print(f"Added 'status' column to dogs table for user {user_id}")
-
-    # 創建 daily_records 表（如果不存在）
-    c.execute('''CREATE TABLE IF NOT EXISTS daily_records (
-        name TEXT,
-        date TEXT,
-        calories REAL,
-        water REAL,
-        FOREIGN KEY (name) REFERENCES dogs (name),
-        PRIMARY KEY (name, date)
-    )''')
-
-    conn.commit()
-    conn.close()
-
-# 查詢所有寵物資料（根據 user_id）
-def get_all_dogs(user_id):
-    db_name = f'dog_database_{user_id}.db'
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
-    c.execute("SELECT name, birthday, weight, breed, status FROM dogs")
-    results = c.fetchall()
-    conn.close()
-    dogs = []
-    for result in results:
-        name, birthday, weight, breed, status = result
-        birth_date = datetime.strptime(birthday, '%Y-%m-%d')
-        age = (datetime.now() - birth_date).days // 365
-        dogs.append((name, birthday, weight, breed, status, age))
-    return dogs
-
-# 查詢寵物基本資料並計算年齡（根據 user_id）
-def get_dog_data(user_id, name):
-    db_name = f'dog_database_{user_id}.db'
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
-    c.execute("SELECT name, birthday, weight, breed, status FROM dogs WHERE name = ?", (name,))
-    result = c.fetchone()
-    conn.close()
-    if result:
-        name, birthday, weight, breed, status = result
-        birth_date = datetime.strptime(birthday, '%Y-%m-%d')
-        age = (datetime.now() - birth_date).days // 365
-        return name, birthday, weight, breed, status, age
-    return None
-
 # 根據品種名稱查詢健康資訊
 def get_health_info(breed_name):
-    breed_data = dog_breeds_df[dog_breeds_df['breed_name'] == breed_name]
-    if not breed_data.empty:
-        row = breed_data.iloc[0]
-        return {
-            'height': row['height'],
-            'weight': row['weight'],
-            'lifespan': row['lifespan'],
-            'recommended_tests': row['recommended_tests']
-        }
-    return None
-
-# 儲存寵物基本資料到資料庫（根據 user_id）
-def save_dog_data(user_id, name, birthday, weight, breed=None, status=None):
-    db_name = f'dog_database_{user_id}.db'
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO dogs (name, birthday, weight, breed, status) VALUES (?, ?, ?, ?, ?)", 
-              (name, birthday, weight, breed, status))
-    conn.commit()
-    conn.close()
-
-# 儲存每日紀錄到資料庫（根據 user_id）
-def save_daily_record(user_id, name, calories, water):
-    today = datetime.now().strftime('%Y-%m-%d')
-    calories = int(calories)  # 轉為整數
-    water = int(water)  # 轉為整數
-    db_name = f'dog_database_{user_id}.db'
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO daily_records (name, date, calories, water) VALUES (?, ?, ?, ?)",
-              (name, today, calories, water))
-    conn.commit()
-    conn.close()
-
-# 查詢每日紀錄（根據 user_id）
-def get_daily_record(user_id, name):
-    today = datetime.now().strftime('%Y-%m-%d')
-    db_name = f'dog_database_{user_id}.db'
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
-    c.execute("SELECT calories, water FROM daily_records WHERE name = ? AND date = ?", (name, today))
-    result = c.fetchone()
-    conn.close()
-    if result:
-        calories, water = result
-        return int(calories), int(water)  # 確保從資料庫讀取的數值為整數
+    breed = breed_repository.get(breed_name)
+    if breed:
+        return breed.health_info()
     return None
 
 # 根據品種名稱查詢飲食建議
 def get_diet_recommendation(breed_name):
-    breed_data = dog_breeds_df[dog_breeds_df['breed_name'] == breed_name]
-    if not breed_data.empty:
-        row = breed_data.iloc[0]
-        return (f"🐶 品種: {row['breed_name']}\n\n"
-                f"📏 身高: {row['height']}\n\n"
-                f"⚖️ 體重: {row['weight']}\n\n"
-                f"⏳ 壽命: {row['lifespan']}\n\n"
-                f"❤️ 健康狀況: {row['health']}\n\n"
-                f"🩺 建議檢查: {row['recommended_tests']}\n\n"
-                f"🍽️ 餵什麼: {row['what_to_feed']}\n\n"
-                f"🥄 如何餵養: {row['how_to_feed']}\n\n"
-                f"💡 營養建議: {row['nutritional_tips']}")
+    breed = breed_repository.get(breed_name)
+    if breed:
+        return breed.recommendation
     return f"未找到 '{breed_name}' 的相關資訊。"
 
 # LINE Bot 回調路由
@@ -276,14 +222,390 @@ def get_diet_recommendation(breed_name):
 def callback():
     signature = request.headers['X-Line-Signature']
     body = request.get_data(as_text=True)
-    app.logger.info("Request body: " + body)
+    app.logger.info("Request body: %s", body, extra={'category': 'request_body'})
     try:
-        handler.handle(body, signature)
+        events = handler.parse(body, signature)
     except InvalidSignatureError:
         app.logger.info("Invalid signature. Please check your channel access token/channel secret.")
         abort(400)
+    if not webhook_pool.submit(events, wait=not WEBHOOK_ASYNC):
+        app.logger.warning("Webhook queue is full, asking LINE to redeliver later")
+        abort(503)
     return 'OK'
 
+# 執行狀態統計
+@app.route("/stats")
+def stats():
+    return jsonify({
+        'webhook': webhook_pool.stats(),
+        'logging': bot_logging.logging_stats(),
+        'line_api': line_client.stats(),
+        'user_states': user_states.stats(),
+        'db_connections': connections.stats(),
+        'db_writer': writer_stats(),
+        'conversation': conversation.stats(),
+        'image_conversation': image_conversation.stats(),
+        'daily_summary': summary_scheduler.stats() if summary_scheduler else None,
+        'breeds': breed_repository.stats(),
+        'ocr_cache': ocr_cache.stats() if ocr_cache else None
+    })
+
+# 回覆單則文字訊息
+def reply_text(event, text, quick_reply=None):
+    line_client.reply_message_with_http_info(
+        ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=text, quick_reply=quick_reply)])
+    )
+
+# 對話流程：文字與圖片訊息各自以步驟名稱 / 選單指令分派
+conversation = ConversationEngine(user_states, reply_text)
+image_conversation = ConversationEngine(user_states, reply_text)
+
+# 定義 Quick Reply 按鈕（相機和相簿）
+camera_quick_reply = QuickReply(items=[
+    QuickReplyItem(action=CameraAction(label="開啟相機")),
+    QuickReplyItem(action=CameraRollAction(label="從相簿選擇"))
+])
+
+# 檢查是否輸入「退出」
+@conversation.command("退出", interrupt=True)
+def exit_conversation(ctx):
+    ctx.reply(welcome_message)
+    app.logger.info("User exited, sent welcome message")
+    return None  # 清除用戶狀態
+
+# 選項 1：等待輸入狗狗資料
+@conversation.step('awaiting_dog_info')
+def step_dog_info(ctx):
+    try:
+        lines = ctx.text.split('\n')
+        name = lines[0].split('：')[1].strip()
+        birthday = lines[1].split('：')[1].strip()
+        weight = float(lines[2].split('：')[1].strip().replace('公斤', '').strip())
+        birth_date = datetime.strptime(birthday, '%Y-%m-%d')
+        age = (local_now() - birth_date).days // 365
+    except Exception as e:
+        ctx.reply("輸入格式錯誤，請按照以下格式重新輸入：\n名字：XXX\n生日：YYYY-MM-DD\n體重：XX公斤")
+        return STAY
+    ctx.reply(f"🐶 狗狗的名字：{name}\n"
+              f"🎂 狗狗的生日：{birthday}\n"
+              f"⚖️ 狗狗的體重：{weight}公斤\n"
+              f"🎈 狗狗的年齡：{age}\n"
+              "資料是否儲存？(Y/N)")
+    return {'step': 'awaiting_save_confirmation', 'data': (name, birthday, weight)}
+
+# 選項 1：確認是否儲存
+@conversation.step('awaiting_save_confirmation')
+def step_save_confirmation(ctx):
+    if ctx.text.upper() == 'Y':
+        if not ctx.claim():
+            app.logger.info("Save confirmation already handled")
+            return STAY
+        name, birthday, weight = ctx.state['data']
+        save_dog_data(ctx.user_id, name, birthday, weight)
+        reply = "資料已儲存！請透過圖文選單中的「建立狗狗檔案」來補充品種和狀態資訊。"
+    elif ctx.text.upper() == 'N':
+        reply = "資料未儲存。"
+    else:
+        reply = "請輸入 Y 或 N"
+    ctx.reply(reply)
+    return None
+
+# 選項 2：等待查詢狗狗名字
+@conversation.step('awaiting_dog_name')
+def step_dog_name(ctx):
+    dog_data = get_dog_data(ctx.user_id, ctx.text)
+    if dog_data:
+        name, birthday, weight, breed, status, age = dog_data
+        reply = (f"🐶 狗狗的名字：{name}\n"
+                 f"🎂 狗狗的生日：{birthday}\n"
+                 f"⚖️ 狗狗的體重：{weight}公斤\n"
+                 f"🎈 狗狗的年齡：{age}")
+        if breed and status:
+            reply += f"\n🐾 品種：{breed}\n📊 狀態：{status}"
+    else:
+        reply = f"未找到名為 '{ctx.text}' 的狗狗資料，請確認是否完成設定1。"
+    ctx.reply(reply)
+    return None
+
+# 選項 3：等待輸入狗狗名字和狀態
+@conversation.step('awaiting_nutrition_info')
+def step_nutrition_info(ctx):
+    try:
+        lines = ctx.text.split('\n')
+        name = lines[0].split('：')[1].strip()
+        status = lines[1].split('：')[1].strip()
+    except Exception as e:
+        ctx.reply("輸入格式錯誤，請按照以下格式重新輸入：\n名字：XXX\n狀態：X（1-13 的數字）")
+        return STAY
+    if status not in [str(i) for i in range(1, 14)]:
+        reply = "狀態選擇錯誤，請輸入 1-13 的數字。"
+    else:
+        dog_data = get_dog_data(ctx.user_id, name)
+        if dog_data:
+            _, birthday, weight, _, _, _ = dog_data
+            targets = daily_calories.calculate_targets(weight, status)
+            reply = (f"今日目標\n\n"
+                     f"🐶 狗狗的名字：{name}\n"
+                     f"⚖️ 體重：{weight}公斤\n"
+                     f"🔥 基礎能量需求(RER)：{targets['rer']:.2f} kcal\n"
+                     f"⚡ 日常能量需求(DER)：{targets['der_min']:.2f}-{targets['der_max']:.2f} kcal\n"
+                     f"💧 每日喝水量：{targets['min_water']:.2f}-{targets['max_water']:.2f} ml")
+        else:
+            reply = f"未找到名為 '{name}' 的狗狗資料，請確認是否完成設定1。"
+    ctx.reply(reply)
+    return None
+
+# 選項 5：等待輸入狗狗品種（可輸入中文、英文或部分名稱，找不到時以 Quick Reply 列出候選品種）
+@conversation.step('awaiting_breed_name')
+def step_breed_name(ctx):
+    if breed_repository.get(ctx.text):
+        ctx.reply(get_diet_recommendation(ctx.text))
+        return None
+    candidates = breed_repository.search(ctx.text)
+    if not candidates:
+        ctx.reply(get_diet_recommendation(ctx.text))
+        return None
+    best, score = candidates[0]
+    if score == 1.0:
+        # 完全符合英文名稱等別名
+        ctx.reply(get_diet_recommendation(best))
+        return None
+    quick_reply = QuickReply(items=[
+        QuickReplyItem(action=MessageAction(label=breed_name, text=breed_name)) for breed_name, _ in candidates
+    ])
+    ctx.reply(f"找不到「{ctx.text}」，請問是以下哪個品種？", quick_reply=quick_reply)
+    return STAY
+
+# 選項 6：等待輸入每日紀錄（移除 poop）
+@conversation.step('awaiting_daily_record')
+def step_daily_record(ctx):
+    try:
+        lines = ctx.text.split('\n')
+        name = lines[0].split('：')[1].strip()
+        calories = float(lines[1].split('：')[1].strip().replace('卡路里', '').strip())
+        water = float(lines[2].split('：')[1].strip().replace('毫升', '').strip())
+    except Exception as e:
+        ctx.reply("輸入格式錯誤，請按照以下格式重新輸入：\n名字：XXX\n卡路里：XX\n水：XX毫升")
+        return STAY
+    ctx.reply(f"🔥 熱量：{calories} 卡路里\n"
+              f"💧 水：{water} 毫升\n"
+              "資料是否儲存？(Y/N)")
+    return {'step': 'awaiting_record_confirmation', 'data': (name, calories, water)}
+
+# 選項 6：確認是否儲存每日紀錄（移除 poop）
+@conversation.step('awaiting_record_confirmation')
+def step_record_confirmation(ctx):
+    if ctx.text.upper() == 'Y':
+        if not ctx.claim():
+            app.logger.info("Record confirmation already handled")
+            return STAY
+        name, calories, water = ctx.state['data']
+        record_intake(ctx.user_id, name, calories, water, source='manual')
+        reply = "資料已儲存！"
+    elif ctx.text.upper() == 'N':
+        reply = "資料未儲存。"
+    else:
+        reply = "請輸入 Y 或 N"
+    ctx.reply(reply)
+    return None
+
+# 選項 7：等待查詢每日紀錄（移除 poop）
+@conversation.step('awaiting_daily_record_check')
+def step_daily_record_check(ctx):
+    record = get_daily_record(ctx.user_id, ctx.text)
+    if record:
+        calories, water = record
+        reply = (f"今日已完成\n\n"
+                 f"🔥 熱量：{calories} 卡路里\n"
+                 f"💧 水量：{water} 毫升")
+    else:
+        reply = f"未找到名為 '{ctx.text}' 的狗狗今日紀錄。"
+    ctx.reply(reply)
+    return None
+
+# 選項 8：等待輸入餵食克數
+@conversation.step('awaiting_feeding_weight')
+def step_feeding_weight(ctx):
+    try:
+        grams = float(ctx.text.strip().replace('克', ''))
+        nutrition_info = ctx.state['nutrition_info']
+        total_weight = 1000  # 預設整包為 1 公斤 (1000 克)
+        ratio = grams / total_weight
+        calories = float(nutrition_info.get('熱量', 0)) * ratio
+        protein = float(nutrition_info.get('蛋白質', 0))
+        fat = float(nutrition_info.get('脂肪', 0))
+        fiber = float(nutrition_info.get('纖維', 0))
+        carbs = float(nutrition_info.get('碳水', 0))
+        water = float(nutrition_info.get('水', 0))
+        reply = (f"🔥 熱量：{calories:.2f} kcal\n"
+                 f"🥚 蛋白質：{protein:.2f}%\n"
+                 f"🧈 脂肪：{fat:.2f}%\n"
+                 f"🌾 纖維：{fiber:.2f}%\n"
+                 f"🍚 碳水化合物：{carbs:.2f}%\n"
+                 f"💧 水分：{water:.2f}%")
+    except Exception as e:
+        ctx.reply("請輸入有效的克數（例如：100 或 100克）")
+        return None
+
+    dogs = get_all_dogs(ctx.user_id)
+    if not dogs:
+        ctx.reply(reply)
+        return None
+    # 詢問要記錄到哪隻狗狗的今日攝取；飼料中的水分以 1 克約 1 毫升計
+    quick_reply = QuickReply(items=[
+        QuickReplyItem(action=MessageAction(label=dog[0][:20], text=dog[0])) for dog in dogs[:12]
+    ] + [QuickReplyItem(action=MessageAction(label="不記錄", text="不記錄"))])
+    ctx.reply(reply + "\n\n要記錄到哪隻狗狗的今日攝取？", quick_reply=quick_reply)
+    return {'step': 'awaiting_feeding_dog', 'intake': (round(calories), round(grams * water / 100))}
+
+# 選項 8：將包裝照片算出的攝取量記錄到指定狗狗
+@conversation.step('awaiting_feeding_dog')
+def step_feeding_dog(ctx):
+    if ctx.text == "不記錄":
+        ctx.reply("資料未儲存。")
+        return None
+    if not dog_exists(ctx.user_id, ctx.text):
+        ctx.reply("請從選單中選擇狗狗，或輸入「不記錄」。")
+        return STAY
+    if not ctx.claim():
+        app.logger.info("Feeding record already handled")
+        return STAY
+    calories, water = ctx.state['intake']
+    record_intake(ctx.user_id, ctx.text, calories, water, source='ocr')
+    ctx.reply(f"已記錄到 {ctx.text} 的今日攝取！")
+    return None
+
+# 選項 10：將附近允許帶狗的餐廳整理成回覆文字
+def format_dog_friendly_places(places, header):
+    reply = header
+    for place in places:
+        if place.get('allowsDogs', False):
+            place_location = place.get('location', {})
+            place_lat = place_location.get('latitude')
+            place_lon = place_location.get('longitude')
+            navigation_url = f"https://www.google.com/maps/dir/?api=1&destination={place_lat},{place_lon}"
+            reply += f"🍴 餐廳: {place.get('displayName', {}).get('text', '未知')}\n"
+            reply += f"⭐ 評分: {place.get('rating', '無評分')}\n"
+            reply += f"📍 地址: {place.get('formattedAddress', '地址未知')}\n"
+            reply += f"🛣️ 導航: {navigation_url}\n\n"
+    return reply
+
+# 選項 10：選擇查詢方式
+@conversation.step('awaiting_restaurant_choice')
+def step_restaurant_choice(ctx):
+    if ctx.text == "目前位置":
+        lat, lon, location_msg = petmap.get_location(API_KEY, choice='1')
+        if lat is None or lon is None:
+            reply = location_msg
+        else:
+            places = petmap.search_nearby_places(API_KEY, lat, lon, max_count=20, place_type=['dog_cafe', 'cat_cafe', 'restaurant'])
+            if places:
+                reply = format_dog_friendly_places(places, f"\n找到以下餐廳：\n")
+            else:
+                reply = f"{location_msg}\n未找到符合條件的餐廳。"
+        ctx.reply(reply.strip())
+        return None
+    elif ctx.text == "輸入地標名稱":
+        ctx.reply("請輸入地標名稱")
+        return {'step': 'awaiting_landmark_name'}
+    ctx.reply("請輸入 1 或 2 選擇查詢方式。")
+    return STAY
+
+# 選項 10：等待輸入地標名稱
+@conversation.step('awaiting_landmark_name')
+def step_landmark_name(ctx):
+    lat, lon, location_msg = petmap.get_location(API_KEY, choice='2', place_name=ctx.text)
+    if lat is None or lon is None:
+        reply = location_msg
+    else:
+        places = petmap.search_nearby_places(API_KEY, lat, lon, max_count=20, place_type=['dog_cafe', 'cat_cafe', 'restaurant'])
+        if places:
+            reply = format_dog_friendly_places(places, f"{location_msg}\n找到以下餐廳：\n")
+        else:
+            reply = f"{location_msg}\n未找到符合條件的餐廳。"
+    ctx.reply(reply.strip())
+    return None
+
+# 初始選項處理：處理圖文選單觸發的文字訊息，並回覆帶有 URL 的訊息
+@conversation.command("新增寵物檔案")
+def command_create_profile(ctx):
+    ctx.reply(f"請點擊以下連結來新增寵物檔案：\n{global_base_url}/create_dog_profile?user_id={ctx.user_id}")
+
+@conversation.command("狗狗檔案")
+def command_dog_profile(ctx):
+    ctx.reply(f"請點擊以下連結來查看狗狗檔案：\n{global_base_url}/dog_profile?user_id={ctx.user_id}")
+
+@conversation.command("紀錄今日攝取")
+def command_record_intake(ctx):
+    ctx.reply(f"請點擊以下連結來記錄今日攝取：\n{global_base_url}/record_daily_intake?user_id={ctx.user_id}")
+
+@conversation.command("33333")
+def command_nutrition_targets(ctx):
+    ctx.reply("請輸入狗狗的名字：\n"
+              "狗狗的狀態：\n"
+              "1. 正在發育的幼犬(4個月以下)\n"
+              "2. 正在發育的幼犬(4個月-1歲)\n"
+              "3. 結紮成年犬(1-7歲)\n"
+              "4. 未結紮成年犬(1-7歲)\n"
+              "5. 輕度減肥成年犬\n"
+              "6. 重度減肥成年犬\n"
+              "7. 過瘦成年犬\n"
+              "8. 輕度活動量\n"
+              "9. 劇烈活動量\n"
+              "10. 高齡犬\n"
+              "11. 懷孕中的狗媽媽\n"
+              "12. 哺乳中的狗媽媽\n"
+              "13. 生病成年犬\n"
+              "請輸入狗狗目前的狀態(輸入對應數字)：\n\n"
+              "例如：\n名字：小白\n狀態：3")
+    return {'step': 'awaiting_nutrition_info'}
+
+@conversation.command("1")
+def command_forbidden_foods(ctx):
+    ctx.reply("要小心不要讓狗狗吃到這些食物喔！\n"
+              "\n🍎 水果：葡萄、櫻桃、鳳梨、生番茄、酪梨、柑橘類、果核、種子\n"
+              "\n🥕 蔬菜：蔥、韭菜、洋蔥、大蒜、辛香料\n"
+              "\n🚫 其他：蘆薈、巧克力、夏威夷果、野生蘑菇、牛奶、生肉、糕點類\n\n"
+              "幫狗狗準備的食物，請記得要全部煮熟並切成小塊喔~")
+
+@conversation.command("2")
+def command_breed_advice(ctx):
+    ctx.reply("請輸入狗狗的品種名稱（例如：吉娃娃）")
+    return {'step': 'awaiting_breed_name'}
+
+@conversation.command("66666")
+def command_daily_record(ctx):
+    ctx.reply("請點選圖文選單中的「紀錄今日攝取」來記錄今日資料，或輸入以下資訊：\n名字：XXX\n卡路里：XX\n水：XX毫升")
+    return {'step': 'awaiting_daily_record'}
+
+@conversation.command("77777")
+def command_daily_record_check(ctx):
+    ctx.reply("請點選圖文選單中的「今日已攝取」來查看今日紀錄，或輸入狗狗的名字：")
+    return {'step': 'awaiting_daily_record_check'}
+
+@conversation.command("3")
+def command_package_image(ctx):
+    ctx.reply("請選擇以下方式上傳包裝照片，以計算卡路里和其他營養成分：", quick_reply=camera_quick_reply)
+    return {'step': 'awaiting_package_image'}
+
+@conversation.command("4")
+def command_fresh_food_image(ctx):
+    ctx.reply("請選擇以下方式上傳鮮食照片，以計算卡路里和其他營養成分：", quick_reply=camera_quick_reply)
+    return {'step': 'awaiting_fresh_food_image'}
+
+@conversation.command("10", "友善餐廳")
+def command_restaurants(ctx):
+    quick_reply = QuickReply(items=[
+        QuickReplyItem(action=MessageAction(label="目前位置", text="目前位置")),
+        QuickReplyItem(action=MessageAction(label="輸入地標名稱", text="輸入地標名稱"))
+    ])
+    ctx.reply("請選擇餐廳查詢方式：", quick_reply=quick_reply)
+    return {'step': 'awaiting_restaurant_choice'}
+
+@conversation.fallback
+def command_welcome(ctx):
+    ctx.reply(welcome_message)
+
 # 處理 LINE 文字訊息
 @handler.add(MessageEvent, message=TextMessageContent)
 def handle_text_message(event):
@@ -294,417 +616,104 @@ def handle_text_message(event):
     # 初始化該使用者的資料庫
     init_db(user_id)
 
-    with ApiClient(configuration) as api_client:
-        line_bot_api = MessagingApi(api_client)
-
-        # 定義 Quick Reply 按鈕（相機和相簿）
-        quick_reply = QuickReply(items=[
-            QuickReplyItem(action=CameraAction(label="開啟相機")),
-            QuickReplyItem(action=CameraRollAction(label="從相簿選擇"))
-        ])
-
-        # 檢查是否輸入「退出」
-        if user_input == "退出":
-            if user_id in user_states:
-                del user_states[user_id]  # 清除用戶狀態
-            line_bot_api.reply_message_with_http_info(
-                ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=welcome_message)])
-            )
-            app.logger.info("User exited, sent welcome message")
-            return
-
-        # 檢查用戶是否處於某個操作狀態
-        if user_id in user_states:
-            state = user_states[user_id]
-            
-            # 選項 1：等待輸入狗狗資料
-            if state.get('step') == 'awaiting_dog_info':
-                try:
-                    lines = user_input.split('\n')
-                    name = lines[0].split('：')[1].strip()
-                    birthday = lines[1].split('：')[1].strip()
-                    weight = float(lines[2].split('：')[1].strip().replace('公斤', '').strip())
-                    birth_date = datetime.strptime(birthday, '%Y-%m-%d')
-                    age = (datetime.now() - birth_date).days // 365
-                    reply = (f"🐶 狗狗的名字：{name}\n"
-                             f"🎂 狗狗的生日：{birthday}\n"
-                             f"⚖️ 狗狗的體重：{weight}公斤\n"
-                             f"🎈 狗狗的年齡：{age}\n"
-                             "資料是否儲存？(Y/N)")
-                    user_states[user_id] = {'step': 'awaiting_save_confirmation', 'data': (name, birthday, weight)}
-                except Exception as e:
-                    reply = "輸入格式錯誤，請按照以下格式重新輸入：\n名字：XXX\n生日：YYYY-MM-DD\n體重：XX公斤"
-                line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-
-            # 選項 1：確認是否儲存
-            elif state.get('step') == 'awaiting_save_confirmation':
-                if user_input.upper() == 'Y':
-                    name, birthday, weight = state['data']
-                    save_dog_data(user_id, name, birthday, weight)
-                    reply = "資料已儲存！請透過圖文選單中的「建立狗狗檔案」來補充品種和狀態資訊。"
-                elif user_input.upper() == 'N':
-                    reply = "資料未儲存。"
-                else:
-                    reply = "請輸入 Y 或 N"
-                line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-                del user_states[user_id]
-
-            # 選項 2：等待查詢狗狗名字
-            elif state.get('step') == 'awaiting_dog_name':
-                dog_data = get_dog_data(user_id, user_input)
-                if dog_data:
-                    name, birthday, weight, breed, status, age = dog_data
-                    reply = (f"🐶 狗狗的名字：{name}\n"
-                             f"🎂 狗狗的生日：{birthday}\n"
-                             f"⚖️ 狗狗的體重：{weight}公斤\n"
-                             f"🎈 狗狗的年齡：{age}")
-                    if breed and status:
-                        reply += f"\n🐾 品種：{breed}\n📊 狀態：{status}"
-                else:
-                    reply = f"未找到名為 '{user_input}' 的狗狗資料，請確認是否完成設定1。"
-                line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-                del user_states[user_id]
-
-            # 選項 3：等待輸入狗狗名字和狀態
-            elif state.get('step') == 'awaiting_nutrition_info':
-                try:
-                    lines = user_input.split('\n')
-                    name = lines[0].split('：')[1].strip()
-                    status = lines[1].split('：')[1].strip()
-                    if status not in [str(i) for i in range(1, 14)]:
-                        reply = "狀態選擇錯誤，請輸入 1-13 的數字。"
-                    else:
-                        dog_data = get_dog_data(user_id, name)
-                        if dog_data:
-                            _, birthday, weight, _, _, _ = dog_data
-                            rer = daily_calories.calculate_RER(weight)
-                            af_min, af_max = daily_calories.get_AF_for_status(status)
-                            der_min = daily_calories.calculate_DER(rer, af_min)
-                            der_max = daily_calories.calculate_DER(rer, af_max)
-                            min_water, max_water = daily_calories.calculate_water_intake(weight)
-                            reply = (f"今日目標\n\n"
-                                     f"🐶 狗狗的名字：{name}\n"
-                                     f"⚖️ 體重：{weight}公斤\n"
-                                     f"🔥 基礎能量需求(RER)：{rer:.2f} kcal\n"
-                                     f"⚡ 日常能量需求(DER)：{der_min:.2f}-{der_max:.2f} kcal\n"
-                                     f"💧 每日喝水量：{min_water:.2f}-{max_water:.2f} ml")
-                        else:
-                            reply = f"未找到名為 '{name}' 的狗狗資料，請確認是否完成設定1。"
-                    line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-                    del user_states[user_id]
-                except Exception as e:
-                    reply = "輸入格式錯誤，請按照以下格式重新輸入：\n名字：XXX\n狀態：X（1-13 的數字）"
-                    line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-
-            # 選項 5：等待輸入狗狗品種
-            elif state.get('step') == 'awaiting_breed_name':
-                reply = get_diet_recommendation(user_input)
-                line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-                del user_states[user_id]
-
-            # 選項 6：等待輸入每日紀錄（移除 poop）
-            elif state.get('step') == 'awaiting_daily_record':
-                try:
-                    lines = user_input.split('\n')
-                    name = lines[0].split('：')[1].strip()
-                    calories = float(lines[1].split('：')[1].strip().replace('卡路里', '').strip())
-                    water = float(lines[2].split('：')[1].strip().replace('毫升', '').strip())
-                    reply = (f"🔥 熱量：{calories} 卡路里\n"
-                             f"💧 水：{water} 毫升\n"
-                             "資料是否儲存？(Y/N)")
-                    user_states[user_id] = {'step': 'awaiting_record_confirmation', 'data': (name, calories, water)}
-                except Exception as e:
-                    reply = "輸入格式錯誤，請按照以下格式重新輸入：\n名字：XXX\n卡路里：XX\n水：XX毫升"
-                line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-
-            # 選項 6：確認是否儲存每日紀錄（移除 poop）
-            elif state.get('step') == 'awaiting_record_confirmation':
-                if user_input.upper() == 'Y':
-                    name, calories, water = state['data']
-                    save_daily_record(user_id, name, calories, water)
-                    reply = "資料已儲存！"
-                elif user_input.upper() == 'N':
-                    reply = "資料未儲存。"
-                else:
-                    reply = "請輸入 Y 或 N"
-                line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-                del user_states[user_id]
-
-            # 選項 7：等待查詢每日紀錄（移除 poop）
-            elif state.get('step') == 'awaiting_daily_record_check':
-                record = get_daily_record(user_id, user_input)
-                if record:
-                    calories, water = record
-                    reply = (f"今日已完成\n\n"
-                             f"🔥 熱量：{calories} 卡路里\n"
-                             f"💧 水量：{water} 毫升")
-                else:
-                    reply = f"未找到名為 '{user_input}' 的狗狗今日紀錄。"
-                line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-                del user_states[user_id]
-
-            # 選項 8：等待輸入餵食克數
-            elif state.get('step') == 'awaiting_feeding_weight':
-                try:
-                    grams = float(user_input.strip().replace('克', ''))
-                    nutrition_info = state['nutrition_info']
-                    total_weight = 1000  # 預設整包為 1 公斤 (1000 克)
-                    ratio = grams / total_weight
-                    calories = float(nutrition_info.get('熱量', 0)) * ratio
-                    protein = float(nutrition_info.get('蛋白質', 0)) 
-                    fat = float(nutrition_info.get('脂肪', 0)) 
-                    fiber = float(nutrition_info.get('纖維', 0))
-                    carbs = float(nutrition_info.get('碳水', 0))
-                    water = float(nutrition_info.get('水', 0)) 
-                    reply = (f"🔥 熱量：{calories:.2f} kcal\n"
-                            f"🥚 蛋白質：{protein:.2f}%\n"
-                            f"🧈 脂肪：{fat:.2f}%\n"
-                            f"🌾 纖維：{fiber:.2f}%\n"
-                            f"🍚 碳水化合物：{carbs:.2f}%\n"
-                            f"💧 水分：{water:.2f}%")
-                except Exception as e:
-                    reply = "請輸入有效的克數（例如：100 或 100克）"
-                line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-                del user_states[user_id]
-
-            # 選項 10：選擇查詢方式
-            elif state.get('step') == 'awaiting_restaurant_choice':
-                if user_input == "目前位置":
-                    lat, lon, location_msg = petmap.get_location(API_KEY, choice='1')
-                    if lat is None or lon is None:
-                        reply = location_msg
-                    else:
-                        places = petmap.search_nearby_places(API_KEY, lat, lon, max_count=20, place_type=['dog_cafe', 'cat_cafe', 'restaurant'])
-                        if places:
-                            reply = f"\n找到以下餐廳：\n"
-                            for place in places:
-                                if place.get('allowsDogs', False):
-                                    place_location = place.get('location', {})
-                                    place_lat = place_location.get('latitude')
-                                    place_lon = place_location.get('longitude')
-                                    navigation_url = f"https://www.google.com/maps/dir/?api=1&destination={place_lat},{place_lon}"
-                                    reply += f"🍴 餐廳: {place.get('displayName', {}).get('text', '未知')}\n"
-                                    reply += f"⭐ 評分: {place.get('rating', '無評分')}\n"
-                                    reply += f"📍 地址: {place.get('formattedAddress', '地址未知')}\n"
-                                    reply += f"🛣️ 導航: {navigation_url}\n\n"
-                        else:
-                            reply = f"{location_msg}\n未找到符合條件的餐廳。"
-                    line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply.strip())]))
-                    del user_states[user_id]
-                elif user_input == "輸入地標名稱":
-                    reply = "請輸入地標名稱"
-                    user_states[user_id] = {'step': 'awaiting_landmark_name'}
-                else:
-                    reply = "請輸入 1 或 2 選擇查詢方式。"
-                line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-
-            # 選項 10：等待輸入地標名稱
-            elif state.get('step') == 'awaiting_landmark_name':
-                lat, lon, location_msg = petmap.get_location(API_KEY, choice='2', place_name=user_input)
-                if lat is None or lon is None:
-                    reply = location_msg
-                else:
-                    places = petmap.search_nearby_places(API_KEY, lat, lon, max_count=20, place_type=['dog_cafe', 'cat_cafe', 'restaurant'])
-                    if places:
-                        reply = f"{location_msg}\n找到以下餐廳：\n"
-                        for place in places:
-                            if place.get('allowsDogs', False):
-                                place_location = place.get('location', {})
-                                place_lat = place_location.get('latitude')
-                                place_lon = place_location.get('longitude')
-                                navigation_url = f"https://www.google.com/maps/dir/?api=1&destination={place_lat},{place_lon}"
-                                reply += f"🍴 餐廳: {place.get('displayName', {}).get('text', '未知')}\n"
-                                reply += f"⭐ 評分: {place.get('rating', '無評分')}\n"
-                                reply += f"📍 地址: {place.get('formattedAddress', '地址未知')}\n"
-                                reply += f"🛣️ 導航: {navigation_url}\n\n"
-                    else:
-                        reply = f"{location_msg}\n未找到符合條件的餐廳。"
-                line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply.strip())]))
-                del user_states[user_id]
-
-            app.logger.info("Replied with state-specific message")
-            return
-
-        # 初始選項處理：處理圖文選單觸發的文字訊息，並回覆帶有 URL 的訊息
-        if user_input == "新增寵物檔案":
-            reply = f"請點擊以下連結來新增寵物檔案：\n{global_base_url}/create_dog_profile?user_id={user_id}"
-        elif user_input == "狗狗檔案":
-            reply = f"請點擊以下連結來查看狗狗檔案：\n{global_base_url}/dog_profile?user_id={user_id}"
-        elif user_input == "紀錄今日攝取":
-            reply = f"請點擊以下連結來記錄今日攝取：\n{global_base_url}/record_daily_intake?user_id={user_id}"
-        elif user_input == "33333":
-            reply = ("請輸入狗狗的名字：\n"
-                     "狗狗的狀態：\n"
-                     "1. 正在發育的幼犬(4個月以下)\n"
-                     "2. 正在發育的幼犬(4個月-1歲)\n"
-                     "3. 結紮成年犬(1-7歲)\n"
-                     "4. 未結紮成年犬(1-7歲)\n"
-                     "5. 輕度減肥成年犬\n"
-                     "6. 重度減肥成年犬\n"
-                     "7. 過瘦成年犬\n"
-                     "8. 輕度活動量\n"
-                     "9. 劇烈活動量\n"
-                     "10. 高齡犬\n"
-                     "11. 懷孕中的狗媽媽\n"
-                     "12. 哺乳中的狗媽媽\n"
-                     "13. 生病成年犬\n"
-                     "請輸入狗狗目前的狀態(輸入對應數字)：\n\n"
-                     "例如：\n名字：小白\n狀態：3")
-            user_states[user_id] = {'step': 'awaiting_nutrition_info'}
-        elif user_input == "1":
-            reply = ("要小心不要讓狗狗吃到這些食物喔！\n"
-                     "\n🍎 水果：葡萄、櫻桃、鳳梨、生番茄、酪梨、柑橘類、果核、種子\n"
-                     "\n🥕 蔬菜：蔥、韭菜、洋蔥、大蒜、辛香料\n"
-                     "\n🚫 其他：蘆薈、巧克力、夏威夷果、野生蘑菇、牛奶、生肉、糕點類\n\n"
-                     "幫狗狗準備的食物，請記得要全部煮熟並切成小塊喔~")
-        elif user_input == "2":
-            reply = "請輸入狗狗的品種名稱（例如：吉娃娃）"
-            user_states[user_id] = {'step': 'awaiting_breed_name'}
-        elif user_input == "66666":
-            reply = "請點選圖文選單中的「紀錄今日攝取」來記錄今日資料，或輸入以下資訊：\n名字：XXX\n卡路里：XX\n水：XX毫升"
-            user_states[user_id] = {'step': 'awaiting_daily_record'}
-        elif user_input == "77777":
-            reply = "請點選圖文選單中的「今日已攝取」來查看今日紀錄，或輸入狗狗的名字："
-            user_states[user_id] = {'step': 'awaiting_daily_record_check'}
-        elif user_input == "3":
-            reply = "請選擇以下方式上傳包裝照片，以計算卡路里和其他營養成分："
-            user_states[user_id] = {'step': 'awaiting_package_image'}
-            line_bot_api.reply_message_with_http_info(
-                ReplyMessageRequest(
-                    reply_token=event.reply_token,
-                    messages=[TextMessage(text=reply, quick_reply=quick_reply)]
-                )
-            )
-            app.logger.info("Sent Quick Reply for package image upload")
-            return
-        elif user_input == "4":
-            reply = "請選擇以下方式上傳鮮食照片，以計算卡路里和其他營養成分："
-            user_states[user_id] = {'step': 'awaiting_fresh_food_image'}
-            line_bot_api.reply_message_with_http_info(
-                ReplyMessageRequest(
-                    reply_token=event.reply_token,
-                    messages=[TextMessage(text=reply, quick_reply=quick_reply)]
-                )
-            )
-            app.logger.info("Sent Quick Reply for fresh food image upload")
-            return
-        elif user_input in ["10", "友善餐廳"]:
-            reply = "請選擇餐廳查詢方式："
-            quick_reply = QuickReply(items=[
-                QuickReplyItem(action=MessageAction(label="目前位置", text="目前位置")),
-                QuickReplyItem(action=MessageAction(label="輸入地標名稱", text="輸入地標名稱"))
-            ])
-            user_states[user_id] = {'step': 'awaiting_restaurant_choice'}
-            line_bot_api.reply_message_with_http_info(
-                ReplyMessageRequest(
-                    reply_token=event.reply_token,
-                    messages=[TextMessage(text=reply, quick_reply=quick_reply)]
-                )
-            )
-            app.logger.info("Sent Quick Reply for restaurant choice")
-            return
-        else:
-            reply = welcome_message
+    handled = conversation.handle(event, user_id, user_input)
+    app.logger.info(f"Handled text message with {handled}")
 
-        line_bot_api.reply_message_with_http_info(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)]))
-        app.logger.info("Replied with initial message")
+# 下載使用者傳來的圖片，失敗時回覆錯誤訊息並返回 None
+def download_image(ctx):
+    message_id = ctx.event.message.id
+    try:
+        image_content = line_client.get_message_content(message_id=message_id)
+        app.logger.info(f"Successfully retrieved image content for message ID: {message_id}")
+        return image_content
+    except Exception as e:
+        app.logger.error(f"Failed to retrieve image content: {str(e)}")
+        ctx.reply("無法獲取圖片，請再試一次。")
+        return None
+
+# 選項 8：處理包裝照片
+@image_conversation.step('awaiting_package_image')
+def step_package_image(ctx):
+    image_content = download_image(ctx)
+    if image_content is None:
+        return STAY
+    next_state = STAY
+    try:
+        # 使用全局初始化的 vision_client
+        nutrition_info = packageOCR.extract_nutrition_info(image_content, vision_client, ocr_image_options, ocr_cache)
+        app.logger.info(f"Extracted nutrition info: {nutrition_info}")
+        if nutrition_info:
+            next_state = {'step': 'awaiting_feeding_weight', 'nutrition_info': nutrition_info}
+            reply = "請問這次餵食的克數？"
+        else:
+            reply = "無法從照片中提取營養成分，請再試一次。"
+    except Exception as e:
+        app.logger.error(f"Error processing package image: {str(e)}")
+        reply = "處理圖片時發生錯誤，請再試一次。"
+    ctx.reply(reply)
+    app.logger.info("Processed package image and replied")
+    return next_state
+
+# 選項 9：處理鮮食照片
+@image_conversation.step('awaiting_fresh_food_image')
+def step_fresh_food_image(ctx):
+    image_content = download_image(ctx)
+    if image_content is None:
+        return STAY
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
+            temp_file.write(image_content)
+            temp_file_path = temp_file.name
+
+        detected_foods = dogdietyolo.detect_food(temp_file_path, yolo_model)
+        os.unlink(temp_file_path)
+
+        app.logger.info(f"Detected foods (raw): {detected_foods}")
+        if detected_foods:
+            # 去重並標準化食材名稱
+            unique_foods = set()
+            for food in detected_foods:
+                if food:  # 過濾空值
+                    normalized_food = str(food).strip().title()
+                    unique_foods.add(normalized_food)
+            unique_foods = list(unique_foods)
+            app.logger.info(f"Unique foods after normalization: {unique_foods}")
+
+            # 生成單一回覆訊息，每種食材只顯示一次
+            reply_text = "辨識結果與營養資訊(每100g)：\n" + "=" * 25 + "\n"
+            for food in unique_foods:
+                nutrition = dogdietyolo.NUTRITION_TABLE.get(food, {})
+                food_info = (f"食物: {food}\n"
+                             f"卡路里: {nutrition.get('Calories', 0)} kcal\n"
+                             f"碳水化合物: {nutrition.get('Carbohydrate', 0)} g\n"
+                             f"蛋白質: {nutrition.get('Protein', 0)} g\n"
+                             f"纖維: {nutrition.get('Fiber', 0)} g\n"
+                             f"---------------------------------\n")
+                reply_text += food_info
+                app.logger.debug("Added %s to reply", food, extra={'category': 'diagnostics'})
+
+            # 檢查訊息長度並發送
+            if len(reply_text) > 5000:  # LINE 訊息長度限制
+                reply_text = "辨識結果過多，僅顯示部分資訊：\n" + reply_text[:4900] + "..."
+            app.logger.debug("Final reply_text: %s", reply_text, extra={'category': 'diagnostics'})
+            ctx.reply(reply_text.rstrip())
+        else:
+            ctx.reply("未辨識到任何食物！")
+    except Exception as e:
+        app.logger.error(f"Error processing fresh food image: {str(e)}")
+        ctx.reply("處理圖片時發生錯誤，請再試一次。")
+    app.logger.info("Processed fresh food image and replied")
+    return None
 
 # 處理 LINE 圖片訊息
 @handler.add(MessageEvent, message=ImageMessageContent)
 def handle_image_message(event):
-    user_id = event.source.user_id
-    with ApiClient(configuration) as api_client:
-        line_bot_api = MessagingApi(api_client)
-        line_bot_blob_api = MessagingApiBlob(api_client)
-        
-        # 獲取圖片內容
-        message_id = event.message.id
-        try:
-            response = line_bot_blob_api.get_message_content(message_id=message_id)
-            image_content = response
-            app.logger.info(f"Successfully retrieved image content for message ID: {message_id}")
-        except Exception as e:
-            app.logger.error(f"Failed to retrieve image content: {str(e)}")
-            reply = "無法獲取圖片，請再試一次。"
-            line_bot_api.reply_message_with_http_info(
-                ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)])
-            )
-            return
-
-        # 選項 8：處理包裝照片
-        if user_id in user_states and user_states[user_id].get('step') == 'awaiting_package_image':
-            try:
-                # 使用全局初始化的 vision_client
-                nutrition_info = packageOCR.extract_nutrition_info(image_content, vision_client)
-                app.logger.info(f"Extracted nutrition info: {nutrition_info}")
-                if nutrition_info:
-                    user_states[user_id] = {'step': 'awaiting_feeding_weight', 'nutrition_info': nutrition_info}
-                    reply = "請問這次餵食的克數？"
-                else:
-                    reply = "無法從照片中提取營養成分，請再試一次。"
-            except Exception as e:
-                app.logger.error(f"Error processing package image: {str(e)}")
-                reply = "處理圖片時發生錯誤，請再試一次。"
-            line_bot_api.reply_message_with_http_info(
-                ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)])
-            )
-            app.logger.info("Processed package image and replied")
-        
-        # 選項 9：處理鮮食照片
-        elif user_id in user_states and user_states[user_id].get('step') == 'awaiting_fresh_food_image':
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                    temp_file.write(image_content)
-                    temp_file_path = temp_file.name
-                
-                detected_foods = dogdietyolo.detect_food(temp_file_path, yolo_model)
-                os.unlink(temp_file_path)
-                
-                app.logger.info(f"Detected foods (raw): {detected_foods}")
-                if detected_foods:
-                    # 去重並標準化食材名稱
-                    unique_foods = set()
-                    for food in detected_foods:
-                        if food:  # 過濾空值
-                            normalized_food = str(food).strip().title()
-                            unique_foods.add(normalized_food)
-                    unique_foods = list(unique_foods)
-                    app.logger.info(f"Unique foods after normalization: {unique_foods}")
-                    
-                    # 生成單一回覆訊息，每種食材只顯示一次
-                    reply_text = "辨識結果與營養資訊(每100g)：\n" + "=" * 25 + "\n"
-                    app.logger.info(f"Initial reply_text: {reply_text}")
-                    for food in unique_foods:
-                        nutrition = dogdietyolo.NUTRITION_TABLE.get(food, {})
-                        food_info = (f"食物: {food}\n"
-                                     f"卡路里: {nutrition.get('Calories', 0)} kcal\n"
-                                     f"碳水化合物: {nutrition.get('Carbohydrate', 0)} g\n"
-                                     f"蛋白質: {nutrition.get('Protein', 0)} g\n"
-                                     f"纖維: {nutrition.get('Fiber', 0)} g\n"
-                                     f"---------------------------------\n")
-                        reply_text += food_info
-                        app.logger.info(f"After adding {food}: {reply_text}")
-                    
-                    # 檢查訊息長度並發送
-                    if len(reply_text) > 5000:  # LINE 訊息長度限制
-                        reply_text = "辨識結果過多，僅顯示部分資訊：\n" + reply_text[:4900] + "..."
-                    app.logger.info(f"Final reply_text: {reply_text}")
-                    messages = [TextMessage(text=reply_text.rstrip())]
-                else:
-                    messages = [TextMessage(text="未辨識到任何食物！")]
-                
-                app.logger.info(f"Reply messages: {[msg.text for msg in messages]}")
-                line_bot_api.reply_message_with_http_info(
-                    ReplyMessageRequest(reply_token=event.reply_token, messages=messages)
-                )
-            except Exception as e:
-                app.logger.error(f"Error processing fresh food image: {str(e)}")
-                reply = "處理圖片時發生錯誤，請再試一次。"
-                line_bot_api.reply_message_with_http_info(
-                    ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply)])
-                )
-            del user_states[user_id]
-            app.logger.info("Processed fresh food image and replied")
+    image_conversation.handle(event, event.source.user_id)
+
+# 所有事件處理函數註冊完成後啟動背景工作執行緒
+webhook_pool.start()
+if summary_scheduler:
+    summary_scheduler.start()
 
 # 創建圖文選單（使用 message 動作）
 def create_rich_menu():
@@ -804,44 +813,25 @@ def create_dog_profile():
         status = request.form.get('status')
 
         if not all([name, birthday, weight, breed, status]):
-            return render_template('create_dog_profile.html', breeds=breeds, statuses=statuses, error="請填寫所有欄位！", user_id=user_id)
+            return render_template('create_dog_profile.html', breeds=breed_repository.names, statuses=statuses, error="請填寫所有欄位！", user_id=user_id)
 
         try:
             weight = float(weight)
             datetime.strptime(birthday, '%Y-%m-%d')  # 驗證日期格式
         except ValueError:
-            return render_template('create_dog_profile.html', breeds=breeds, statuses=statuses, error="體重必須為數字，生日格式必須為 YYYY-MM-DD！", user_id=user_id)
+            return render_template('create_dog_profile.html', breeds=breed_repository.names, statuses=statuses, error="體重必須為數字，生日格式必須為 YYYY-MM-DD！", user_id=user_id)
 
-        db_name = f'dog_database_{user_id}.db'
-        conn = sqlite3.connect(db_name)
-        c = conn.cursor()
         try:
-            c.execute("INSERT INTO dogs (name, birthday, weight, breed, status) VALUES (?, ?, ?, ?, ?)",
-                      (name, birthday, weight, breed, status))
-            conn.commit()
+            # 目標值在寫入時計算並存進 dogs 表
+            targets = create_dog(user_id, name, birthday, weight, breed, status).result()
         except sqlite3.IntegrityError:
-            conn.close()
-            return render_template('create_dog_profile.html', breeds=breeds, statuses=statuses, error="此名字已存在，請使用其他名字！", user_id=user_id)
-        conn.close()
-
-        status_index = statuses.index(status) + 1
-        rer = daily_calories.calculate_RER(weight)
-        af_min, af_max = daily_calories.get_AF_for_status(str(status_index))
-        der_min = daily_calories.calculate_DER(rer, af_min)
-        der_max = daily_calories.calculate_DER(rer, af_max)
-        min_water, max_water = daily_calories.calculate_water_intake(weight)
-
-        target_data = {
-            'rer': round(rer, 2),
-            'der_min': round(der_min, 2),
-            'der_max': round(der_max, 2),
-            'min_water': round(min_water, 2),
-            'max_water': round(max_water, 2)
-        }
+            return render_template('create_dog_profile.html', breeds=breed_repository.names, statuses=statuses, error="此名字已存在，請使用其他名字！", user_id=user_id)
 
-        return render_template('create_dog_profile.html', breeds=breeds, statuses=statuses, target_data=target_data, user_id=user_id)
+        target_data = round_targets(targets)
 
-    return render_template('create_dog_profile.html', breeds=breeds, statuses=statuses, user_id=user_id)
+        return render_template('create_dog_profile.html', breeds=breed_repository.names, statuses=statuses, target_data=target_data, user_id=user_id)
+
+    return render_template('create_dog_profile.html', breeds=breed_repository.names, statuses=statuses, user_id=user_id)
 
 # 編輯狗狗檔案
 @app.route('/edit_dog_profile/<name>', methods=['GET', 'POST'])
@@ -873,52 +863,21 @@ def edit_dog_profile(name):
         status = request.form.get('status')
 
         if not all([new_name, birthday, weight, breed, status]):
-            return render_template('edit_dog_profile.html', dog_data=dog_data_dict, breeds=breeds, statuses=statuses, error="請填寫所有欄位！", user_id=user_id)
+            return render_template('edit_dog_profile.html', dog_data=dog_data_dict, breeds=breed_repository.names, statuses=statuses, error="請填寫所有欄位！", user_id=user_id)
 
         try:
             weight = float(weight)
             datetime.strptime(birthday, '%Y-%m-%d')  # 驗證日期格式
         except ValueError:
-            return render_template('edit_dog_profile.html', dog_data=dog_data_dict, breeds=breeds, statuses=statuses, error="體重必須為數字，生日格式必須為 YYYY-MM-DD！", user_id=user_id)
+            return render_template('edit_dog_profile.html', dog_data=dog_data_dict, breeds=breed_repository.names, statuses=statuses, error="體重必須為數字，生日格式必須為 YYYY-MM-DD！", user_id=user_id)
 
         # 如果名稱改變，檢查新名稱是否已存在
-        if new_name != name:
-            db_name = f'dog_database_{user_id}.db'
-            conn = sqlite3.connect(db_name)
-            c = conn.cursor()
-            c.execute("SELECT name FROM dogs WHERE name = ?", (new_name,))
-            if c.fetchone():
-                conn.close()
-                return render_template('edit_dog_profile.html', dog_data=dog_data_dict, breeds=breeds, statuses=statuses, error="此名字已存在，請使用其他名字！", user_id=user_id)
-            conn.close()
-
-        # 更新資料庫
-        save_dog_data(user_id, new_name, birthday, weight, breed, status)
-
-        # 如果名稱改變，更新 daily_records 表中的名稱
-        if new_name != name:
-            db_name = f'dog_database_{user_id}.db'
-            conn = sqlite3.connect(db_name)
-            c = conn.cursor()
-            c.execute("UPDATE daily_records SET name = ? WHERE name = ?", (new_name, name))
-            conn.commit()
-            conn.close()
-
-        # 計算新的目標數據
-        status_index = statuses.index(status) + 1
-        rer = daily_calories.calculate_RER(weight)
-        af_min, af_max = daily_calories.get_AF_for_status(str(status_index))
-        der_min = daily_calories.calculate_DER(rer, af_min)
-        der_max = daily_calories.calculate_DER(rer, af_max)
-        min_water, max_water = daily_calories.calculate_water_intake(weight)
-
-        target_data = {
-            'rer': round(rer, 2),
-            'der_min': round(der_min, 2),
-            'der_max': round(der_max, 2),
-            'min_water': round(min_water, 2),
-            'max_water': round(max_water, 2)
-        }
+        if new_name != name and dog_exists(user_id, new_name):
+            return render_template('edit_dog_profile.html', dog_data=dog_data_dict, breeds=breed_repository.names, statuses=statuses, error="此名字已存在，請使用其他名字！", user_id=user_id)
+
+        # 更新資料庫並重新計算儲存的目標數據（如果名稱改變，daily_records 表中的名稱會一併更新）
+        targets = update_dog(user_id, name, new_name, birthday, weight, breed, status).result()
+        target_data = round_targets(targets)
 
         # 更新 dog_data_dict 以顯示最新的資料
         dog_data_dict['name'] = new_name
@@ -927,9 +886,9 @@ def edit_dog_profile(name):
         dog_data_dict['breed'] = breed
         dog_data_dict['status'] = status
 
-        return render_template('edit_dog_profile.html', dog_data=dog_data_dict, breeds=breeds, statuses=statuses, target_data=target_data, user_id=user_id)
+        return render_template('edit_dog_profile.html', dog_data=dog_data_dict, breeds=breed_repository.names, statuses=statuses, target_data=target_data, user_id=user_id)
 
-    return render_template('edit_dog_profile.html', dog_data=dog_data_dict, breeds=breeds, statuses=statuses, user_id=user_id)
+    return render_template('edit_dog_profile.html', dog_data=dog_data_dict, breeds=breed_repository.names, statuses=statuses, user_id=user_id)
 
 # 狗狗檔案 - 初始頁面
 @app.route('/dog_profile')
@@ -962,21 +921,19 @@ def dog_profile_detail(name):
     # 計算健康資訊
     health_info = get_health_info(breed) if breed else None
 
-    # 計算今日目標
+    # 讀取儲存的今日目標
     rer = None
     der_min = None
     der_max = None
     min_water = None
     max_water = None
-    if status:
-        status_index = statuses.index(status) + 1
-        rer = daily_calories.calculate_RER(weight)
-        af_min, af_max = daily_calories.get_AF_for_status(str(status_index))
-        der_min = int(daily_calories.calculate_DER(rer, af_min))
-        der_max = int(daily_calories.calculate_DER(rer, af_max))
-        min_water, max_water = daily_calories.calculate_water_intake(weight)
-        min_water = int(min_water)
-        max_water = int(max_water)
+    targets = get_dog_targets(user_id, name)
+    if targets:
+        rer = targets['rer']
+        der_min = int(targets['der_min'])
+        der_max = int(targets['der_max'])
+        min_water = int(targets['min_water'])
+        max_water = int(targets['max_water'])
 
     # 獲取今日已攝取
     record = get_daily_record(user_id, name)
@@ -997,6 +954,94 @@ def dog_profile_detail(name):
                           water=water, calories_progress=calories_progress, calories_progress_rounded=calories_progress_rounded,
                           water_progress=water_progress, water_progress_rounded=water_progress_rounded, user_id=user_id)
 
+# 將每日目標熱量與水量四捨五入到小數點後兩位（沒有目標時返回 None）
+def round_targets(targets):
+    if not targets:
+        return None
+    return {key: round(value, 2) for key, value in targets.items()}
+
+# 攝取歷史 API：?user_id=&from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=day|week|month
+@app.route('/api/dogs/<name>/history')
+def intake_history(name):
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': '缺少 user_id 參數'}), 400
+
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in HISTORY_GRANULARITIES:
+        return jsonify({'error': 'granularity 必須為 day、week 或 month'}), 400
+
+    try:
+        end = datetime.strptime(request.args.get('to') or today(), '%Y-%m-%d')
+        start = datetime.strptime(request.args.get('from'), '%Y-%m-%d') if request.args.get('from') else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': '日期格式必須為 YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'error': 'from 不可晚於 to'}), 400
+
+    if not dog_exists(user_id, name):
+        return jsonify({'error': '找不到該狗狗資料'}), 404
+    targets = round_targets(get_dog_targets(user_id, name))
+
+    points = []
+    for period, calories, water, days in get_intake_history(user_id, name, start.strftime('%Y-%m-%d'),
+                                                          end.strftime('%Y-%m-%d'), granularity):
+        # 週 / 月以有紀錄的天數平均後再與每日目標比較
+        avg_calories = calories / days if days else 0
+        avg_water = water / days if days else 0
+        points.append({
+            'period': period,
+            'calories': calories,
+            'water': water,
+            'days': days,
+            'avg_calories': round(avg_calories, 2),
+            'avg_water': round(avg_water, 2),
+            'calories_pct': round(avg_calories / targets['der_max'] * 100, 1) if targets and targets['der_max'] else None,
+            'water_pct': round(avg_water / targets['max_water'] * 100, 1) if targets and targets['max_water'] else None
+        })
+
+    return jsonify({
+        'name': name,
+        'granularity': granularity,
+        'from': start.strftime('%Y-%m-%d'),
+        'to': end.strftime('%Y-%m-%d'),
+        'targets': targets,
+        'points': points
+    })
+
+# 匯出資料：?user_id=（省略時匯出所有使用者，需管理權限）&format=ndjson|csv
+@app.route('/export')
+def export_data():
+    user_id = request.args.get('user_id')
+    if not user_id and not is_admin_request():
+        return "匯出所有使用者需要管理權限", 403
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return "format 必須為 ndjson 或 csv", 400
+    records = data_transfer.export_records(user_id)
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(data_transfer.serialize(records, fmt)), mimetype=mimetype)
+
+# 匯入資料（需管理權限）：?format=ndjson|csv&skip=已提交筆數（續傳用）
+@app.route('/import', methods=['POST'])
+def import_data():
+    if not is_admin_request():
+        return "匯入資料需要管理權限", 403
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return "format 必須為 ndjson 或 csv", 400
+    try:
+        skip = int(request.args.get('skip', 0))
+    except ValueError:
+        return "skip 必須為整數", 400
+    stats = data_transfer.TransferStats()
+    try:
+        committed = data_transfer.import_records(data_transfer.parse(request.stream, fmt), skip=skip, stats=stats)
+    except (ValueError, KeyError) as e:
+        # 回傳已提交的筆數，修正資料後可用 skip 從該處繼續
+        return jsonify(dict(stats.summary(), committed=skip + stats.rows, error=str(e))), 400
+    return jsonify(dict(stats.summary(), committed=committed))
+
 # 刪除寵物檔案
 @app.route('/delete_dog/<name>', methods=['POST'])
 def delete_dog(name):
@@ -1005,22 +1050,13 @@ def delete_dog(name):
         app.logger.error("缺少 user_id 參數")
         return "缺少 user_id 參數", 400
 
-    db_name = f'dog_database_{user_id}.db'
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
     try:
-        # 刪除 dogs 表中的寵物資料
-        c.execute("DELETE FROM dogs WHERE name = ?", (name,))
-        # 同時刪除 daily_records 表中的相關紀錄
-        c.execute("DELETE FROM daily_records WHERE name = ?", (name,))
-        conn.commit()
+        # 刪除 dogs 表中的寵物資料，同時刪除 daily_records 表中的相關紀錄
+        delete_dog_data(user_id, name)
         app.logger.info(f"Successfully deleted dog: {name} for user {user_id}")
     except Exception as e:
         app.logger.error(f"Error deleting dog {name} for user {user_id}: {str(e)}")
-        conn.rollback()
         return redirect(url_for('dog_profile', user_id=user_id, error="刪除失敗，請稍後再試！"))
-    finally:
-        conn.close()
     return redirect(url_for('dog_profile', user_id=user_id))
 
 # 紀錄今日攝取 - 輸入頁面
@@ -1054,18 +1090,11 @@ def record_daily_intake():
         # 檢查是否至少填寫了一個欄位
         if not calories_input and not water_input:
             # 重新計算目標值和已攝取值以顯示進度條
-            dog_data = get_dog_data(user_id, name)
-            if dog_data:
-                _, _, weight, _, status, _ = dog_data
-                if status:
-                    status_index = statuses.index(status) + 1
-                    rer = daily_calories.calculate_RER(weight)
-                    af_min, af_max = daily_calories.get_AF_for_status(str(status_index))
-                    der_min = int(daily_calories.calculate_DER(rer, af_min))
-                    der_max = int(daily_calories.calculate_DER(rer, af_max))
-                    target_calories = der_max
-                    min_water, max_water = daily_calories.calculate_water_intake(weight)
-                    target_water = int(max_water)
+            if any(dog[0] == name for dog in dogs):
+                targets = get_dog_targets(user_id, name)
+                if targets:
+                    target_calories = int(targets['der_max'])
+                    target_water = int(targets['max_water'])
 
                 # 獲取當前記錄（如果存在）
                 current_record = get_daily_record(user_id, name)
@@ -1080,37 +1109,22 @@ def record_daily_intake():
                                   consumed_calories=consumed_calories, consumed_water=consumed_water)
 
         try:
-            # 獲取當前記錄（如果存在）
-            current_record = get_daily_record(user_id, name)
-            current_calories, current_water = current_record if current_record else (0, 0)
-
             # 處理輸入值，允許空值
             calories = int(float(calories_input)) if calories_input else 0
             water = int(float(water_input)) if water_input else 0
 
-            # 累加熱量和水量
-            total_calories = current_calories + calories
-            total_water = current_water + water
-
-            # 儲存累加後的資料
-            save_daily_record(user_id, name, total_calories, total_water)
+            # 新增一筆餵食事件，並在資料庫內原子性地累加今日熱量和水量
+            record_intake(user_id, name, calories, water, source='manual')
 
             # 提交後重定向到 dog_profile_detail，傳遞狗狗名稱和 user_id
             return redirect(url_for('dog_profile_detail', name=name, user_id=user_id))
         except ValueError:
             # 重新計算目標值和已攝取值以顯示進度條
-            dog_data = get_dog_data(user_id, name)
-            if dog_data:
-                _, _, weight, _, status, _ = dog_data
-                if status:
-                    status_index = statuses.index(status) + 1
-                    rer = daily_calories.calculate_RER(weight)
-                    af_min, af_max = daily_calories.get_AF_for_status(str(status_index))
-                    der_min = int(daily_calories.calculate_DER(rer, af_min))
-                    der_max = int(daily_calories.calculate_DER(rer, af_max))
-                    target_calories = der_max
-                    min_water, max_water = daily_calories.calculate_water_intake(weight)
-                    target_water = int(max_water)
+            if any(dog[0] == name for dog in dogs):
+                targets = get_dog_targets(user_id, name)
+                if targets:
+                    target_calories = int(targets['der_max'])
+                    target_water = int(targets['max_water'])
 
                 # 獲取當前記錄（如果存在）
                 current_record = get_daily_record(user_id, name)
@@ -1125,18 +1139,11 @@ def record_daily_intake():
                                   consumed_calories=consumed_calories, consumed_water=consumed_water)
 
     # GET 請求：顯示表單時計算目標值和已攝取值
-    dog_data = get_dog_data(user_id, name)
-    if dog_data:
-        _, _, weight, _, status, _ = dog_data
-        if status:
-            status_index = statuses.index(status) + 1
-            rer = daily_calories.calculate_RER(weight)
-            af_min, af_max = daily_calories.get_AF_for_status(str(status_index))
-            der_min = int(daily_calories.calculate_DER(rer, af_min))
-            der_max = int(daily_calories.calculate_DER(rer, af_max))
-            target_calories = der_max
-            min_water, max_water = daily_calories.calculate_water_intake(weight)
-            target_water = int(max_water)
+    if any(dog[0] == name for dog in dogs):
+        targets = get_dog_targets(user_id, name)
+        if targets:
+            target_calories = int(targets['der_max'])
+            target_water = int(targets['max_water'])
 
         # 獲取當前記錄（如果存在）
         current_record = get_daily_record(user_id, name)
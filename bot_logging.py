@@ -0,0 +1,168 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import time
+
+# LINE 的 user / group / room ID 格式
+LINE_ID_PATTERN = re.compile(r'\b[UCR][0-9a-f]{32}\b')
+# webhook body 中的 replyToken 以及 HTTP 標頭中的 Bearer token
+TOKEN_PATTERNS = [
+    re.compile(r'("replyToken"\s*:\s*")[^"]*(")'),
+    re.compile(r'(Bearer\s+)[A-Za-z0-9+/=._\-]+()'),
+]
+
+_secrets = set()
+_listener = None
+_queue_handler = None
+
+
+def add_secret(value):
+    """登記需要遮蔽的機密字串（例如 channel access token）"""
+    if value:
+        _secrets.add(value)
+
+
+def redact(text):
+    """遮蔽文字中的 LINE ID、token 以及已登記的機密字串"""
+    text = LINE_ID_PATTERN.sub(lambda m: m.group(0)[0] + '***', text)
+    for pattern in TOKEN_PATTERNS:
+        text = pattern.sub(r'\1***\2', text)
+    for secret in _secrets:
+        text = text.replace(secret, '***')
+    return text
+
+
+def parse_sample_rates(spec):
+    """
+    解析取樣率設定
+    參數:
+        spec (str): 例如 "request_body=0.01,diagnostics=0.1"
+    返回:
+        dict: {category: rate}
+    """
+    rates = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        category, rate = item.split('=', 1)
+        try:
+            rates[category.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    依 extra={'category': ...} 對日誌做取樣，在呼叫端執行，
+    被捨棄的紀錄不會進入佇列。WARNING 以上的紀錄一律保留。
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, 'category', None), 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """將日誌輸出為單行 JSON，並在背景執行緒中完成遮蔽"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': redact(record.getMessage()),
+        }
+        category = getattr(record, 'category', None)
+        if category:
+            entry['category'] = category
+        if record.exc_info:
+            entry['exc'] = redact(self.formatException(record.exc_info))
+        elif record.exc_text:
+            entry['exc'] = redact(record.exc_text)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """佇列已滿時直接捨棄紀錄，不讓日誌寫入阻塞請求"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # 例外堆疊在呼叫端先轉成文字，其餘格式化與遮蔽留給背景執行緒
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(level=None, sample_rates=None, max_queue_size=None, stream=None):
+    """
+    設定以佇列為基礎的非同步日誌：呼叫端只做取樣與入列，
+    JSON 格式化、遮蔽與輸出由背景寫入執行緒處理。
+    參數可由環境變數 LOG_LEVEL、LOG_SAMPLE_RATES、LOG_QUEUE_SIZE 設定。
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _queue_handler
+
+    level = level or os.getenv('LOG_LEVEL', 'INFO')
+    if sample_rates is None:
+        sample_rates = parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', 'request_body=0.01'))
+    max_queue_size = max_queue_size or int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+    log_queue = queue.Queue(maxsize=max_queue_size)
+    _queue_handler = _DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    return _queue_handler
+
+
+def shutdown_logging():
+    """寫出佇列中剩餘的紀錄並停止背景寫入執行緒"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats():
+    """回傳日誌佇列的統計資料"""
+    if _queue_handler is None:
+        return {}
+    return {
+        'queue_depth': _queue_handler.queue.qsize(),
+        'dropped': _queue_handler.dropped,
+    }
@@ -0,0 +1,285 @@
+import csv
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+from typing import NamedTuple
+from breed_search import BreedSearchIndex
+
+logger = logging.getLogger(__name__)
+
+# 品種資料檔
+BREEDS_CSV = 'dog_breeds.csv'
+
+# 品種的英文名稱（petmd 網址與英文搜尋用）
+BREED_NAMES_EN = {
+    "吉娃娃": "Chihuahua",
+    "博美犬": "Pomeranian",
+    "約克夏": "Yorkshire Terrier",
+    "西施犬": "Shih Tzu",
+    "馬爾濟斯": "Maltese",
+    "臘腸犬": "Dachshund",
+    "玩具貴賓犬": "Toy Poodle",
+    "巨型貴賓犬": "Standard Poodle",
+    "柴犬": "Shiba Inu",
+    "雪納瑞": "Miniature Schnauzer",
+    "拉布拉多": "Labrador Retriever",
+    "黃金獵犬": "Golden Retriever",
+    "法國鬥牛犬": "French Bulldog",
+    "比熊犬": "Bichon Frise",
+    "西高地白梗": "West Highland White Terrier",
+    "柯基": "Pembroke Welsh Corgi",
+    "哈士奇": "Siberian Husky",
+    "薩摩耶": "Samoyed",
+    "杜賓犬": "Doberman Pinscher",
+    "大丹犬": "Great Dane",
+    "羅威納": "Rottweiler",
+    "鬆獅犬": "Chow Chow",
+    "米格魯": "Beagle",
+    "邊境牧羊犬": "Border Collie",
+}
+
+
+class Breed(NamedTuple):
+    """dog_breeds.csv 的一列（不可變），recommendation 為預先組好的飲食建議文字"""
+    id: str
+    breed_name: str
+    height: str
+    weight: str
+    lifespan: str
+    health: str
+    recommended_tests: str
+    what_to_feed: str
+    how_to_feed: str
+    nutritional_tips: str
+    recommendation: str
+
+    def health_info(self):
+        return {
+            'height': self.height,
+            'weight': self.weight,
+            'lifespan': self.lifespan,
+            'recommended_tests': self.recommended_tests
+        }
+
+
+# CSV 中的欄位（不含預先組好的 recommendation）
+CSV_COLUMNS = Breed._fields[:-1]
+
+
+def render_recommendation(row):
+    """組出品種的飲食建議文字"""
+    return (f"🐶 品種: {row['breed_name']}\n\n"
+            f"📏 身高: {row['height']}\n\n"
+            f"⚖️ 體重: {row['weight']}\n\n"
+            f"⏳ 壽命: {row['lifespan']}\n\n"
+            f"❤️ 健康狀況: {row['health']}\n\n"
+            f"🩺 建議檢查: {row['recommended_tests']}\n\n"
+            f"🍽️ 餵什麼: {row['what_to_feed']}\n\n"
+            f"🥄 如何餵養: {row['how_to_feed']}\n\n"
+            f"💡 營養建議: {row['nutritional_tips']}")
+
+
+def load_breeds(path=BREEDS_CSV):
+    """
+    讀取品種資料檔
+    參數:
+        path (str): CSV 檔案路徑
+    返回:
+        dict: {breed_name: Breed}，依檔案中的順序；品種名稱重複時以第一列為準
+    缺少欄位時拋出 ValueError
+    """
+    breeds = {}
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+        for row in reader:
+            row = {column: (row.get(column) or '') for column in CSV_COLUMNS}
+            if row['breed_name'] and row['breed_name'] not in breeds:
+                breeds[row['breed_name']] = Breed(recommendation=render_recommendation(row), **row)
+    return breeds
+
+
+class BreedSnapshot(NamedTuple):
+    """某一版品種資料：建立後不再修改，重新載入時整份替換"""
+    breeds: MappingProxyType     # {breed_name: Breed}（唯讀）
+    names: tuple
+    index: BreedSearchIndex
+    version: int
+    mtime_ns: int
+    loaded_at: float
+
+
+def build_snapshot(path, version):
+    """
+    在呼叫端的執行緒讀取並建立一份新的快照
+    讀取前後檔案的 mtime / 大小不同時（檔案寫到一半）拋出 RuntimeError，稍後再試。
+    """
+    before = os.stat(path)
+    breeds = load_breeds(path)
+    after = os.stat(path)
+    if (before.st_mtime_ns, before.st_size) != (after.st_mtime_ns, after.st_size):
+        raise RuntimeError(f"{path} changed while loading")
+    if not breeds:
+        raise ValueError(f"{path} contains no breeds")
+    names = tuple(breeds)
+    index = BreedSearchIndex(
+        [(name, name) for name in names] +
+        [(BREED_NAMES_EN[name], name) for name in names if name in BREED_NAMES_EN]
+    )
+    return BreedSnapshot(MappingProxyType(breeds), names, index, version, after.st_mtime_ns, time.time())
+
+
+class BreedRepository:
+    """
+    以品種名稱為鍵的品種資料，查詢為一次 dict 存取
+    資料放在不可變的 BreedSnapshot 中；重新載入時在背景執行緒建立新快照，
+    再以一次屬性指派替換，讀取端不需加鎖，也不會看到載入到一半的資料。
+    參數:
+        path (str): CSV 檔案路徑
+        poll_interval (float): 檢查檔案 mtime 的間隔秒數（0 表示只在 request_reload() 時重新載入）
+    """
+
+    def __init__(self, path=BREEDS_CSV, poll_interval=0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._snapshot = build_snapshot(path, 1)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._reloads = 0
+        self._failures = 0
+        self._last_error = None
+        self._failed_mtime_ns = None
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def names(self):
+        return self._snapshot.names
+
+    def get(self, breed_name):
+        """返回 Breed，找不到時返回 None"""
+        return self._snapshot.breeds.get(breed_name)
+
+    def search(self, query, limit=5):
+        """以中文、英文或部分名稱模糊搜尋品種，返回 [(品種名稱, 分數), ...]"""
+        return self._snapshot.index.search(query, limit=limit)
+
+    def __len__(self):
+        return len(self._snapshot.breeds)
+
+    def reload(self, force=False):
+        """
+        檔案有變動（或 force=True）時重新載入；失敗時保留目前的快照
+        返回:
+            bool: 是否換上了新的快照
+        """
+        current = self._snapshot
+        mtime_ns = None
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+            # 同一版檔案載入失敗過就不再重試，等檔案再次變動
+            if not force and mtime_ns in (current.mtime_ns, self._failed_mtime_ns):
+                return False
+            snapshot = build_snapshot(self.path, current.version + 1)
+        except Exception as e:
+            self._failed_mtime_ns = mtime_ns
+            self._failures += 1
+            self._last_error = str(e)
+            logger.error(f"Failed to reload {self.path}: {e}")
+            return False
+        self._snapshot = snapshot
+        self._reloads += 1
+        self._last_error = None
+        logger.info(f"Reloaded {len(snapshot.breeds)} breeds from {self.path} (version {snapshot.version})")
+        return True
+
+    def request_reload(self):
+        """請背景執行緒立即重新載入（不在呼叫端的執行緒解析檔案）"""
+        self._wakeup.set()
+
+    def _watch(self):
+        while not self._stop.is_set():
+            forced = self._wakeup.wait(self.poll_interval or None)
+            if self._stop.is_set():
+                break
+            self._wakeup.clear()
+            self.reload(force=forced)
+
+    def start(self):
+        """啟動檢查檔案變動與處理 request_reload() 的背景執行緒"""
+        self._thread = threading.Thread(target=self._watch, name="breed-reloader", daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version,
+            'breeds': len(snapshot.breeds),
+            'loaded_at': datetime.fromtimestamp(snapshot.loaded_at).isoformat(timespec='seconds'),
+            'reloads': self._reloads,
+            'failures': self._failures,
+            'last_error': self._last_error,
+        }
+
+    def shutdown(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+def benchmark(path=BREEDS_CSV, lookups=100000):
+    """
+    比較 pandas DataFrame 逐列比對與本模組的載入時間及查詢延遲，並量測模糊搜尋的延遲
+    返回:
+        dict: 各方式的載入秒數與平均每次查詢的微秒數（未安裝 pandas 時只有本模組的數字）
+    """
+    result = {}
+    start = time.perf_counter()
+    repository = BreedRepository(path)
+    result['repository_load_seconds'] = round(time.perf_counter() - start, 4)
+    names = repository.names
+    start = time.perf_counter()
+    for i in range(lookups):
+        repository.get(names[i % len(names)]).recommendation
+    result['repository_lookup_us'] = round((time.perf_counter() - start) / lookups * 1e6, 3)
+    queries = ['黃金', 'golden retriever', 'shiba', '博美', 'chihuahau', '貴賓']
+    start = time.perf_counter()
+    for i in range(lookups):
+        repository.search(queries[i % len(queries)])
+    result['search_us'] = round((time.perf_counter() - start) / lookups * 1e6, 3)
+
+    try:
+        start = time.perf_counter()
+        import pandas as pd
+        result['pandas_import_seconds'] = round(time.perf_counter() - start, 4)
+    except ImportError:
+        return result
+    start = time.perf_counter()
+    df = pd.read_csv(path)
+    result['pandas_load_seconds'] = round(time.perf_counter() - start, 4)
+    pandas_lookups = min(lookups, 2000)
+    start = time.perf_counter()
+    for i in range(pandas_lookups):
+        breed_data = df[df['breed_name'] == names[i % len(names)]]
+        render_recommendation(breed_data.iloc[0])
+    result['pandas_lookup_us'] = round((time.perf_counter() - start) / pandas_lookups * 1e6, 3)
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="品種資料的載入與查詢效能比較")
+    parser.add_argument('--path', default=BREEDS_CSV, help="品種資料檔")
+    parser.add_argument('--lookups', type=int, default=100000, help="查詢次數")
+    args = parser.parse_args()
+    for key, value in benchmark(args.path, args.lookups).items():
+        print(f"{key}: {value}")
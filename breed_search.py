@@ -0,0 +1,90 @@
+import re
+import unicodedata
+from collections import Counter
+
+# 使用的字元 n-gram 長度；中文字另外加上單字，讓「柴」這類單字查詢也能命中
+NGRAM_SIZES = (2, 3)
+
+# 比對前移除的空白與標點
+_SEPARATORS = re.compile(r"[\s\-_.,'’·・()（）]+")
+
+
+def normalize(text):
+    """全形轉半形、轉小寫並移除空白與標點"""
+    return _SEPARATORS.sub('', unicodedata.normalize('NFKC', text).lower())
+
+
+def _is_cjk(char):
+    return '一' <= char <= '鿿'
+
+
+def ngrams(text):
+    """
+    將正規化後的文字拆成字元 n-gram
+    返回:
+        Counter: {gram: 出現次數}
+    """
+    grams = Counter(char for char in text if _is_cjk(char))
+    for n in NGRAM_SIZES:
+        grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+    if not grams and text:
+        grams[text] = 1  # 只有一個非中文字元時以整段文字當作 gram
+    return grams
+
+
+class BreedSearchIndex:
+    """
+    品種名稱（中文與英文別名）的字元 n-gram 倒排索引
+    查詢時只走訪查詢字串 n-gram 的 posting list，以 Dice 係數排序，
+    不需要逐一比對每個品種。
+    參數:
+        aliases (iterable): (別名, 品種名稱)，品種名稱本身也應列為別名
+    """
+
+    def __init__(self, aliases):
+        self._exact = {}
+        self._breeds = []        # 別名編號 -> 品種名稱
+        self._sizes = []         # 別名編號 -> n-gram 總數
+        self._postings = {}      # gram -> [(別名編號, 次數), ...]
+        for alias, breed_name in aliases:
+            key = normalize(alias)
+            if not key:
+                continue
+            self._exact.setdefault(key, breed_name)
+            grams = ngrams(key)
+            alias_id = len(self._breeds)
+            self._breeds.append(breed_name)
+            self._sizes.append(sum(grams.values()))
+            for gram, count in grams.items():
+                self._postings.setdefault(gram, []).append((alias_id, count))
+
+    def search(self, query, limit=5, min_score=0.3):
+        """
+        參數:
+            query (str): 使用者輸入的品種名稱（中文、英文或部分名稱）
+            limit (int): 最多返回的候選數
+            min_score (float): 分數低於此值的候選不返回
+        返回:
+            list: [(品種名稱, 分數), ...] 依分數由高到低；完全符合某個別名時分數為 1.0
+        """
+        key = normalize(query)
+        if not key:
+            return []
+        exact = self._exact.get(key)
+        grams = ngrams(key)
+        query_size = sum(grams.values())
+        overlaps = Counter()
+        for gram, count in grams.items():
+            for alias_id, alias_count in self._postings.get(gram, ()):
+                overlaps[alias_id] += min(count, alias_count)
+
+        scores = {}
+        if exact:
+            scores[exact] = 1.0
+        for alias_id, overlap in overlaps.items():
+            score = 2 * overlap / (query_size + self._sizes[alias_id])
+            breed_name = self._breeds[alias_id]
+            if score >= min_score and score > scores.get(breed_name, 0):
+                scores[breed_name] = score
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(breed_name, round(score, 3)) for breed_name, score in ranked[:limit]]
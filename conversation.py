@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 步驟處理函數的返回值：維持目前的狀態不變
+STAY = object()
+
+
+class ConversationContext:
+    """
+    單一訊息的處理上下文
+    屬性:
+        event: LINE webhook 事件
+        user_id (str): 使用者 ID
+        text (str): 使用者輸入（圖片訊息為 None）
+        state (dict): 使用者目前的狀態（沒有時為 None）
+    """
+
+    def __init__(self, engine, store, event, user_id, text, state, replier):
+        self.engine = engine
+        self.store = store
+        self.event = event
+        self.user_id = user_id
+        self.text = text
+        self.state = state
+        self.claimed = False
+        self._replier = replier
+
+    @property
+    def step(self):
+        return self.state.get('step') if self.state else None
+
+    def reply(self, text, quick_reply=None):
+        self._replier(self.event, text, quick_reply)
+
+    def claim(self, next_state=None):
+        """
+        在執行有副作用的動作前先以 compare-and-set 搶下目前步驟，
+        重送的事件或同時送達的訊息只會有一個成功。
+        """
+        if not self.store.compare_and_set_step(self.user_id, self.step, next_state):
+            return False
+        self.claimed = True
+        return True
+
+
+class ConversationEngine:
+    """
+    宣告式的對話狀態機
+    以 dict 對應步驟名稱與選單指令到處理函數，分派為 O(1)，
+    新增流程不會拖慢其他流程。處理函數返回下一個狀態：
+    dict 為新狀態、None 為結束對話、STAY 為維持目前狀態。
+    每個步驟與指令的處理時間會自動統計。
+    """
+
+    def __init__(self, store, replier):
+        self.store = store
+        self.replier = replier
+        self._steps = {}
+        self._commands = {}
+        self._interrupts = {}
+        self._fallback = None
+        self._lock = threading.Lock()
+        self._timings = {}
+
+    def step(self, name):
+        """註冊處於某個步驟時的處理函數"""
+        def decorator(func):
+            self._steps[name] = func
+            return func
+        return decorator
+
+    def command(self, *inputs, interrupt=False):
+        """
+        註冊選單指令的處理函數
+        參數:
+            inputs (str): 觸發的文字
+            interrupt (bool): 是否在任何步驟中都優先處理（例如「退出」）
+        """
+        def decorator(func):
+            table = self._interrupts if interrupt else self._commands
+            for text in inputs:
+                table[text] = func
+            return func
+        return decorator
+
+    def fallback(self, func):
+        """註冊沒有狀態且沒有符合指令時的處理函數"""
+        self._fallback = func
+        return func
+
+    def handles_step(self, name):
+        return name in self._steps
+
+    def handle(self, event, user_id, text=None):
+        """分派一則訊息，返回處理的 key（沒有處理時為 None）"""
+        state = self.store.get(user_id)
+        ctx = ConversationContext(self, self.store, event, user_id, text, state, self.replier)
+
+        if text in self._interrupts:
+            key, func = f"command:{text}", self._interrupts[text]
+        elif state:
+            func = self._steps.get(ctx.step)
+            if func is None:
+                return None
+            key = f"step:{ctx.step}"
+        elif text in self._commands:
+            key, func = f"command:{text}", self._commands[text]
+        elif self._fallback is not None:
+            key, func = "fallback", self._fallback
+        else:
+            return None
+
+        start = time.perf_counter()
+        try:
+            next_state = func(ctx)
+            if next_state is not STAY and not ctx.claimed:
+                self._transition(ctx, next_state)
+        finally:
+            self._record(key, time.perf_counter() - start)
+        return key
+
+    def _transition(self, ctx, next_state):
+        if next_state is None and not ctx.state:
+            return
+        if not self.store.compare_and_set_step(ctx.user_id, ctx.step, next_state):
+            logger.info(f"State of {ctx.user_id} changed concurrently, transition from {ctx.step} skipped")
+
+    def _record(self, key, elapsed):
+        with self._lock:
+            timing = self._timings.setdefault(key, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            timing['count'] += 1
+            timing['total_ms'] += elapsed * 1000
+            timing['max_ms'] = max(timing['max_ms'], elapsed * 1000)
+
+    def stats(self):
+        """返回每個步驟與指令的次數、平均與最大處理時間"""
+        with self._lock:
+            return {
+                key: {'count': t['count'], 'avg_ms': round(t['total_ms'] / t['count'], 2), 'max_ms': round(t['max_ms'], 2)}
+                for key, t in self._timings.items()
+            }
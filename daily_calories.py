@@ -1,4 +1,51 @@
 # daily_calories.py
+import math
+import time
+
+try:
+    import numpy as np
+except ImportError:  # 只有批次函數需要 NumPy，單筆計算不受影響
+    np = None
+
+# 狗狗狀態名稱，順序即為狀態編號（1-13）
+STATUSES = [
+    '正在發育的幼犬(4個月以下)',
+    '正在發育的幼犬(4個月-1歲)',
+    '結紮成年犬(1-7歲)',
+    '未結紮成年犬(1-7歲)',
+    '輕度減肥成年犬',
+    '重度減肥成年犬',
+    '過瘦成年犬',
+    '輕度活動量',
+    '劇烈活動量',
+    '高齡犬',
+    '懷孕中的狗媽媽',
+    '哺乳中的狗媽媽',
+    '生病成年犬'
+]
+
+# 狀態名稱 -> 狀態編號
+STATUS_CODES = {status: index + 1 for index, status in enumerate(STATUSES)}
+
+# 各狀態的活動因子 (af_min, af_max)
+AF_TABLE = {
+    "1": (2.5, 3.0),  # 正在發育的幼犬(4個月以下)
+    "2": (2.0, 2.5),  # 正在發育的幼犬(4個月-1歲)
+    "3": (1.4, 1.6),  # 結紮成年犬(1-7歲)
+    "4": (1.6, 1.8),  # 未結紮成年犬(1-7歲)
+    "5": (1.2, 1.4),  # 輕度減肥成年犬
+    "6": (1.0, 1.2),  # 重度減肥成年犬
+    "7": (1.6, 2.0),  # 過瘦成年犬
+    "8": (1.2, 1.4),  # 輕度活動量
+    "9": (2.0, 2.5),  # 劇烈活動量
+    "10": (1.2, 1.4), # 高齡犬
+    "11": (1.8, 2.0), # 懷孕中的狗媽媽
+    "12": (2.2, 2.5), # 哺乳中的狗媽媽
+    "13": (1.0, 1.5)  # 生病成年犬
+}
+
+# 狀態編號無效時使用的活動因子
+DEFAULT_AF = (1.6, 1.8)
 
 def calculate_RER(weight):
     """
@@ -41,19 +88,143 @@ def get_AF_for_status(status):
     返回:
         tuple: (af_min, af_max)
     """
-    af_dict = {
-        "1": (2.5, 3.0),  # 正在發育的幼犬(4個月以下)
-        "2": (2.0, 2.5),  # 正在發育的幼犬(4個月-1歲)
-        "3": (1.4, 1.6),  # 結紮成年犬(1-7歲)
-        "4": (1.6, 1.8),  # 未結紮成年犬(1-7歲)
-        "5": (1.2, 1.4),  # 輕度減肥成年犬
-        "6": (1.0, 1.2),  # 重度減肥成年犬
-        "7": (1.6, 2.0),  # 過瘦成年犬
-        "8": (1.2, 1.4),  # 輕度活動量
-        "9": (2.0, 2.5),  # 劇烈活動量
-        "10": (1.2, 1.4), # 高齡犬
-        "11": (1.8, 2.0), # 懷孕中的狗媽媽
-        "12": (2.2, 2.5), # 哺乳中的狗媽媽
-        "13": (1.0, 1.5)  # 生病成年犬
+    return AF_TABLE.get(status, DEFAULT_AF)  # 如果狀態編號無效，返回默認值
+
+def calculate_targets(weight, status_code):
+    """
+    計算每日目標熱量與水量
+    參數:
+        weight (float): 狗狗的體重（公斤）
+        status_code (int | str): 狀態編號（1-13）
+    返回:
+        dict: rer, der_min, der_max（kcal）與 min_water, max_water（ml）
+    """
+    rer = calculate_RER(weight)
+    af_min, af_max = get_AF_for_status(str(status_code))
+    min_water, max_water = calculate_water_intake(weight)
+    return {
+        'rer': rer,
+        'der_min': calculate_DER(rer, af_min),
+        'der_max': calculate_DER(rer, af_max),
+        'min_water': min_water,
+        'max_water': max_water
+    }
+
+# ---- 批次計算（NumPy）：一次處理整批狗狗，exact=True 時結果與上面的單筆函數逐位元相同 ----
+
+if np is not None:
+    # 以狀態編號為索引的活動因子表；索引 0 與超出範圍的編號對應到預設值
+    AF_MIN = np.array([DEFAULT_AF[0]] + [AF_TABLE[str(code)][0] for code in range(1, len(STATUSES) + 1)])
+    AF_MAX = np.array([DEFAULT_AF[1]] + [AF_TABLE[str(code)][1] for code in range(1, len(STATUSES) + 1)])
+    # 以 libm 的 pow 逐一計算，與 Python 的 ** 運算結果完全相同
+    _exact_pow = np.frompyfunc(math.pow, 2, 1)
+
+
+def _as_array(values, dtype):
+    if np is None:
+        raise ImportError("批次計算需要安裝 numpy")
+    return np.asarray(values, dtype=dtype)
+
+
+def calculate_RER_batch(weights, exact=True):
+    """
+    批次計算 RER
+    參數:
+        weights (array-like): 體重陣列（公斤）
+        exact (bool): True 時與 calculate_RER 逐位元相同；False 時改用 NumPy 的向量化 pow，
+                      速度快數倍，但在支援 SIMD 的 CPU 上可能與單筆結果差幾個 ULP
+    返回:
+        numpy.ndarray: RER 陣列（kcal）
+    """
+    weights = _as_array(weights, np.float64)
+    if exact:
+        return 70 * _exact_pow(weights, 0.75).astype(np.float64)
+    return 70 * np.power(weights, 0.75)
+
+
+def calculate_DER_batch(rer, af):
+    """批次計算 DER（rer 與 af 為等長陣列或純量）"""
+    return _as_array(rer, np.float64) * _as_array(af, np.float64)
+
+
+def calculate_water_intake_batch(weights):
+    """
+    批次計算每日喝水量
+    返回:
+        tuple: (min_water, max_water) 兩個陣列（ml）
+    """
+    weights = _as_array(weights, np.float64)
+    return weights * 50, weights * 60
+
+
+def get_AF_for_status_batch(status_codes):
+    """
+    批次查詢活動因子
+    參數:
+        status_codes (array-like): 狀態編號整數陣列（1-13，其他值使用預設值）
+    返回:
+        tuple: (af_min, af_max) 兩個陣列
+    """
+    codes = _as_array(status_codes, np.int64)
+    index = np.where((codes >= 1) & (codes <= len(STATUSES)), codes, 0)
+    return AF_MIN[index], AF_MAX[index]
+
+
+def calculate_targets_batch(weights, status_codes, exact=True):
+    """
+    批次計算每日目標熱量與水量（用於報表或夜間批次作業）
+    參數:
+        weights (array-like): 體重陣列（公斤）
+        status_codes (array-like): 狀態編號整數陣列
+        exact (bool): 見 calculate_RER_batch
+    返回:
+        dict: rer, der_min, der_max, min_water, max_water 各為一個陣列
+    """
+    rer = calculate_RER_batch(weights, exact=exact)
+    af_min, af_max = get_AF_for_status_batch(status_codes)
+    min_water, max_water = calculate_water_intake_batch(weights)
+    return {
+        'rer': rer,
+        'der_min': calculate_DER_batch(rer, af_min),
+        'der_max': calculate_DER_batch(rer, af_max),
+        'min_water': min_water,
+        'max_water': max_water
     }
-    return af_dict.get(status, (1.6, 1.8))  # 如果狀態編號無效，返回默認值
\ No newline at end of file
+
+
+def benchmark(count=1000000, seed=0):
+    """
+    比較逐筆計算與批次計算 count 隻狗的耗時，並檢查結果是否一致
+    返回:
+        dict: 各方式的秒數，以及與逐筆結果不同的數值個數
+    """
+    rng = np.random.default_rng(seed)
+    weights = rng.uniform(0.5, 90.0, count)
+    codes = rng.integers(0, len(STATUSES) + 2, count)  # 含無效編號，檢查預設值
+
+    start = time.perf_counter()
+    scalar = [calculate_targets(weight, code) for weight, code in zip(weights.tolist(), codes.tolist())]
+    scalar_seconds = time.perf_counter() - start
+    expected = {key: np.array([row[key] for row in scalar]) for key in scalar[0]}
+
+    result = {'dogs': count, 'scalar_seconds': round(scalar_seconds, 3)}
+    for name, exact in (('exact', True), ('fast', False)):
+        start = time.perf_counter()
+        batch = calculate_targets_batch(weights, codes, exact=exact)
+        result[f'{name}_seconds'] = round(time.perf_counter() - start, 3)
+        result[f'{name}_mismatches'] = int(sum(np.count_nonzero(batch[key] != expected[key]) for key in expected))
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="逐筆與批次計算每日目標的效能比較")
+    parser.add_argument('--count', type=int, default=1000000, help="模擬的狗狗數量")
+    args = parser.parse_args()
+    report = benchmark(args.count)
+    print(f"{report['dogs']} 隻狗")
+    print(f"逐筆計算：{report['scalar_seconds']} 秒")
+    for name in ('exact', 'fast'):
+        seconds = report[f'{name}_seconds']
+        speedup = report['scalar_seconds'] / seconds if seconds else float('inf')
+        print(f"批次計算（{name}）：{seconds} 秒，快 {speedup:.1f} 倍，與逐筆結果不同的數值 {report[f'{name}_mismatches']} 個")
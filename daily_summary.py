@@ -0,0 +1,265 @@
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from linebot.v3.messaging import MulticastRequest, PushMessageRequest, TextMessage
+from linebot.v3.messaging.exceptions import ApiException
+from dog_storage import connect, init_db, today
+
+logger = logging.getLogger(__name__)
+
+# LINE multicast 單次最多的收件人數
+MAX_RECIPIENTS = 500
+
+# 產生 retry key 用的命名空間，同一天同一批收件人的同一則訊息永遠得到同一個 key
+RETRY_KEY_NAMESPACE = uuid.UUID('5b0e6f8e-3c1a-4d6e-9a57-1f0d2c7b8e41')
+
+
+def collect_summaries(date):
+    """
+    一次查詢所有狗狗當天的攝取量與儲存的目標，依使用者分組
+    參數:
+        date (str): 日期 YYYY-MM-DD
+    返回:
+        generator: (user_id, [(name, calories, water, der_max, max_water), ...])，依 user_id 排序
+    """
+    init_db()
+    cursor = connect().execute('''SELECT d.user_id, d.name, COALESCE(r.calories, 0), COALESCE(r.water, 0), d.der_max, d.max_water
+                                  FROM dogs d LEFT JOIN daily_records r
+                                      ON r.user_id = d.user_id AND r.name = d.name AND r.date = ?
+                                  ORDER BY d.user_id, d.name''', (date,))
+    for user_id, rows in itertools.groupby(cursor, key=lambda row: row[0]):
+        yield user_id, [row[1:] for row in rows]
+
+
+def _progress(value, target, unit):
+    if not target:
+        return f"{int(value)} {unit}"
+    return f"{int(value)}/{int(target)} {unit}（{round(value / target * 100)}%）"
+
+
+def render_summary(date, dogs):
+    """將一位使用者所有狗狗的攝取量與目標組成一則文字訊息"""
+    lines = [f"📅 {date} 今日攝取摘要"]
+    for name, calories, water, der_max, max_water in dogs:
+        lines.append("")
+        lines.append(f"🐶 {name}")
+        lines.append(f"🔥 熱量：{_progress(calories, der_max, 'kcal')}")
+        lines.append(f"💧 喝水：{_progress(water, max_water, 'ml')}")
+    return "\n".join(lines)
+
+
+def plan_batches(messages, max_recipients=MAX_RECIPIENTS):
+    """
+    將內容相同的訊息合併，再切成每批最多 max_recipients 位收件人
+    參數:
+        messages (iterable): (user_id, text)
+    返回:
+        list: [(text, [user_id, ...]), ...]，順序固定，中斷後重新規劃會得到相同的批次
+    """
+    groups = {}
+    for user_id, text in messages:
+        groups.setdefault(text, []).append(user_id)
+    batches = []
+    for text in sorted(groups):
+        recipients = sorted(groups[text])
+        for i in range(0, len(recipients), max_recipients):
+            batches.append((text, recipients[i:i + max_recipients]))
+    return batches
+
+
+def retry_key(date, text, recipients):
+    digest = hashlib.sha256("\n".join([date, text] + recipients).encode('utf-8')).hexdigest()
+    return str(uuid.uuid5(RETRY_KEY_NAMESPACE, digest))
+
+
+class RateLimiter:
+    """
+    讓呼叫間隔至少 1/rps 秒（多個執行緒共用時依序排隊）
+    參數:
+        rps (float): 每秒最多的請求數（0 表示不限制）
+    """
+
+    def __init__(self, rps):
+        self.interval = 1.0 / rps if rps > 0 else 0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+        self.waited = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            self.waited += delay
+            time.sleep(delay)
+
+
+def _read_checkpoint(path, date):
+    """讀取 checkpoint 中當天已送出的使用者（日期不同時視為沒有）"""
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('date') == date:
+            return set(checkpoint.get('sent', []))
+    return set()
+
+
+def _write_checkpoint(path, date, sent):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'date': date, 'sent': sorted(sent)}, f)
+    os.replace(tmp_path, path)
+
+
+def send_batch(line_client, date, text, recipients):
+    """以 push（單一收件人）或 multicast 送出一批；LINE 已接受過同一個 retry key 時視為成功"""
+    key = retry_key(date, text, recipients)
+    messages = [TextMessage(text=text)]
+    try:
+        if len(recipients) == 1:
+            line_client.push_message(PushMessageRequest(to=recipients[0], messages=messages), retry_key=key)
+        else:
+            line_client.multicast(MulticastRequest(to=recipients, messages=messages), retry_key=key)
+    except ApiException as e:
+        if e.status != 409:
+            raise
+        logger.info(f"Summary batch for {len(recipients)} users was already accepted")
+
+
+def run_daily_summary(line_client, date=None, checkpoint_path=None, rps=20, max_recipients=MAX_RECIPIENTS, dry_run=False):
+    """
+    計算所有使用者當天的攝取摘要並以 push / multicast 送出
+    參數:
+        line_client (LineApiClient): LINE API 客戶端
+        date (str): 日期 YYYY-MM-DD（預設為 RECORD_TZ 的今天）
+        checkpoint_path (str): 記錄已送出使用者的檔案，中斷後重新執行只送剩下的使用者
+        rps (float): 每秒最多的 API 請求數
+        max_recipients (int): 每次 multicast 的收件人上限
+        dry_run (bool): 只規劃批次，不實際送出
+    返回:
+        dict: 使用者數、批次數、成功 / 失敗數與耗時
+    """
+    start = time.monotonic()
+    date = date or today()
+    sent = _read_checkpoint(checkpoint_path, date)
+    messages = ((user_id, render_summary(date, dogs)) for user_id, dogs in collect_summaries(date) if user_id not in sent)
+    batches = plan_batches(messages, max_recipients)
+    summary = {
+        'date': date,
+        'skipped_users': len(sent),
+        'users': sum(len(recipients) for _, recipients in batches),
+        'batches': len(batches),
+        'sent_batches': 0,
+        'failed_batches': 0,
+    }
+    limiter = RateLimiter(rps)
+    for text, recipients in batches:
+        if dry_run:
+            continue
+        limiter.acquire()
+        try:
+            send_batch(line_client, date, text, recipients)
+        except Exception as e:
+            # 失敗的批次不寫入 checkpoint，下次執行會重送
+            summary['failed_batches'] += 1
+            logger.error(f"Failed to send summary to {len(recipients)} users: {e}")
+            continue
+        summary['sent_batches'] += 1
+        sent.update(recipients)
+        if checkpoint_path:
+            _write_checkpoint(checkpoint_path, date, sent)
+    summary['rate_limited_seconds'] = round(limiter.waited, 3)
+    summary['seconds'] = round(time.monotonic() - start, 3)
+    return summary
+
+
+class DailySummaryScheduler:
+    """
+    每天在指定的當地時間執行一次 job 的背景執行緒
+    參數:
+        job (callable): job(date)，date 為當地日期 YYYY-MM-DD
+        at (str): 執行時間 HH:MM
+        tz (str): 時區名稱
+    """
+
+    def __init__(self, job, at='20:00', tz='Asia/Taipei'):
+        self.job = job
+        self.hour, self.minute = (int(part) for part in at.split(':'))
+        self.tz = ZoneInfo(tz)
+        self._stop = threading.Event()
+        self._thread = None
+        self._runs = 0
+        self._last_run = None
+        self._last_result = None
+        self._next_run = None
+
+    def next_run(self, now=None):
+        """下一次執行的時間（今天的執行時間已過則為明天）"""
+        now = now or datetime.now(self.tz)
+        run_at = now.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if run_at <= now:
+            run_at = (run_at + timedelta(days=1)).replace(hour=self.hour, minute=self.minute)
+        return run_at
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._next_run = self.next_run()
+            if self._stop.wait((self._next_run - datetime.now(self.tz)).total_seconds()):
+                break
+            try:
+                self._last_result = self.job(self._next_run.strftime('%Y-%m-%d'))
+            except Exception:
+                logger.exception("Daily summary job failed")
+            self._runs += 1
+            self._last_run = datetime.now(self.tz).isoformat(timespec='seconds')
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="daily-summary", daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        return {
+            'runs': self._runs,
+            'last_run': self._last_run,
+            'next_run': self._next_run.isoformat(timespec='seconds') if self._next_run else None,
+            'last_result': self._last_result,
+        }
+
+    def shutdown(self, timeout=10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from linebot.v3.messaging import Configuration
+    from line_client import LineApiClient
+
+    parser = argparse.ArgumentParser(description="送出每日攝取摘要")
+    parser.add_argument('--date', default=None, help="日期 YYYY-MM-DD（預設為今天）")
+    parser.add_argument('--checkpoint', default=None, help="記錄已送出使用者的檔案，重新執行時跳過這些使用者")
+    parser.add_argument('--rps', type=float, default=float(os.getenv('DAILY_SUMMARY_RPS', '20')), help="每秒最多的 API 請求數")
+    parser.add_argument('--dry-run', action='store_true', help="只列出批次，不實際送出")
+    args = parser.parse_args()
+
+    load_dotenv('information.env')
+    # LINE_API_HOST 可指向本機的 LINE API 替身做測試
+    configuration = Configuration(access_token=os.getenv('LINE_CHANNEL_ACCESS_TOKEN'), host=os.getenv('LINE_API_HOST'))
+    client = LineApiClient(configuration)
+    try:
+        result = run_daily_summary(client, args.date, args.checkpoint, rps=args.rps, dry_run=args.dry_run)
+    finally:
+        client.close()
+    print(json.dumps(result, ensure_ascii=False))
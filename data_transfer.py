@@ -0,0 +1,291 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+from dog_storage import checkout, init_db
+from db_migrations import rebuild_rollups, backfill_targets
+
+# 匯出 / 匯入的資料表與欄位（主鍵欄位在前，用於依主鍵分頁與續傳）
+TABLES = {
+    'dogs': {
+        'key': ['user_id', 'name'],
+        'columns': ['user_id', 'name', 'birthday', 'weight', 'breed', 'status'],
+    },
+    'daily_records': {
+        'key': ['user_id', 'name', 'date'],
+        'columns': ['user_id', 'name', 'date', 'calories', 'water'],
+    },
+}
+
+# CSV 格式的欄位（兩個資料表欄位的聯集，以 table 欄位區分）
+CSV_FIELDS = ['table', 'user_id', 'name', 'birthday', 'weight', 'breed', 'status', 'date', 'calories', 'water']
+
+
+class TransferStats:
+    """記錄處理筆數與速度"""
+
+    def __init__(self):
+        self.rows = 0
+        self.start = time.monotonic()
+
+    def summary(self):
+        elapsed = time.monotonic() - self.start
+        return {
+            'rows': self.rows,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(self.rows / elapsed, 1) if elapsed > 0 else 0,
+        }
+
+
+def export_records(user_id=None, resume_after=None, chunk_size=1000, stats=None):
+    """
+    以產生器依序輸出 dogs 與 daily_records，每次只從資料庫讀取一頁
+    參數:
+        user_id (str): 只匯出此使用者（None 表示全部使用者）
+        resume_after (dict): 上一次匯出的最後一筆，從它之後繼續
+        chunk_size (int): 每頁筆數
+    返回:
+        generator: 每筆為 {'table': ..., 欄位: 值}
+    """
+    init_db()
+    tables = list(TABLES)
+    if resume_after:
+        tables = tables[tables.index(resume_after['table']):]
+
+    # 整個匯出期間持有同一條連線（客戶端讀取緩慢時也不會被閒置清理關閉）
+    with checkout() as conn:
+        for table in tables:
+            spec = TABLES[table]
+            key = spec['key']
+            last = None
+            if resume_after and resume_after['table'] == table:
+                last = [resume_after[column] for column in key]
+            while True:
+                conditions, params = [], []
+                if user_id is not None:
+                    conditions.append("user_id = ?")
+                    params.append(user_id)
+                if last is not None:
+                    # 以主鍵做 keyset 分頁，不需 OFFSET，也能從任一筆之後續傳
+                    conditions.append(f"({', '.join(key)}) > ({', '.join('?' * len(key))})")
+                    params.extend(last)
+                where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+                rows = conn.execute(f"SELECT {', '.join(spec['columns'])} FROM {table} {where} "
+                                    f"ORDER BY {', '.join(key)} LIMIT ?", params + [chunk_size]).fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    record = {'table': table}
+                    record.update(zip(spec['columns'], row))
+                    if stats is not None:
+                        stats.rows += 1
+                    yield record
+                last = list(rows[-1][:len(key)])
+
+
+def to_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def to_csv(records, header=True):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction='ignore')
+    if header:
+        writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def serialize(records, fmt, header=True):
+    """將記錄轉成 NDJSON 或 CSV 文字串流"""
+    if fmt == 'csv':
+        return to_csv(records, header=header)
+    return to_ndjson(records)
+
+
+def parse_ndjson(lines):
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def parse_csv(lines):
+    decoded = (line.decode('utf-8') if isinstance(line, bytes) else line for line in lines)
+    for row in csv.DictReader(decoded):
+        # CSV 中的空字串代表 NULL
+        yield {column: (value if value != '' else None) for column, value in row.items()}
+
+
+def parse(lines, fmt):
+    """將 NDJSON 或 CSV 文字串流解析成記錄"""
+    if fmt == 'csv':
+        return parse_csv(lines)
+    return parse_ndjson(lines)
+
+
+def _write_batches(conn, batches):
+    dogs = batches['dogs']
+    if dogs:
+        conn.executemany("INSERT OR REPLACE INTO dogs (user_id, name, birthday, weight, breed, status) VALUES (?, ?, ?, ?, ?, ?)", dogs)
+    records = batches['daily_records']
+    if records:
+        conn.executemany("INSERT OR REPLACE INTO daily_records (user_id, name, date, calories, water) VALUES (?, ?, ?, ?, ?)", records)
+        # 匯入的每日彙總取代當天原有的事件，讓事件加總與彙總一致
+        days = [(r[0], r[1], r[2]) for r in records]
+        conn.executemany("DELETE FROM intake_events WHERE user_id = ? AND name = ? AND date = ?", days)
+        conn.executemany('''INSERT INTO intake_events (user_id, name, date, created_at, source, calories, water)
+                            VALUES (?, ?, ?, ? || 'T00:00:00', 'imported', COALESCE(?, 0), COALESCE(?, 0))''',
+                         [(r[0], r[1], r[2], r[2], r[3], r[4]) for r in records])
+
+
+def _flush(conn, batches, last_index):
+    users = {row[0] for rows in batches.values() for row in rows}
+    try:
+        with conn:
+            _write_batches(conn, batches)
+            # 匯入的每日彙總可能改變每週 / 每月彙總；匯入的寵物需計算每日目標
+            # 與資料在同一個交易內完成，續傳或中途失敗時已提交的部分也是一致的
+            for user_id in users:
+                rebuild_rollups(conn, user_id)
+                backfill_targets(conn, user_id)
+    except sqlite3.IntegrityError as e:
+        raise ValueError(f"Invalid data in records up to {last_index + 1}: {e}") from e
+    batches['dogs'] = []
+    batches['daily_records'] = []
+
+
+def import_records(records, chunk_size=1000, skip=0, on_chunk=None, stats=None):
+    """
+    分批寫入記錄，每 chunk_size 筆為一個交易
+    參數:
+        records (iterable): export_records 格式的記錄
+        skip (int): 略過前幾筆（續傳時為上次已提交的筆數）
+        on_chunk (callable): 每次提交後呼叫 on_chunk(已提交筆數)
+    返回:
+        int: 已提交的總筆數（含略過的筆數）
+    缺少鍵值欄位或資料表不明時拋出 ValueError
+    """
+    init_db()
+    batches = {'dogs': [], 'daily_records': []}
+    committed = skip
+    pending = 0
+    index = -1
+    # 串流讀取請求內容期間持有同一條連線
+    with checkout() as conn:
+        for index, record in enumerate(records):
+            if index < skip:
+                continue
+            table = record.get('table')
+            if table not in TABLES:
+                raise ValueError(f"Unknown table in record {index + 1}: {table}")
+            missing = [column for column in TABLES[table]['key'] if record.get(column) in (None, '')]
+            if missing:
+                raise ValueError(f"Missing {', '.join(missing)} in record {index + 1}")
+            batches[table].append(tuple(record.get(column) for column in TABLES[table]['columns']))
+            pending += 1
+            if pending >= chunk_size:
+                _flush(conn, batches, index)
+                committed += pending
+                if stats is not None:
+                    stats.rows += pending
+                pending = 0
+                if on_chunk:
+                    on_chunk(committed)
+        if pending:
+            _flush(conn, batches, index)
+            committed += pending
+            if stats is not None:
+                stats.rows += pending
+            if on_chunk:
+                on_chunk(committed)
+    return committed
+
+
+def _last_exported_record(path, fmt):
+    """讀取既有匯出檔的最後一筆，作為續傳的起點"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        records = parse(f, fmt)
+        last = None
+        for last in records:
+            pass
+        return last
+
+
+def _read_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('committed', 0)
+    return 0
+
+
+def _write_checkpoint(path, committed):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'committed': committed}, f)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="匯出 / 匯入狗狗資料與每日紀錄（NDJSON 或 CSV）")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="匯出資料")
+    export_parser.add_argument('output', help="輸出檔案路徑（- 表示標準輸出）")
+    export_parser.add_argument('--user-id', default=None, help="只匯出此使用者")
+    export_parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    export_parser.add_argument('--chunk-size', type=int, default=1000)
+    export_parser.add_argument('--resume', action='store_true', help="從既有輸出檔的最後一筆之後繼續匯出")
+
+    import_parser = subparsers.add_parser('import', help="匯入資料")
+    import_parser.add_argument('input', help="輸入檔案路徑（- 表示標準輸入）")
+    import_parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    import_parser.add_argument('--chunk-size', type=int, default=1000)
+    import_parser.add_argument('--checkpoint', default=None, help="記錄已提交筆數的檔案，重新執行時從該處繼續")
+
+    args = parser.parse_args()
+    stats = TransferStats()
+
+    if args.command == 'export':
+        resume_after = _last_exported_record(args.output, args.format) if args.resume and args.output != '-' else None
+        records = export_records(args.user_id, resume_after=resume_after, chunk_size=args.chunk_size, stats=stats)
+        if args.output == '-':
+            out = sys.stdout
+        else:
+            out = open(args.output, 'a' if resume_after else 'w', encoding='utf-8', newline='')
+        try:
+            for chunk in serialize(records, args.format, header=resume_after is None):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    else:
+        skip = _read_checkpoint(args.checkpoint)
+        on_chunk = (lambda committed: _write_checkpoint(args.checkpoint, committed)) if args.checkpoint else None
+        source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8', newline='')
+        try:
+            import_records(parse(source, args.format), chunk_size=args.chunk_size, skip=skip, on_chunk=on_chunk, stats=stats)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+    summary = stats.summary()
+    print(f"{args.command}: {summary['rows']} 筆，耗時 {summary['seconds']} 秒（{summary['rows_per_second']} 筆/秒）", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def default_pragmas():
+    """
+    每條新連線只套用一次的 PRAGMA，可由環境變數調整
+    DB_WRITE_MODE=batched 時預設改用 WAL，讀取不會被寫入阻塞，
+    且 WAL 模式下 synchronous=NORMAL 仍能保證資料庫不會損毀。
+    返回:
+        list: [(pragma, value), ...]
+    """
+    batched = os.getenv('DB_WRITE_MODE', 'sync').lower() == 'batched'
+    return [
+        ('journal_mode', os.getenv('DB_JOURNAL_MODE', 'WAL' if batched else 'DELETE')),
+        ('synchronous', os.getenv('DB_SYNCHRONOUS', 'NORMAL' if batched else 'FULL')),
+        ('cache_size', os.getenv('DB_CACHE_SIZE', '-8000')),      # 負數代表 KiB，約 8MB
+        ('mmap_size', os.getenv('DB_MMAP_SIZE', '67108864')),     # 64MB
+    ]
+
+
+class _ThreadConnections:
+    """單一執行緒的連線快取；執行緒結束、threading.local 釋放它時由 weakref.finalize 關閉剩下的連線"""
+
+    def __init__(self):
+        self.entries = OrderedDict()     # path -> [conn, last_used, checkouts]
+        self.lock = threading.Lock()     # 擁有者執行緒與清理執行緒共用
+
+
+class ConnectionManager:
+    """
+    每個工作執行緒各自保留一組 SQLite 連線的 LRU 快取
+    sqlite3 連線只在建立它的執行緒使用，因此以 threading.local 區分；
+    背景清理執行緒每 sweep_interval 秒關閉閒置過久的連線，
+    執行緒結束時它的連線也會一併關閉並從 open_connections 扣除。
+    需要長時間持有同一條連線時（串流匯出、匯入、遷移）請用 checkout()，
+    借出中的連線不會被清理或淘汰，歸還時才重新計算閒置時間。
+    參數:
+        max_per_thread (int): 每個執行緒最多保留的連線數
+        idle_timeout (float): 連線閒置超過此秒數即關閉
+        pragmas (list): 新連線要套用的 PRAGMA
+        sweep_interval (float): 清理閒置連線的間隔秒數（預設為 idle_timeout 的一半）
+    """
+
+    def __init__(self, max_per_thread=8, idle_timeout=300, pragmas=None, sweep_interval=None):
+        self.max_per_thread = max_per_thread
+        self.idle_timeout = idle_timeout
+        self.pragmas = pragmas if pragmas is not None else default_pragmas()
+        self.sweep_interval = sweep_interval or max(idle_timeout / 2, 1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._caches = weakref.WeakSet()
+        self._sweeper = None
+        self._open = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._idle_closed = 0
+        self._thread_exits = 0
+
+    def _cache(self):
+        cache = getattr(self._local, 'cache', None)
+        if cache is None:
+            cache = self._local.cache = _ThreadConnections()
+            weakref.finalize(cache, self._release, cache.entries, cache.lock)
+            with self._lock:
+                self._caches.add(cache)
+                if self._sweeper is None:
+                    self._sweeper = threading.Thread(target=self._sweep_loop, name="db-connection-sweeper", daemon=True)
+                    self._sweeper.start()
+        return cache
+
+    def _open_connection(self, path):
+        # 只有擁有者執行緒會使用這條連線；關閉則可能在清理執行緒或 finalizer 中進行
+        conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        for pragma, value in self.pragmas:
+            conn.execute(f"PRAGMA {pragma}={value}")
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._open -= 1
+
+    def _release(self, entries, lock):
+        """執行緒結束時關閉它留下的連線"""
+        with lock:
+            conns = [entry[0] for entry in entries.values()]
+            entries.clear()
+        for conn in conns:
+            self._close(conn)
+        with self._lock:
+            self._thread_exits += 1
+
+    def sweep_idle(self):
+        """關閉所有執行緒中閒置超過 idle_timeout 的連線（借出中的連線不算閒置）"""
+        now = time.monotonic()
+        with self._lock:
+            caches = list(self._caches)
+        for cache in caches:
+            with cache.lock:
+                idle = [path for path, (_, last_used, checkouts) in cache.entries.items()
+                        if not checkouts and now - last_used > self.idle_timeout]
+                conns = [cache.entries.pop(path)[0] for path in idle]
+            for conn in conns:
+                self._close(conn)
+            with self._lock:
+                self._idle_closed += len(conns)
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            self.sweep_idle()
+
+    def get(self, path):
+        """取得目前執行緒對 path 的連線（沒有時建立並套用 PRAGMA）"""
+        cache = self._cache()
+        now = time.monotonic()
+        with cache.lock:
+            entry = cache.entries.get(path)
+            if entry is not None:
+                entry[1] = now
+                cache.entries.move_to_end(path)
+        if entry is not None:
+            with self._lock:
+                self._hits += 1
+            return entry[0]
+
+        conn = self._open_connection(path)
+        with self._lock:
+            self._misses += 1
+            self._open += 1
+        with cache.lock:
+            cache.entries[path] = [conn, now, 0]
+            # 借出中的連線不淘汰，此時可暫時超過 max_per_thread
+            evicted = [old_path for old_path, entry in cache.entries.items() if old_path != path and not entry[2]]
+            evicted = [cache.entries.pop(old_path)[0] for old_path in evicted[:max(len(cache.entries) - self.max_per_thread, 0)]]
+        for old_conn in evicted:
+            self._close(old_conn)
+            with self._lock:
+                self._evictions += 1
+        return conn
+
+    @contextmanager
+    def checkout(self, path):
+        """
+        借出目前執行緒對 path 的連線，離開 with 區塊前不會被清理執行緒關閉或被 LRU 淘汰
+        同一條連線可巢狀借出；全部歸還時以歸還時間重新計算閒置時間。
+        """
+        conn = self.get(path)
+        cache = self._cache()
+        with cache.lock:
+            entry = cache.entries[path]
+            entry[2] += 1
+        try:
+            yield conn
+        finally:
+            with cache.lock:
+                entry[2] -= 1
+                entry[1] = time.monotonic()
+
+    def close_thread_connections(self):
+        """關閉目前執行緒持有的所有連線"""
+        cache = self._cache()
+        with cache.lock:
+            conns = [entry[0] for entry in cache.entries.values()]
+            cache.entries.clear()
+        for conn in conns:
+            self._close(conn)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'open_connections': self._open,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0,
+                'evictions': self._evictions,
+                'idle_closed': self._idle_closed,
+                'thread_exits': self._thread_exits,
+            }
+
+
+# 全程序共用的連線管理器
+connections = ConnectionManager(
+    max_per_thread=int(os.getenv('DB_CONNECTIONS_PER_THREAD', '8')),
+    idle_timeout=float(os.getenv('DB_IDLE_TIMEOUT', '300'))
+)
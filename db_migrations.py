@@ -0,0 +1,191 @@
+import logging
+import threading
+import daily_calories
+
+logger = logging.getLogger(__name__)
+
+
+# 版本 1：建立 dogs 與 daily_records 表
+def _create_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS dogs (
+        user_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        birthday TEXT,
+        weight REAL,
+        PRIMARY KEY (user_id, name)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS daily_records (
+        user_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        calories REAL,
+        water REAL,
+        FOREIGN KEY (user_id, name) REFERENCES dogs (user_id, name),
+        PRIMARY KEY (user_id, name, date)
+    )''')
+
+
+def _add_column(conn, table, column, column_type):
+    columns = [col[1] for col in conn.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+# 版本 2：dogs 表新增 breed 欄位
+def _add_breed(conn):
+    _add_column(conn, 'dogs', 'breed', 'TEXT')
+
+
+# 版本 3：dogs 表新增 status 欄位
+def _add_status(conn):
+    _add_column(conn, 'dogs', 'status', 'TEXT')
+
+
+# 版本 4：每次餵食一筆的事件紀錄；daily_records 改為由事件累加的每日彙總
+# 既有的每日彙總各轉成一筆 source='migrated' 的事件，讓事件加總與彙總一致
+def _create_intake_events(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS intake_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        source TEXT NOT NULL,
+        calories REAL NOT NULL DEFAULT 0,
+        water REAL NOT NULL DEFAULT 0
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_intake_events_dog_date ON intake_events (user_id, name, date)")
+    if conn.execute("SELECT 1 FROM intake_events LIMIT 1").fetchone() is None:
+        conn.execute('''INSERT INTO intake_events (user_id, name, date, created_at, source, calories, water)
+                        SELECT user_id, name, date, date || 'T00:00:00', 'migrated', COALESCE(calories, 0), COALESCE(water, 0)
+                        FROM daily_records''')
+
+
+# 週起始日（星期一）的 SQL 運算式
+WEEK_START_SQL = "date({0}, 'weekday 0', '-6 days')"
+
+
+# 版本 5：每週 / 每月彙總表（寫入時增量更新），並由既有的每日彙總回填
+def _create_rollups(conn):
+    for table, period in (('weekly_records', 'week'), ('monthly_records', 'month')):
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            {period} TEXT NOT NULL,
+            calories REAL NOT NULL DEFAULT 0,
+            water REAL NOT NULL DEFAULT 0,
+            days INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, name, {period})
+        )''')
+    rebuild_rollups(conn)
+
+
+def rebuild_rollups(conn, user_id=None):
+    """由 daily_records 重新計算每週 / 每月彙總（可只處理單一使用者）"""
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+    conn.execute(f'''INSERT OR REPLACE INTO weekly_records (user_id, name, week, calories, water, days)
+                     SELECT user_id, name, {WEEK_START_SQL.format('date')}, SUM(COALESCE(calories, 0)), SUM(COALESCE(water, 0)), COUNT(*)
+                     FROM daily_records {where} GROUP BY user_id, name, {WEEK_START_SQL.format('date')}''', params)
+    conn.execute(f'''INSERT OR REPLACE INTO monthly_records (user_id, name, month, calories, water, days)
+                     SELECT user_id, name, substr(date, 1, 7), SUM(COALESCE(calories, 0)), SUM(COALESCE(water, 0)), COUNT(*)
+                     FROM daily_records {where} GROUP BY user_id, name, substr(date, 1, 7)''', params)
+
+
+# dogs 表中由體重與狀態算出的欄位（寫入時計算並儲存，讀取時不再重算）
+TARGET_COLUMNS = ('status_code', 'rer', 'der_min', 'der_max', 'min_water', 'max_water')
+
+
+def compute_targets(weight, status):
+    """
+    依體重與狀態名稱計算要存進 dogs 表的目標欄位
+    參數:
+        weight (float): 狗狗的體重（公斤）
+        status (str): 狀態名稱（daily_calories.STATUSES 其中之一）
+    返回:
+        tuple: 依 TARGET_COLUMNS 排列；沒有或無法辨識狀態時全部為 None
+    """
+    status_code = daily_calories.STATUS_CODES.get(status)
+    if status_code is None or weight is None:
+        return (None,) * len(TARGET_COLUMNS)
+    targets = daily_calories.calculate_targets(weight, status_code)
+    return (status_code,) + tuple(targets[column] for column in TARGET_COLUMNS[1:])
+
+
+# 版本 6：dogs 表新增狀態編號與每日目標欄位，並回填既有資料
+def _add_targets(conn):
+    _add_column(conn, 'dogs', 'status_code', 'INTEGER')
+    for column in TARGET_COLUMNS[1:]:
+        _add_column(conn, 'dogs', column, 'REAL')
+    backfill_targets(conn)
+
+
+def backfill_targets(conn, user_id=None):
+    """重新計算 dogs 表的目標欄位（批次匯入或合併舊資料後使用，可只處理單一使用者）"""
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+    rows = conn.execute(f"SELECT user_id, name, weight, status FROM dogs {where}", params).fetchall()
+    assignments = ', '.join(f"{column} = ?" for column in TARGET_COLUMNS)
+    conn.executemany(f"UPDATE dogs SET {assignments} WHERE user_id = ? AND name = ?",
+                     [compute_targets(weight, status) + (uid, name) for uid, name, weight, status in rows])
+
+
+# 依序執行的遷移步驟；新增欄位或資料表時在最後面加上一步即可
+# 每一步都必須可重複執行，因為導入版本號之前建立的資料庫 user_version 為 0
+MIGRATIONS = [
+    _create_tables,
+    _add_breed,
+    _add_status,
+    _create_intake_events,
+    _create_rollups,
+    _add_targets,
+]
+
+HEAD_VERSION = len(MIGRATIONS)
+
+# 本程序中已確認為最新版本的資料庫
+_at_head = set()
+_lock = threading.Lock()
+
+
+def ensure_schema(conn, path):
+    """
+    將資料庫遷移到最新版本（以 PRAGMA user_version 記錄目前版本）
+    已確認為最新版本的資料庫直接返回，不執行任何 SQL。
+    參數:
+        conn (sqlite3.Connection): 資料庫連線
+        path (str): 資料庫路徑，用來記錄已完成遷移的資料庫
+    返回:
+        int: 此次執行的遷移步數
+    """
+    if path in _at_head:
+        return 0
+    with _lock:
+        if path in _at_head:
+            return 0
+        applied = migrate(conn)
+        _at_head.add(path)
+        return applied
+
+
+def migrate(conn):
+    # BEGIN IMMEDIATE 讓同時啟動的多個程序依序遷移，取得鎖之後再讀一次版本
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for step in range(version, HEAD_VERSION):
+            MIGRATIONS[step](conn)
+            logger.info(f"Applied schema migration {step + 1}: {MIGRATIONS[step].__name__}")
+        if version < HEAD_VERSION:
+            conn.execute(f"PRAGMA user_version = {HEAD_VERSION}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return max(HEAD_VERSION - version, 0)
+
+
+def reset_cache():
+    """清除已完成遷移的紀錄（資料庫檔案被替換時使用）"""
+    with _lock:
+        _at_head.clear()
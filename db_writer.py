@@ -0,0 +1,155 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    單一寫入執行緒 + 群組提交（group commit）
+    呼叫端送出寫入函數後立即取得 Future；寫入執行緒每累積 batch_size 筆
+    或等待 batch_ms 毫秒就以一個交易提交整批，減少 fsync 次數。
+    每筆寫入各自包在 SAVEPOINT 中，其中一筆失敗不會影響同批的其他寫入。
+    參數:
+        path (str): SQLite 資料庫路徑
+        batch_ms (float): 一批最多等待的毫秒數
+        batch_size (int): 一批最多的寫入筆數
+        pragmas (list): 寫入連線要套用的 PRAGMA
+    """
+
+    def __init__(self, path, batch_ms=20, batch_size=100, pragmas=None):
+        self.path = path
+        self.batch_ms = batch_ms
+        self.batch_size = batch_size
+        self.pragmas = pragmas or []
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._writes = 0
+        self._failed = 0
+        self._max_batch = 0
+        self._commit_total = 0.0
+        self._commit_max = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def submit(self, func, *args):
+        """
+        排入一筆寫入
+        參數:
+            func (callable): func(conn, *args)，在寫入執行緒的交易內執行
+        返回:
+            Future: 提交後設定 func 的返回值或例外
+        """
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("write-behind queue is shut down"))
+            return future
+        self._queue.put((func, args, future))
+        return future
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.batch_ms / 1000
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is None:
+                break
+        return batch
+
+    def _run(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        for pragma, value in self.pragmas:
+            conn.execute(f"PRAGMA {pragma}={value}")
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect(first)
+            if batch[-1] is None:
+                batch.pop()
+                stopping = True
+            self._commit(conn, batch)
+        # 關閉前把剩下的寫入全部提交
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                leftover.append(item)
+        if leftover:
+            self._commit(conn, leftover)
+        conn.close()
+
+    def _commit(self, conn, batch):
+        start = time.monotonic()
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for func, args, future in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    results.append((future, func(conn, *args), None))
+                    conn.execute("RELEASE write")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.exception("Group commit failed")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(future, None, e) for _, _, future in batch]
+
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._batches += 1
+            self._writes += len(batch)
+            self._failed += sum(1 for _, _, error in results if error is not None)
+            self._max_batch = max(self._max_batch, len(batch))
+            self._commit_total += elapsed
+            self._commit_max = max(self._commit_max, elapsed)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._queue.qsize(),
+                'batches': self._batches,
+                'writes': self._writes,
+                'failed_writes': self._failed,
+                'avg_batch_size': round(self._writes / self._batches, 2) if self._batches else 0,
+                'max_batch_size': self._max_batch,
+                'avg_commit_ms': round(self._commit_total / self._batches * 1000, 2) if self._batches else 0,
+                'max_commit_ms': round(self._commit_max * 1000, 2),
+            }
+
+    def shutdown(self, timeout=10):
+        """提交佇列中剩餘的寫入後停止寫入執行緒"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
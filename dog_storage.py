@@ -0,0 +1,361 @@
+import argparse
+import glob
+import logging
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import Future
+from zoneinfo import ZoneInfo
+from db_connections import connections, default_pragmas
+from db_migrations import ensure_schema, rebuild_rollups, backfill_targets, compute_targets, TARGET_COLUMNS
+from db_writer import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+# 所有使用者共用的資料庫檔案，以 user_id 區分資料
+DB_PATH = os.getenv('DOG_DB_PATH', 'dog_database.db')
+
+# DB_WRITE_MODE=batched 時寫入交由單一寫入執行緒群組提交（WAL 模式）
+WRITE_MODE = os.getenv('DB_WRITE_MODE', 'sync').lower()
+writer = None
+if WRITE_MODE == 'batched':
+    writer = WriteBehindQueue(
+        DB_PATH,
+        batch_ms=float(os.getenv('DB_BATCH_MS', '20')),
+        batch_size=int(os.getenv('DB_BATCH_SIZE', '100')),
+        pragmas=default_pragmas()
+    )
+
+# 紀錄日期的時區：每日紀錄、歷史查詢與每日摘要都以這個時區的日期為準
+RECORD_TZ = os.getenv('RECORD_TZ') or os.getenv('DAILY_SUMMARY_TZ', 'Asia/Taipei')
+
+# 舊版每位使用者一個檔案的命名方式
+LEGACY_DB_PATTERN = 'dog_database_*.db'
+
+
+# 取得目前執行緒快取中的共用資料庫連線（不需自行關閉）
+def connect():
+    return connections.get(DB_PATH)
+
+
+# 長時間持有連線時使用（with checkout() as conn），期間不會被閒置清理關閉
+def checkout():
+    return connections.checkout(DB_PATH)
+
+
+# RECORD_TZ 的當地時間（不含時區資訊，與既有紀錄的格式相同）
+def local_now():
+    return datetime.now(ZoneInfo(RECORD_TZ)).replace(tzinfo=None)
+
+
+# RECORD_TZ 的今天日期 YYYY-MM-DD
+def today():
+    return local_now().strftime('%Y-%m-%d')
+
+
+# 初始化共用資料庫：第一次呼叫時執行尚未套用的遷移，之後不執行任何 SQL
+def init_db(user_id=None):
+    ensure_schema(connect(), DB_PATH)
+
+
+# 執行一筆寫入：batched 模式排入寫入佇列，否則直接在目前執行緒提交
+# 返回 Future；wait=True 時等到提交完成（失敗時拋出原本的例外）
+# wait=False 失敗時只記錄在日誌，使用者確認過的寫入必須等待完成後才回覆「已儲存」
+def _write(op, *args, wait=True):
+    if writer is not None:
+        future = writer.submit(op, *args)
+    else:
+        future = Future()
+        conn = connect()
+        try:
+            with conn:
+                future.set_result(op(conn, *args))
+        except Exception as e:
+            future.set_exception(e)
+    if wait:
+        future.result()
+    else:
+        future.add_done_callback(_log_write_error)
+    return future
+
+
+def _log_write_error(future):
+    if future.exception() is not None:
+        logger.error(f"Background write failed: {future.exception()}")
+
+
+# 寫入統計（僅 batched 模式）
+def writer_stats():
+    return writer.stats() if writer is not None else {'mode': WRITE_MODE}
+
+
+# 將資料庫的一列轉成 (name, birthday, weight, breed, status, age)
+def _with_age(row):
+    name, birthday, weight, breed, status = row
+    birth_date = datetime.strptime(birthday, '%Y-%m-%d')
+    age = (local_now() - birth_date).days // 365
+    return name, birthday, weight, breed, status, age
+
+
+# 查詢所有寵物資料（根據 user_id）
+def get_all_dogs(user_id):
+    results = connect().execute("SELECT name, birthday, weight, breed, status FROM dogs WHERE user_id = ?", (user_id,)).fetchall()
+    return [_with_age(result) for result in results]
+
+
+# 查詢寵物基本資料並計算年齡（根據 user_id）
+def get_dog_data(user_id, name):
+    result = connect().execute("SELECT name, birthday, weight, breed, status FROM dogs WHERE user_id = ? AND name = ?",
+                               (user_id, name)).fetchone()
+    if result:
+        return _with_age(result)
+    return None
+
+
+# 查詢儲存的每日目標（根據 user_id），沒有狀態時返回 None
+def get_dog_targets(user_id, name):
+    result = connect().execute(f"SELECT {', '.join(TARGET_COLUMNS)} FROM dogs WHERE user_id = ? AND name = ?",
+                               (user_id, name)).fetchone()
+    return _targets_dict(result)
+
+
+# 將 TARGET_COLUMNS 的值轉成 {'rer': ..., 'der_min': ..., ...}（沒有狀態編號時返回 None）
+def _targets_dict(values):
+    if not values or values[0] is None:
+        return None
+    return dict(zip(TARGET_COLUMNS[1:], values[1:]))
+
+
+# 檢查寵物名稱是否已存在（根據 user_id）
+def dog_exists(user_id, name):
+    return connect().execute("SELECT 1 FROM dogs WHERE user_id = ? AND name = ?", (user_id, name)).fetchone() is not None
+
+
+_TARGET_PLACEHOLDERS = ', '.join('?' * len(TARGET_COLUMNS))
+
+
+# 新增寵物（名稱重複時拋出 sqlite3.IntegrityError），目標值在寫入時一併計算儲存
+# 返回儲存的每日目標（沒有狀態時為 None）
+def _insert_dog(conn, user_id, name, birthday, weight, breed, status):
+    targets = compute_targets(weight, status)
+    conn.execute(f"INSERT INTO dogs (user_id, name, birthday, weight, breed, status, {', '.join(TARGET_COLUMNS)}) "
+                 f"VALUES (?, ?, ?, ?, ?, ?, {_TARGET_PLACEHOLDERS})",
+                 (user_id, name, birthday, weight, breed, status) + targets)
+    return _targets_dict(targets)
+
+
+def create_dog(user_id, name, birthday, weight, breed, status):
+    return _write(_insert_dog, user_id, name, birthday, weight, breed, status)
+
+
+# 儲存寵物基本資料到資料庫（根據 user_id）
+def _replace_dog(conn, user_id, name, birthday, weight, breed, status):
+    targets = compute_targets(weight, status)
+    conn.execute(f"INSERT OR REPLACE INTO dogs (user_id, name, birthday, weight, breed, status, {', '.join(TARGET_COLUMNS)}) "
+                 f"VALUES (?, ?, ?, ?, ?, ?, {_TARGET_PLACEHOLDERS})",
+                 (user_id, name, birthday, weight, breed, status) + targets)
+    return _targets_dict(targets)
+
+
+def save_dog_data(user_id, name, birthday, weight, breed=None, status=None, wait=True):
+    return _write(_replace_dog, user_id, name, birthday, weight, breed, status, wait=wait)
+
+
+# 更新寵物資料並重新計算目標；名稱改變時一併更新每日紀錄（同一個交易內完成）
+def _update_dog(conn, user_id, old_name, name, birthday, weight, breed, status):
+    targets = compute_targets(weight, status)
+    assignments = ', '.join(f"{column} = ?" for column in TARGET_COLUMNS)
+    conn.execute(f"UPDATE dogs SET name = ?, birthday = ?, weight = ?, breed = ?, status = ?, {assignments} WHERE user_id = ? AND name = ?",
+                 (name, birthday, weight, breed, status) + targets + (user_id, old_name))
+    if name != old_name:
+        conn.execute("UPDATE daily_records SET name = ? WHERE user_id = ? AND name = ?", (name, user_id, old_name))
+        for table in ROLLUP_TABLES:
+            conn.execute(f"UPDATE {table} SET name = ? WHERE user_id = ? AND name = ?", (name, user_id, old_name))
+    return _targets_dict(targets)
+
+
+def update_dog(user_id, old_name, name, birthday, weight, breed, status):
+    return _write(_update_dog, user_id, old_name, name, birthday, weight, breed, status)
+
+
+# 刪除寵物以及相關的每日紀錄
+def _delete_dog(conn, user_id, name):
+    conn.execute("DELETE FROM dogs WHERE user_id = ? AND name = ?", (user_id, name))
+    for table in ROLLUP_TABLES:
+        conn.execute(f"DELETE FROM {table} WHERE user_id = ? AND name = ?", (user_id, name))
+
+
+def delete_dog(user_id, name):
+    return _write(_delete_dog, user_id, name)
+
+
+# 某天所屬的週（以星期一的日期表示）與月份
+def week_of(date):
+    day = datetime.strptime(date, '%Y-%m-%d')
+    return (day - timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+
+
+def month_of(date):
+    return date[:7]
+
+
+# 由餵食事件衍生的資料表（改名或刪除寵物時需一併處理）
+ROLLUP_TABLES = ('daily_records', 'intake_events', 'weekly_records', 'monthly_records')
+
+# 歷史查詢的粒度：(資料表, 期間欄位, 將日期轉成期間的函數)
+HISTORY_GRANULARITIES = {
+    'day': ('daily_records', 'date', lambda date: date),
+    'week': ('weekly_records', 'week', week_of),
+    'month': ('monthly_records', 'month', month_of),
+}
+
+# 餵食紀錄的來源（migrated / imported 由資料庫遷移與匯入寫入）
+INTAKE_SOURCES = ('manual', 'ocr', 'yolo', 'migrated', 'imported')
+
+
+# 新增一筆餵食事件，並在同一個交易內以 UPSERT 累加當日、當週與當月彙總
+# 同時送出的多筆紀錄都會被累加，不會因為先讀後寫而遺失
+def _append_intake(conn, user_id, name, date, created_at, source, calories, water):
+    conn.execute("INSERT INTO intake_events (user_id, name, date, created_at, source, calories, water) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                 (user_id, name, date, created_at, source, calories, water))
+    # 第一筆寫入已開始交易並取得寫入鎖，這裡的判斷不會與其他寫入者交錯
+    new_day = conn.execute("SELECT 1 FROM daily_records WHERE user_id = ? AND name = ? AND date = ?",
+                           (user_id, name, date)).fetchone() is None
+    conn.execute('''INSERT INTO daily_records (user_id, name, date, calories, water) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (user_id, name, date) DO UPDATE SET
+                        calories = COALESCE(calories, 0) + excluded.calories,
+                        water = COALESCE(water, 0) + excluded.water''',
+                 (user_id, name, date, calories, water))
+    days = 1 if new_day else 0
+    for table, period, key in (('weekly_records', 'week', week_of(date)), ('monthly_records', 'month', month_of(date))):
+        conn.execute(f'''INSERT INTO {table} (user_id, name, {period}, calories, water, days) VALUES (?, ?, ?, ?, ?, ?)
+                         ON CONFLICT (user_id, name, {period}) DO UPDATE SET
+                             calories = calories + excluded.calories,
+                             water = water + excluded.water,
+                             days = days + excluded.days''',
+                     (user_id, name, key, calories, water, days))
+
+
+# 記錄一次餵食（根據 user_id）
+def record_intake(user_id, name, calories, water, source='manual', wait=True):
+    if source not in INTAKE_SOURCES:
+        raise ValueError(f"Unknown intake source: {source}")
+    now = local_now()
+    calories = int(calories)  # 轉為整數
+    water = int(water)  # 轉為整數
+    return _write(_append_intake, user_id, name, now.strftime('%Y-%m-%d'), now.isoformat(timespec='seconds'),
+                  source, calories, water, wait=wait)
+
+
+# 查詢一段期間內的每日 / 每週 / 每月攝取量（主鍵範圍查詢，一次讀取）
+def get_intake_history(user_id, name, start, end, granularity='day'):
+    """
+    參數:
+        start (str): 起始日期 YYYY-MM-DD（含）
+        end (str): 結束日期 YYYY-MM-DD（含）
+        granularity (str): 'day'、'week' 或 'month'
+    返回:
+        list: [(period, calories, water, days), ...] 依期間排序
+    """
+    table, period, to_period = HISTORY_GRANULARITIES[granularity]
+    days = '1' if granularity == 'day' else 'days'
+    return connect().execute(f'''SELECT {period}, COALESCE(calories, 0), COALESCE(water, 0), {days} FROM {table}
+                                 WHERE user_id = ? AND name = ? AND {period} BETWEEN ? AND ?
+                                 ORDER BY {period}''',
+                             (user_id, name, to_period(start), to_period(end))).fetchall()
+
+
+# 查詢某天的所有餵食事件（依時間排序）
+def get_intake_events(user_id, name, date=None):
+    date = date or today()
+    return connect().execute('''SELECT created_at, source, calories, water FROM intake_events
+                                WHERE user_id = ? AND name = ? AND date = ? ORDER BY id''',
+                             (user_id, name, date)).fetchall()
+
+
+# 查詢每日紀錄（根據 user_id）
+def get_daily_record(user_id, name):
+    result = connect().execute("SELECT calories, water FROM daily_records WHERE user_id = ? AND name = ? AND date = ?",
+                               (user_id, name, today())).fetchone()
+    if result:
+        calories, water = result
+        return int(calories), int(water)  # 確保從資料庫讀取的數值為整數
+    return None
+
+
+# 分批讀取游標，避免一次把整個資料表載入記憶體
+def _chunks(cursor, size):
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        yield rows
+
+
+# 將舊版 dog_database_{user_id}.db 逐一串流匯入共用資料庫
+def migrate_per_user_databases(source_dir='.', chunk_size=500, archive_dir=None):
+    """
+    參數:
+        source_dir (str): 舊資料庫檔案所在目錄
+        chunk_size (int): 每批寫入的筆數
+        archive_dir (str): 匯入完成後將舊檔案移到此目錄（可選）
+    返回:
+        dict: 匯入的檔案數、寵物數、紀錄數與耗時
+    """
+    init_db()
+    summary = {'files': 0, 'dogs': 0, 'records': 0, 'seconds': 0.0}
+    start = time.monotonic()
+    name_pattern = re.compile(r'^dog_database_(.+)\.db$')
+
+    with checkout() as target:
+        for path in sorted(glob.glob(os.path.join(source_dir, LEGACY_DB_PATTERN))):
+            match = name_pattern.match(os.path.basename(path))
+            if not match or os.path.abspath(path) == os.path.abspath(DB_PATH):
+                continue
+            user_id = match.group(1)
+            source = sqlite3.connect(path)
+            try:
+                tables = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                with target:
+                    if 'dogs' in tables:
+                        columns = {row[1] for row in source.execute("PRAGMA table_info(dogs)")}
+                        breed = 'breed' if 'breed' in columns else 'NULL'
+                        status = 'status' if 'status' in columns else 'NULL'
+                        cursor = source.execute(f"SELECT ?, name, birthday, weight, {breed}, {status} FROM dogs", (user_id,))
+                        for rows in _chunks(cursor, chunk_size):
+                            target.executemany("INSERT OR IGNORE INTO dogs (user_id, name, birthday, weight, breed, status) VALUES (?, ?, ?, ?, ?, ?)", rows)
+                            summary['dogs'] += len(rows)
+                        backfill_targets(target, user_id)
+                    if 'daily_records' in tables:
+                        cursor = source.execute("SELECT ?, name, date, calories, water FROM daily_records", (user_id,))
+                        for rows in _chunks(cursor, chunk_size):
+                            target.executemany("INSERT OR IGNORE INTO daily_records (user_id, name, date, calories, water) VALUES (?, ?, ?, ?, ?)", rows)
+                            summary['records'] += len(rows)
+                        # 每日彙總各補上一筆事件，讓事件紀錄與彙總一致
+                        target.execute('''INSERT INTO intake_events (user_id, name, date, created_at, source, calories, water)
+                                          SELECT user_id, name, date, date || 'T00:00:00', 'migrated', COALESCE(calories, 0), COALESCE(water, 0)
+                                          FROM daily_records d WHERE user_id = ? AND NOT EXISTS (
+                                              SELECT 1 FROM intake_events e WHERE e.user_id = d.user_id AND e.name = d.name AND e.date = d.date)''',
+                                       (user_id,))
+                        rebuild_rollups(target, user_id)
+            finally:
+                source.close()
+            summary['files'] += 1
+            if archive_dir:
+                os.makedirs(archive_dir, exist_ok=True)
+                os.replace(path, os.path.join(archive_dir, os.path.basename(path)))
+
+    summary['seconds'] = round(time.monotonic() - start, 3)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="將每位使用者各自的 SQLite 檔案合併到共用資料庫")
+    parser.add_argument('--source-dir', default='.', help="舊資料庫檔案所在目錄")
+    parser.add_argument('--chunk-size', type=int, default=500, help="每批寫入的筆數")
+    parser.add_argument('--archive-dir', default=None, help="匯入完成後將舊檔案移到此目錄")
+    args = parser.parse_args()
+    result = migrate_per_user_databases(args.source_dir, args.chunk_size, args.archive_dir)
+    print(f"已匯入 {result['files']} 個檔案：{result['dogs']} 筆寵物、{result['records']} 筆每日紀錄，耗時 {result['seconds']} 秒")
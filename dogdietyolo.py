@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import os
+import logging
 from ultralytics import YOLO
 from tkinter import Tk, filedialog
 
@@ -19,6 +20,8 @@ NUTRITION_TABLE = {
     "Blueberry": {"Calories": 57, "Carbohydrate": 14.5, "Protein": 0.7, "Fiber": 2.4},
 }
 
+logger = logging.getLogger(__name__)
+
 def select_image():
     """使用 Tkinter 開啟檔案選擇對話框，讓使用者選擇圖片"""
     root = Tk()
@@ -58,19 +61,19 @@ def detect_food(image_path, model):
 
     # 提取辨識結果
     detected_foods = []
-    print("YOLO 辨識結果：")
+    logger.debug("YOLO 辨識結果：", extra={'category': 'yolo'})
     for result in results:
         for box in result.boxes.data:
             class_id = int(box[5])  # 類別 ID
             label = model.names[class_id]  # 原始標籤
-            print(f" - 原始標籤: {label}")
+            logger.debug(" - 原始標籤: %s", label, extra={'category': 'yolo'})
             # 將標籤轉換為與 NUTRITION_TABLE 一致的格式（首字母大寫）
             normalized_label = label.title()
             if normalized_label in NUTRITION_TABLE:
                 detected_foods.append(normalized_label)
-                print(f" - 匹配成功: {normalized_label}")
+                logger.debug(" - 匹配成功: %s", normalized_label, extra={'category': 'yolo'})
             else:
-                print(f" - 未找到營養資訊: {normalized_label}")
+                logger.debug(" - 未找到營養資訊: %s", normalized_label, extra={'category': 'yolo'})
 
     return detected_foods
 
@@ -130,4 +133,5 @@ def main():
         display_nutrition(detected_foods)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     main()
\ No newline at end of file
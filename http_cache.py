@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CachedResponse:
+    """
+    與 requests.Response 介面相容的回應（status_code / text / headers）
+    not_modified 為 True 時內容來自磁碟快取（伺服器回 304）。
+    """
+
+    def __init__(self, url, status_code, text, headers=None, not_modified=False):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+        self.not_modified = not_modified
+
+
+class ConditionalHttpCache:
+    """
+    磁碟上的 HTTP 回應快取，以 ETag / Last-Modified 做條件式請求
+    每個網址存成 <sha256>.json（驗證標頭）與 <sha256>.body（內容）兩個檔案，都以原子替換寫入。
+    再次抓取時帶上 If-None-Match / If-Modified-Since，伺服器回 304 時直接使用快取內容。
+    所有請求共用一個有連線池的 Session，並以 semaphore 限制每個主機的同時請求數。
+    參數:
+        cache_dir (str): 快取目錄
+        per_host_limit (int): 每個主機最多同時進行的請求數
+        pool_size (int): 每個主機的連線池大小
+        session (requests.Session): 自訂的 Session（可選）
+    """
+
+    def __init__(self, cache_dir='.http_cache', per_host_limit=4, pool_size=10, session=None):
+        self.cache_dir = cache_dir
+        self.per_host_limit = per_host_limit
+        os.makedirs(cache_dir, exist_ok=True)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self._lock = threading.Lock()
+        self._host_limits = {}
+        self._stats = {'requests': 0, 'not_modified': 0, 'fetched': 0, 'errors': 0, 'bytes_downloaded': 0, 'bytes_saved': 0}
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key + '.json'), os.path.join(self.cache_dir, key + '.body')
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return limit
+
+    def _load(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'r', encoding='utf-8') as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _store(self, url, response):
+        meta_path, body_path = self._paths(url)
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+        }
+        # 先寫內容再寫驗證標頭，中斷時不會留下指向舊內容的 ETag
+        for path, data in ((body_path, response.text), (meta_path, json.dumps(meta))):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def get(self, url, headers=None, timeout=10):
+        """
+        條件式 GET；網路錯誤時拋出 requests 的例外
+        返回:
+            CachedResponse: 304 時 status_code 為 200、not_modified 為 True，text 為快取內容
+        """
+        request_headers = dict(headers or {})
+        meta, cached_body = self._load(url)
+        if meta is not None:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+
+        self._count('requests')
+        with self._host_limit(url):
+            try:
+                response = self.session.get(url, headers=request_headers, timeout=timeout)
+            except requests.exceptions.RequestException:
+                self._count('errors')
+                raise
+
+        if response.status_code == 304 and cached_body is not None:
+            self._count('not_modified')
+            self._count('bytes_saved', len(cached_body.encode('utf-8')))
+            return CachedResponse(url, 200, cached_body, response.headers, not_modified=True)
+        self._count('bytes_downloaded', len(response.content))
+        if response.status_code == 200:
+            self._count('fetched')
+            if response.headers.get('ETag') or response.headers.get('Last-Modified'):
+                self._store(url, response)
+        return CachedResponse(url, response.status_code, response.text, response.headers)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,101 @@
+import logging
+import random
+import threading
+import time
+from linebot.v3.messaging import ApiClient, MessagingApi, MessagingApiBlob
+from linebot.v3.messaging.exceptions import ApiException
+
+logger = logging.getLogger(__name__)
+
+# 需要重試的 HTTP 狀態碼
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LineApiClient:
+    """
+    全程序共用、執行緒安全的 LINE Messaging API 客戶端
+    共用同一個 ApiClient（底層為 urllib3 連線池），對 api.line.me 與
+    api-data.line.me 的連線會保持 keep-alive，不必每次回覆都重新握手。
+    遇到 429/5xx 時以帶隨機抖動的指數退避重試，並記錄各端點的延遲。
+    參數:
+        configuration (Configuration): LINE SDK 設定
+        pool_size (int): 每個主機的連線池大小
+        max_retries (int): 最多重試次數
+        backoff_base (float): 第一次重試前的基準等待秒數
+        backoff_max (float): 單次等待秒數上限
+    """
+
+    def __init__(self, configuration, pool_size=10, max_retries=3, backoff_base=0.5, backoff_max=8.0):
+        configuration.connection_pool_maxsize = pool_size
+        self.api_client = ApiClient(configuration)
+        self.messaging = MessagingApi(self.api_client)
+        self.blob = MessagingApiBlob(self.api_client)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        headers = getattr(error, 'headers', None)
+        if headers and headers.get('Retry-After'):
+            try:
+                retry_after = float(headers.get('Retry-After'))
+            except ValueError:
+                retry_after = None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # full jitter：在 0 到指數上限之間隨機等待，避免多個執行緒同時重試
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, endpoint, elapsed, retries, failed):
+        with self._lock:
+            stat = self._stats.setdefault(endpoint, {'calls': 0, 'errors': 0, 'retries': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stat['calls'] += 1
+            stat['retries'] += retries
+            stat['errors'] += 1 if failed else 0
+            stat['total_ms'] += elapsed * 1000
+            stat['max_ms'] = max(stat['max_ms'], elapsed * 1000)
+
+    def call(self, endpoint, func, *args, **kwargs):
+        """以重試與延遲記錄包裝一次 API 呼叫"""
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                result = func(*args, **kwargs)
+                self._record(endpoint, time.monotonic() - start, attempt, False)
+                return result
+            except ApiException as e:
+                if e.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    self._record(endpoint, time.monotonic() - start, attempt, True)
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning(f"LINE API {endpoint} returned {e.status}, retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def reply_message_with_http_info(self, reply_message_request):
+        return self.call('reply', self.messaging.reply_message_with_http_info, reply_message_request)
+
+    def push_message(self, push_message_request, retry_key=None):
+        # 重試時沿用同一個 retry key，LINE 已接受過的請求會回 409 而不會重複發送
+        return self.call('push', self.messaging.push_message, push_message_request, x_line_retry_key=retry_key)
+
+    def multicast(self, multicast_request, retry_key=None):
+        return self.call('multicast', self.messaging.multicast, multicast_request, x_line_retry_key=retry_key)
+
+    def get_message_content(self, message_id):
+        return self.call('message_content', self.blob.get_message_content, message_id=message_id)
+
+    def stats(self):
+        """回傳各端點的呼叫次數、錯誤、重試與延遲"""
+        with self._lock:
+            return {
+                endpoint: dict(stat, avg_ms=round(stat['total_ms'] / stat['calls'], 2))
+                for endpoint, stat in self._stats.items()
+            }
+
+    def close(self):
+        self.api_client.close()
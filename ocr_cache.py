@@ -0,0 +1,269 @@
+import hashlib
+import io
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from typing import NamedTuple
+from db_connections import connections
+
+try:
+    from PIL import Image, ImageChops, ImageOps
+except ImportError:  # 未安裝 Pillow 時只比對完全相同的圖片
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# dHash 的邊長：縮成 (HASH_SIZE + 1) x HASH_SIZE 的灰階圖，比較左右相鄰像素，共 64 位元
+HASH_SIZE = 8
+
+# 驗證用縮圖：長邊縮到 THUMBNAIL_SIDE 後拉高對比，再以 2x2 區塊平均成 GRID_SIZE x GRID_SIZE 的灰階格點
+THUMBNAIL_SIDE = 512
+GRID_SIZE = 256
+
+# 兩張圖的格點差異（最大差異減去中位數差異，扣除整體亮度變化）超過此值即視為不同的標示
+# 同一張照片重新壓縮、縮放或調整亮度約為 2~9，只差一個數字的標示約為 60 以上
+MAX_GRID_DIFFERENCE = 24
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    計算 PIL 影像的差異雜湊（dHash）
+    同一張照片重新壓縮或縮放時，雜湊只有少數位元不同；但只差幾個數字的標示雜湊也相同，
+    因此只用來找出候選，是否命中由格點比對決定。
+    返回:
+        int: hash_size * hash_size 位元的雜湊值
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS, reducing_gap=2.0)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class ImageFingerprint(NamedTuple):
+    """快取查詢用的圖片特徵：原始位元組的 SHA-256、dHash 與驗證用的灰階格點（未安裝 Pillow 或無法解碼時後兩者為 None）"""
+    digest: str
+    dhash: int
+    grid: bytes
+
+
+def fingerprint(image_content):
+    """
+    以低解析度解碼圖片（JPEG 直接在解碼時縮小），計算快取查詢用的特徵
+    不需要完整解碼與重新編碼，快取命中時可省下 prepare_image 的工作。
+    """
+    digest = hashlib.sha256(image_content).hexdigest()
+    if Image is None:
+        return ImageFingerprint(digest, None, None)
+    try:
+        image = Image.open(io.BytesIO(image_content))
+        image.draft('L', (THUMBNAIL_SIDE * 2, THUMBNAIL_SIDE * 2))
+        image = ImageOps.exif_transpose(image).convert('L')
+    except Exception:
+        return ImageFingerprint(digest, None, None)
+    image.thumbnail((THUMBNAIL_SIDE, THUMBNAIL_SIDE), Image.LANCZOS)
+    grid = ImageOps.autocontrast(image, cutoff=1).resize((GRID_SIZE, GRID_SIZE), Image.BOX)
+    return ImageFingerprint(digest, dhash(grid), grid.tobytes())
+
+
+def grid_difference(a, b):
+    """兩個格點的最大區塊差異減去中位數差異（整張圖一起變亮或變暗不算差異）"""
+    size = (GRID_SIZE, GRID_SIZE)
+    difference = ImageChops.difference(Image.frombytes('L', size, a), Image.frombytes('L', size, b)).tobytes()
+    return max(difference) - statistics.median_low(difference)
+
+
+class OcrResultCache:
+    """
+    以包裝照片的特徵為鍵，保存解析後的營養資訊（nutrition_info）
+    原始位元組完全相同時直接命中；否則以 dHash 漢明距離在 max_distance 以內的項目為候選，
+    再比對 256x256 的灰階格點，只有同一張照片的重新壓縮、縮放或亮度變化才算命中，
+    只差幾個數字的不同標示不會被誤用。
+    資料存在 SQLite，啟動時載入雜湊（格點在比對時才讀取）；超過 capacity 筆時淘汰最久沒用到的。
+    命中的請求有 audit_rate 的機率仍呼叫 Vision 並比對結果，用來估計誤判率；
+    比對不符時以新結果取代快取中的那一筆。
+    參數:
+        db_path (str): SQLite 資料庫路徑
+        capacity (int): 最多保留的筆數
+        max_distance (int): 列為候選的最大 dHash 漢明距離
+        audit_rate (float): 命中時仍呼叫 Vision 比對的機率（0 表示不抽查）
+        max_grid_difference (int): 格點比對的容許差異
+        max_candidates (int): 每次查詢最多比對的候選數
+    """
+
+    def __init__(self, db_path='ocr_cache.db', capacity=2000, max_distance=6, audit_rate=0.05,
+                 max_grid_difference=MAX_GRID_DIFFERENCE, max_candidates=3):
+        self.db_path = db_path
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.audit_rate = audit_rate
+        self.max_grid_difference = max_grid_difference
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()    # digest -> (dHash, nutrition_info)，最近用到的在最後
+        self._stats = {'exact_hits': 0, 'near_hits': 0, 'misses': 0, 'rejected_candidates': 0,
+                       'evictions': 0, 'audits': 0, 'false_matches': 0}
+        self._recent_false_matches = deque(maxlen=20)
+        conn = self._connect()
+        with conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(ocr_results)")]
+            if columns and 'grid' not in columns:
+                # 舊版以 dHash 為鍵的快取無法驗證，整個重建
+                conn.execute("DROP TABLE ocr_results")
+            conn.execute('''CREATE TABLE IF NOT EXISTS ocr_results (
+                digest TEXT PRIMARY KEY,
+                image_hash TEXT,
+                grid BLOB,
+                nutrition_info TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )''')
+        for digest, image_hash, nutrition_info in conn.execute(
+                "SELECT digest, image_hash, nutrition_info FROM ocr_results ORDER BY last_used_at"):
+            self._entries[digest] = (int(image_hash, 16) if image_hash else None, json.loads(nutrition_info))
+        self._evict()
+
+    def _connect(self):
+        return connections.get(self.db_path)
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def _evict(self):
+        evicted = []
+        with self._lock:
+            while len(self._entries) > self.capacity:
+                evicted.append(self._entries.popitem(last=False)[0])
+            self._stats['evictions'] += len(evicted)
+        if evicted:
+            conn = self._connect()
+            with conn:
+                conn.executemany("DELETE FROM ocr_results WHERE digest = ?", [(digest,) for digest in evicted])
+
+    def _candidates(self, image_hash):
+        with self._lock:
+            scored = [(hamming_distance(image_hash, cached_hash), digest)
+                      for digest, (cached_hash, _) in self._entries.items() if cached_hash is not None]
+        scored = sorted(item for item in scored if item[0] <= self.max_distance)
+        return scored[:self.max_candidates]
+
+    def _load_grid(self, digest):
+        row = self._connect().execute("SELECT grid FROM ocr_results WHERE digest = ?", (digest,)).fetchone()
+        return zlib.decompress(row[0]) if row and row[0] else None
+
+    def lookup(self, fp):
+        """
+        返回:
+            tuple: (快取中的 digest, dHash 距離, nutrition_info)，未命中時為 (None, None, None)
+        """
+        matched, distance = None, None
+        with self._lock:
+            if fp.digest in self._entries:
+                matched, distance = fp.digest, 0
+                self._stats['exact_hits'] += 1
+        if matched is None and fp.dhash is not None:
+            for candidate_distance, digest in self._candidates(fp.dhash):
+                grid = self._load_grid(digest)
+                if grid is not None and grid_difference(grid, fp.grid) <= self.max_grid_difference:
+                    matched, distance = digest, candidate_distance
+                    self._count('near_hits')
+                    break
+                self._count('rejected_candidates')
+        if matched is None:
+            self._count('misses')
+            return None, None, None
+        with self._lock:
+            entry = self._entries.get(matched)
+            if entry is None:  # 比對期間被淘汰
+                return None, None, None
+            self._entries.move_to_end(matched)
+            nutrition_info = dict(entry[1])
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE ocr_results SET last_used_at = ? WHERE digest = ?", (time.time(), matched))
+        return matched, distance, nutrition_info
+
+    def put(self, fp, nutrition_info):
+        now = time.time()
+        with self._lock:
+            self._entries[fp.digest] = (fp.dhash, dict(nutrition_info))
+            self._entries.move_to_end(fp.digest)
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO ocr_results (digest, image_hash, grid, nutrition_info, created_at, last_used_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (fp.digest, f"{fp.dhash:016x}" if fp.dhash is not None else None,
+                          zlib.compress(fp.grid) if fp.grid is not None else None,
+                          json.dumps(nutrition_info, ensure_ascii=False), now, now))
+        self._evict()
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM ocr_results WHERE digest = ?", (digest,))
+
+    def get_or_compute(self, image_content, compute):
+        """
+        先查快取，未命中（或抽查）時才呼叫 compute
+        參數:
+            image_content (bytes): 使用者傳來的原始圖片
+            compute (callable): 縮小圖片、呼叫 Vision 並返回 nutrition_info 的函數
+        返回:
+            dict: nutrition_info；辨識不到任何成分時不寫入快取
+        """
+        fp = fingerprint(image_content)
+        matched, distance, cached = self.lookup(fp)
+        if matched is not None and not (self.audit_rate and random.random() < self.audit_rate):
+            return cached
+
+        nutrition_info = compute()
+        if matched is not None:
+            false_match = nutrition_info != cached
+            with self._lock:
+                self._stats['audits'] += 1
+                if false_match:
+                    self._stats['false_matches'] += 1
+                    self._recent_false_matches.append({
+                        'digest': fp.digest,
+                        'matched_digest': matched,
+                        'distance': distance,
+                        'cached': cached,
+                        'fresh': nutrition_info,
+                        'time': time.time(),
+                    })
+            if not false_match:
+                return nutrition_info
+            logger.warning(f"OCR cache false match at distance {distance}: cached {cached}, fresh {nutrition_info}")
+            self.discard(matched)
+        if nutrition_info:
+            self.put(fp, nutrition_info)
+        return nutrition_info
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            hits = stats['exact_hits'] + stats['near_hits']
+            lookups = hits + stats['misses']
+            stats.update({
+                'entries': len(self._entries),
+                'hits': hits,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0,
+                'false_match_rate': round(stats['false_matches'] / stats['audits'], 4) if stats['audits'] else 0,
+                'recent_false_matches': list(self._recent_false_matches),
+            })
+            return stats
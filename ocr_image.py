@@ -0,0 +1,88 @@
+import io
+import time
+from typing import NamedTuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # 未安裝 Pillow 時原樣送出圖片
+    Image = None
+
+
+class ImageOptions(NamedTuple):
+    """
+    送進 Vision 前的圖片處理設定
+    Vision 文字辨識約 1024x768 以上即可，手機照片的原始解析度大多用不到。
+    參數:
+        max_side (int): 長邊的最大像素，超過時等比例縮小
+        quality (int): 重新編碼的 JPEG 品質
+        grayscale (bool): 是否轉為灰階
+        enhance_contrast (bool): 是否自動拉高對比（包裝上的淺色文字較清楚）
+    """
+    max_side: int = 1600
+    quality: int = 85
+    grayscale: bool = False
+    enhance_contrast: bool = False
+
+
+DEFAULT_IMAGE_OPTIONS = ImageOptions()
+
+
+class PreparedImage(NamedTuple):
+    """處理後的圖片；image 為解碼後的 PIL 影像（未安裝 Pillow 或無法解碼時為 None）"""
+    content: bytes
+    image: object
+    original_bytes: int
+    original_size: tuple
+    size: tuple
+    seconds: float
+
+    @property
+    def saved_bytes(self):
+        return self.original_bytes - len(self.content)
+
+
+def prepare_image(image_content, options=DEFAULT_IMAGE_OPTIONS):
+    """
+    解碼一次圖片，依 EXIF 轉正、縮小到 max_side 以內並重新編碼為 JPEG
+    參數:
+        image_content (bytes): 原始圖片
+        options (ImageOptions): 處理設定（None 表示不處理）
+    返回:
+        PreparedImage: 重新編碼後沒有比較小且不需縮小時，content 仍為原始圖片
+    """
+    start = time.perf_counter()
+    original_bytes = len(image_content)
+    if Image is None:
+        return PreparedImage(image_content, None, original_bytes, None, None, 0.0)
+    try:
+        image = Image.open(io.BytesIO(image_content))
+        original_size = image.size
+        if options is not None and max(original_size) > options.max_side:
+            # JPEG 可在解碼時直接以 1/2、1/4、1/8 縮小，不必先解出完整解析度
+            scale = options.max_side / max(original_size)
+            image.draft('L' if options.grayscale else 'RGB',
+                        (round(original_size[0] * scale), round(original_size[1] * scale)))
+        image.load()
+    except Exception:
+        return PreparedImage(image_content, None, original_bytes, None, None, time.perf_counter() - start)
+    if options is None:
+        return PreparedImage(image_content, image, original_bytes, original_size, original_size,
+                             time.perf_counter() - start)
+
+    image = ImageOps.exif_transpose(image)
+    resized = max(image.size) > options.max_side
+    if resized:
+        image.thumbnail((options.max_side, options.max_side), Image.LANCZOS)
+    if options.grayscale:
+        image = image.convert('L')
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')  # JPEG 不支援透明度與調色盤
+    if options.enhance_contrast:
+        image = ImageOps.autocontrast(image, cutoff=1)
+
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=options.quality, optimize=True)
+    content = output.getvalue()
+    if not resized and not options.grayscale and not options.enhance_contrast and len(content) >= original_bytes:
+        content = image_content
+    return PreparedImage(content, image, original_bytes, original_size, image.size, time.perf_counter() - start)
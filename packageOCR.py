@@ -3,6 +3,8 @@ from google.cloud import vision
 from google.oauth2 import service_account
 from dotenv import load_dotenv
 import os
+import time
+from ocr_image import DEFAULT_IMAGE_OPTIONS, ImageOptions, prepare_image
 
 # 初始化 Google Cloud Vision 客戶端（這裡只是定義，實際初始化在主程式中）
 def get_vision_client():
@@ -13,18 +15,12 @@ def get_vision_client():
     credentials = service_account.Credentials.from_service_account_file(google_api_key_path)
     return vision.ImageAnnotatorClient(credentials=credentials)
 
-def extract_nutrition_info(image_content: bytes, client=None):
+def detect_text(image_content: bytes, client):
     """
-    從圖片的二進位數據中提取營養資訊
-    Args:
-        image_content (bytes): 圖片的二進位數據
-        client: Google Cloud Vision 客戶端（可選，若未提供則內部初始化）
+    以 Vision 文字辨識取得圖片中的全部文字
     Returns:
-        dict: 提取的營養資訊字典
+        str: 辨識出的文字，沒有文字時為空字串
     """
-    if client is None:
-        client = get_vision_client()
-
     # 構建 Vision API 的圖片物件
     image = vision.Image(content=image_content)
 
@@ -34,9 +30,38 @@ def extract_nutrition_info(image_content: bytes, client=None):
     # 解析結果
     texts = response.text_annotations
     if not texts:
-        return {}
+        return ''
+    return texts[0].description
+
+def extract_nutrition_info(image_content: bytes, client=None, image_options=DEFAULT_IMAGE_OPTIONS, cache=None):
+    """
+    從圖片的二進位數據中提取營養資訊
+    Args:
+        image_content (bytes): 圖片的二進位數據
+        client: Google Cloud Vision 客戶端（可選，若未提供則內部初始化）
+        image_options (ImageOptions): 送出前縮小與重新編碼的設定（None 表示送出原始圖片）
+        cache (OcrResultCache): 以圖片特徵查詢的結果快取（可選），命中時不處理圖片也不呼叫 Vision
+    Returns:
+        dict: 提取的營養資訊字典
+    """
+    def recognize():
+        prepared = prepare_image(image_content, image_options)
+        return parse_nutrition_text(detect_text(prepared.content, client or get_vision_client()))
+
+    if cache is not None:
+        return cache.get_or_compute(image_content, recognize)
+    return recognize()
 
-    detected_text = texts[0].description
+def parse_nutrition_text(detected_text: str):
+    """
+    從 OCR 文字中提取營養資訊
+    Args:
+        detected_text (str): Vision 辨識出的文字
+    Returns:
+        dict: 提取的營養資訊字典
+    """
+    if not detected_text:
+        return {}
 
     # 清理文本：去除換行符和多餘空格，並移除多餘的符號
     detected_text = detected_text.replace('\n', '').replace(' ', '')
@@ -70,18 +95,87 @@ def extract_nutrition_info(image_content: bytes, client=None):
 
     return nutrition_info
 
+def compare_image_options(paths, client, image_options=DEFAULT_IMAGE_OPTIONS):
+    """
+    以固定的測試照片比較原始圖片與處理後圖片的辨識結果、大小與延遲
+    Args:
+        paths (list): 測試照片路徑
+        client: Google Cloud Vision 客戶端
+        image_options (ImageOptions): 要比較的處理設定
+    Returns:
+        list: 每張照片一筆 dict（大小、處理與 Vision 秒數、兩邊的營養資訊及是否相同）
+    """
+    results = []
+    for path in paths:
+        with open(path, 'rb') as image_file:
+            image_content = image_file.read()
+
+        start = time.perf_counter()
+        original_info = parse_nutrition_text(detect_text(image_content, client))
+        original_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        prepared = prepare_image(image_content, image_options)
+        prepared_info = parse_nutrition_text(detect_text(prepared.content, client))
+        prepared_seconds = time.perf_counter() - start
+
+        results.append({
+            'path': path,
+            'original_bytes': prepared.original_bytes,
+            'prepared_bytes': len(prepared.content),
+            'original_size': prepared.original_size,
+            'prepared_size': prepared.size,
+            'preprocess_seconds': round(prepared.seconds, 3),
+            'original_seconds': round(original_seconds, 3),
+            'prepared_seconds': round(prepared_seconds, 3),
+            'original_info': original_info,
+            'prepared_info': prepared_info,
+            'unchanged': original_info == prepared_info,
+        })
+    return results
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="包裝照片營養成分辨識")
+    parser.add_argument('images', nargs='*', default=['package6.jpg'], help="包裝照片")
+    parser.add_argument('--compare', action='store_true', help="比較原始與處理後圖片的辨識結果、大小與延遲")
+    parser.add_argument('--max-side', type=int, default=DEFAULT_IMAGE_OPTIONS.max_side, help="長邊最大像素")
+    parser.add_argument('--quality', type=int, default=DEFAULT_IMAGE_OPTIONS.quality, help="JPEG 品質")
+    parser.add_argument('--grayscale', action='store_true', help="轉為灰階")
+    parser.add_argument('--enhance-contrast', action='store_true', help="自動拉高對比")
+    args = parser.parse_args()
+    options = ImageOptions(args.max_side, args.quality, args.grayscale, args.enhance_contrast)
+
     # 測試用代碼
     client = get_vision_client()
-    with open('package6.jpg', 'rb') as image_file:
-        image_content = image_file.read()
-    nutrition_info = extract_nutrition_info(image_content, client)
-    if nutrition_info:
-        print("提取的成分數據：")
-        for component, value in nutrition_info.items():
-            if component == '熱量':
-                print(f"{component}: {value} kcal")
-            else:
-                print(f"{component}: {value}%")
+    if args.compare:
+        results = compare_image_options(args.images, client, options)
+        for result in results:
+            print(f"{result['path']}: {'相同' if result['unchanged'] else '不同'}")
+            print(f"  大小：{result['original_bytes']} -> {result['prepared_bytes']} 位元組，"
+                  f"解析度 {result['original_size']} -> {result['prepared_size']}")
+            print(f"  延遲：原始 {result['original_seconds']} 秒，處理後 {result['prepared_seconds']} 秒"
+                  f"（含前處理 {result['preprocess_seconds']} 秒）")
+            if not result['unchanged']:
+                print(f"  原始：{result['original_info']}")
+                print(f"  處理後：{result['prepared_info']}")
+        original_bytes = sum(result['original_bytes'] for result in results)
+        prepared_bytes = sum(result['prepared_bytes'] for result in results)
+        saved_seconds = sum(result['original_seconds'] - result['prepared_seconds'] for result in results)
+        print(f"共 {len(results)} 張，{sum(result['unchanged'] for result in results)} 張結果相同；"
+              f"省下 {original_bytes - prepared_bytes} 位元組（{(1 - prepared_bytes / max(original_bytes, 1)):.1%}），"
+              f"Vision 延遲合計少 {saved_seconds:.2f} 秒")
     else:
-        print("未提取到任何成分數據。")
\ No newline at end of file
+        for image_path in args.images:
+            with open(image_path, 'rb') as image_file:
+                image_content = image_file.read()
+            nutrition_info = extract_nutrition_info(image_content, client, options)
+            if nutrition_info:
+                print("提取的成分數據：")
+                for component, value in nutrition_info.items():
+                    if component == '熱量':
+                        print(f"{component}: {value} kcal")
+                    else:
+                        print(f"{component}: {value}%")
+            else:
+                print("未提取到任何成分數據。")
@@ -0,0 +1,201 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+class StateStore(ABC):
+    """
+    使用者對話狀態儲存介面
+    狀態為可 JSON 序列化的 dict，其中 'step' 欄位代表目前的對話步驟。
+    """
+
+    @abstractmethod
+    def get(self, user_id):
+        """返回使用者目前的狀態，不存在或已過期時返回 None"""
+
+    @abstractmethod
+    def set(self, user_id, state):
+        """覆寫使用者的狀態並重新計算過期時間"""
+
+    @abstractmethod
+    def delete(self, user_id):
+        """清除使用者的狀態"""
+
+    @abstractmethod
+    def compare_and_set_step(self, user_id, expected_step, new_state):
+        """
+        只有在目前的 step 等於 expected_step 時才寫入 new_state（原子操作）
+        參數:
+            expected_step (str): 預期的目前步驟，None 表示預期沒有狀態
+            new_state (dict): 新狀態，None 表示清除狀態
+        返回:
+            bool: 是否寫入成功
+        """
+
+    def stats(self):
+        return {}
+
+
+class MemoryStateStore(StateStore):
+    """
+    記憶體內的 LRU + TTL 狀態儲存（單一程序使用）
+    參數:
+        max_entries (int): 最多保留的使用者數，超過時淘汰最久未使用的
+        ttl (float): 狀態存活秒數，超過時視為放棄的對話
+    """
+
+    def __init__(self, max_entries=10000, ttl=1800):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._evicted = 0
+        self._expired = 0
+
+    def _get_locked(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, state = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            self._expired += 1
+            return None
+        self._entries.move_to_end(user_id)
+        return state
+
+    def _set_locked(self, user_id, state):
+        if state is None:
+            self._entries.pop(user_id, None)
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl, dict(state))
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evicted += 1
+
+    def get(self, user_id):
+        with self._lock:
+            state = self._get_locked(user_id)
+            return dict(state) if state is not None else None
+
+    def set(self, user_id, state):
+        with self._lock:
+            self._set_locked(user_id, state)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def compare_and_set_step(self, user_id, expected_step, new_state):
+        with self._lock:
+            state = self._get_locked(user_id)
+            current_step = state.get('step') if state is not None else None
+            if current_step != expected_step:
+                return False
+            self._set_locked(user_id, new_state)
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'entries': len(self._entries), 'evicted': self._evicted, 'expired': self._expired}
+
+
+class SqliteStateStore(StateStore):
+    """
+    SQLite 狀態儲存，多個 gunicorn worker 可共用同一個檔案
+    參數:
+        db_path (str): SQLite 檔案路徑
+        ttl (float): 狀態存活秒數
+    """
+
+    def __init__(self, db_path='user_states.db', ttl=1800):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS user_states (
+            user_id TEXT PRIMARY KEY,
+            step TEXT,
+            data TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_user_states_expires ON user_states (expires_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None：自行以 BEGIN IMMEDIATE 控制交易
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _load(row):
+        return json.loads(row[0]) if row else None
+
+    def _write(self, conn, user_id, state):
+        if state is None:
+            conn.execute("DELETE FROM user_states WHERE user_id = ?", (user_id,))
+        else:
+            conn.execute("INSERT OR REPLACE INTO user_states (user_id, step, data, expires_at) VALUES (?, ?, ?, ?)",
+                         (user_id, state.get('step'), json.dumps(state, ensure_ascii=False), time.time() + self.ttl))
+            # 每寫入一定次數順便清掉過期的狀態，避免資料表無限成長
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                conn.execute("DELETE FROM user_states WHERE expires_at < ?", (time.time(),))
+
+    def get(self, user_id):
+        row = self._connect().execute("SELECT data FROM user_states WHERE user_id = ? AND expires_at >= ?",
+                                      (user_id, time.time())).fetchone()
+        return self._load(row)
+
+    def set(self, user_id, state):
+        self._write(self._connect(), user_id, state)
+
+    def delete(self, user_id):
+        self._write(self._connect(), user_id, None)
+
+    def compare_and_set_step(self, user_id, expected_step, new_state):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT step FROM user_states WHERE user_id = ? AND expires_at >= ?",
+                               (user_id, time.time())).fetchone()
+            current_step = row[0] if row else None
+            if current_step != expected_step:
+                conn.execute("ROLLBACK")
+                return False
+            self._write(conn, user_id, new_state)
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def purge_expired(self):
+        """刪除所有已過期的狀態，返回刪除筆數"""
+        return self._connect().execute("DELETE FROM user_states WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def stats(self):
+        entries = self._connect().execute("SELECT COUNT(*) FROM user_states").fetchone()[0]
+        return {'backend': 'sqlite', 'entries': entries}
+
+
+def create_state_store():
+    """
+    依環境變數建立狀態儲存
+    STATE_STORE=memory（預設）或 sqlite；STATE_TTL 為存活秒數；
+    STATE_MAX_ENTRIES 為記憶體模式的上限；STATE_DB_PATH 為 SQLite 檔案路徑。
+    """
+    backend = os.getenv('STATE_STORE', 'memory').lower()
+    ttl = float(os.getenv('STATE_TTL', '1800'))
+    if backend == 'sqlite':
+        return SqliteStateStore(os.getenv('STATE_DB_PATH', 'user_states.db'), ttl=ttl)
+    return MemoryStateStore(max_entries=int(os.getenv('STATE_MAX_ENTRIES', '10000')), ttl=ttl)
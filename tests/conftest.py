@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# 模組都放在專案根目錄
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_migrations  # noqa: E402
+import dog_storage  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """改用暫存目錄中的共用資料庫（同步寫入模式），並建立好資料表"""
+    path = str(tmp_path / 'dogs.db')
+    monkeypatch.setattr(dog_storage, 'DB_PATH', path)
+    monkeypatch.setattr(dog_storage, 'writer', None)
+    db_migrations.reset_cache()
+    dog_storage.init_db()
+    return path
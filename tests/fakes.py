@@ -0,0 +1,54 @@
+import io
+import json
+import os
+import types
+from PIL import Image
+
+# 包裝標示照片（由 fixtures/ocr/make_labels.py 產生）與印在標示上的文字
+OCR_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'ocr')
+with open(os.path.join(OCR_FIXTURES_DIR, 'labels.json'), 'r', encoding='utf-8') as f:
+    OCR_LABELS = json.load(f)
+
+# 各標示應解析出的營養資訊
+OCR_EXPECTED = {
+    'label_a.jpg': {'熱量': '3800', '蛋白質': '26', '脂肪': '15', '纖維': '4', '水': '10'},
+    'label_b.jpg': {'熱量': '4100', '蛋白質': '32.5', '脂肪': '18', '纖維': '3.5', '水': '9', '碳水': '28'},
+}
+
+
+def read_ocr_fixture(name):
+    with open(os.path.join(OCR_FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+class FakeTranslateClient:
+    """
+    離線的翻譯客戶端，介面與 google translate_v2.Client.translate 相同
+    譯文為「[目標語言] 原文」，並記錄每次呼叫的字串數。
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def translate(self, values, target_language=None):
+        single = isinstance(values, str)
+        values = [values] if single else list(values)
+        self.calls.append(len(values))
+        results = [{'translatedText': f"[{target_language}] {value}", 'input': value} for value in values]
+        return results[0] if single else results
+
+
+class RecordedVisionClient:
+    """
+    以標示上印的文字回應 text_detection 的 Vision 替身，並記錄收到的圖片
+    不論收到哪張圖片都回傳同一段文字，只能驗證流程，無法驗證圖片是否仍看得清楚。
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.images = []
+
+    def text_detection(self, image):
+        Image.open(io.BytesIO(image.content)).verify()
+        self.images.append(image.content)
+        return types.SimpleNamespace(text_annotations=[types.SimpleNamespace(description=self.text)])
@@ -0,0 +1,121 @@
+import csv
+import os
+import time
+import pytest
+import breed_repository
+from breed_repository import CSV_COLUMNS, BreedRepository, load_breeds
+
+REPO_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dog_breeds.csv')
+
+
+def write_breeds(path, names, encoding='utf-8', columns=CSV_COLUMNS):
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        for i, name in enumerate(names):
+            row = {column: f"{name} {column}" for column in columns}
+            row.update(id=str(i + 1), breed_name=name)
+            writer.writerow(row)
+
+
+def test_repository_loads_the_shipped_csv():
+    repository = BreedRepository(REPO_CSV)
+    assert len(repository) == len(repository.names) > 0
+    breed = repository.get('柴犬')
+    assert breed.breed_name == '柴犬'
+    assert breed.recommendation.startswith("🐶 品種: 柴犬")
+    assert breed.health_info()['lifespan'] == breed.lifespan
+    assert repository.get('不存在的品種') is None
+
+
+def test_load_breeds_keeps_first_duplicate_and_handles_bom(tmp_path):
+    path = str(tmp_path / 'breeds.csv')
+    write_breeds(path, ['柴犬', '米格魯', '柴犬'], encoding='utf-8-sig')
+    breeds = load_breeds(path)
+    assert list(breeds) == ['柴犬', '米格魯']
+    assert breeds['柴犬'].id == '1'
+    with pytest.raises(AttributeError):
+        breeds['柴犬'].weight = 'x'
+
+
+def test_load_breeds_rejects_missing_columns(tmp_path):
+    path = str(tmp_path / 'breeds.csv')
+    write_breeds(path, ['柴犬'], columns=[column for column in CSV_COLUMNS if column != 'health'])
+    with pytest.raises(ValueError, match="health"):
+        load_breeds(path)
+
+
+def test_breed_lookup_is_faster_than_pandas():
+    pytest.importorskip('pandas')
+    result = breed_repository.benchmark(REPO_CSV, lookups=2000)
+    assert result['repository_lookup_us'] < result['pandas_lookup_us']
+
+
+def touch(path, seconds):
+    """把 mtime 往後調，避免同一個時鐘刻度內的兩次寫入看起來沒變動"""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + int(seconds * 1e9)))
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_reload_swaps_in_a_new_snapshot(tmp_path):
+    path = str(tmp_path / 'breeds.csv')
+    write_breeds(path, ['柴犬'])
+    repository = BreedRepository(path)
+    old = repository.snapshot
+    assert not repository.reload()
+
+    write_breeds(path, ['柴犬', '米格魯'])
+    touch(path, 1)
+    assert repository.reload()
+    assert repository.get('米格魯') is not None
+    assert repository.search('米格')[0][0] == '米格魯'
+    assert repository.stats()['version'] == 2
+    # 舊快照不受影響，正在讀取舊快照的請求看到的仍是完整的一版
+    assert list(old.breeds) == ['柴犬']
+    with pytest.raises(TypeError):
+        old.breeds['米格魯'] = None
+
+
+def test_broken_file_keeps_current_snapshot_until_it_changes(tmp_path):
+    path = str(tmp_path / 'breeds.csv')
+    write_breeds(path, ['柴犬'])
+    repository = BreedRepository(path)
+
+    write_breeds(path, ['米格魯'], columns=[column for column in CSV_COLUMNS if column != 'health'])
+    touch(path, 1)
+    assert not repository.reload()
+    assert not repository.reload()      # 同一版檔案不重試
+    stats = repository.stats()
+    assert (stats['version'], stats['failures']) == (1, 1)
+    assert 'health' in stats['last_error']
+    assert repository.get('柴犬') is not None
+
+    write_breeds(path, ['米格魯'])
+    touch(path, 2)
+    assert repository.reload()
+    assert repository.names == ('米格魯',)
+    assert repository.stats()['last_error'] is None
+
+
+def test_background_thread_reloads_on_request_and_on_change(tmp_path):
+    path = str(tmp_path / 'breeds.csv')
+    write_breeds(path, ['柴犬'])
+    repository = BreedRepository(path, poll_interval=0.05)
+    repository.start()
+    try:
+        repository.request_reload()     # 檔案沒變動也強制重新載入
+        assert wait_for(lambda: repository.stats()['version'] == 2)
+
+        write_breeds(path, ['柴犬', '米格魯'])
+        touch(path, 1)
+        assert wait_for(lambda: repository.get('米格魯') is not None)
+        assert repository.stats()['version'] == 3
+    finally:
+        repository.shutdown()
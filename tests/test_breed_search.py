@@ -0,0 +1,45 @@
+import pytest
+from breed_search import BreedSearchIndex, ngrams, normalize
+
+ALIASES = [('柴犬', '柴犬'), ('Shiba Inu', '柴犬'), ('黃金獵犬', '黃金獵犬'), ('Golden Retriever', '黃金獵犬'),
+           ('拉布拉多', '拉布拉多'), ('Labrador Retriever', '拉布拉多'), ('玩具貴賓犬', '玩具貴賓犬'),
+           ('巨型貴賓犬', '巨型貴賓犬'), ('吉娃娃', '吉娃娃'), ('Chihuahua', '吉娃娃')]
+
+
+@pytest.fixture(scope='module')
+def index():
+    return BreedSearchIndex(ALIASES)
+
+
+def test_normalize_folds_width_case_and_punctuation():
+    assert normalize('ＳＨＩＢＡ　Ｉｎｕ') == 'shibainu'
+    assert normalize("Shih-Tzu (西施)") == 'shihtzu西施'
+
+
+def test_single_cjk_character_is_a_gram():
+    assert ngrams('柴') == {'柴': 1}
+    assert ngrams('x') == {'x': 1}
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('柴犬', '柴犬'),
+    ('shiba inu', '柴犬'),
+    ('ＧＯＬＤＥＮ　ＲＥＴＲＩＥＶＥＲ', '黃金獵犬'),
+    ('黃金', '黃金獵犬'),
+    ('chihuahau', '吉娃娃'),    # 拼錯
+    ('柴', '柴犬'),
+])
+def test_best_match(index, query, expected):
+    assert index.search(query)[0][0] == expected
+
+
+def test_exact_alias_scores_one_and_partial_names_list_all_candidates(index):
+    assert index.search('Golden Retriever')[0] == ('黃金獵犬', 1.0)
+    assert {name for name, _ in index.search('貴賓')} == {'玩具貴賓犬', '巨型貴賓犬'}
+
+
+def test_limit_min_score_and_no_match(index):
+    assert len(index.search('retriever', limit=1)) == 1
+    assert index.search('xyz') == []
+    assert index.search('  ') == []
+    assert all(score >= 0.6 for _, score in index.search('retriever', min_score=0.6))
@@ -0,0 +1,36 @@
+import pytest
+import daily_calories
+
+np = pytest.importorskip('numpy')
+
+
+def test_exact_batch_matches_scalar_bit_for_bit():
+    rng = np.random.default_rng(1)
+    weights = rng.uniform(0.5, 90.0, 2000)
+    codes = rng.integers(-1, len(daily_calories.STATUSES) + 3, 2000)   # 含無效編號
+    batch = daily_calories.calculate_targets_batch(weights, codes)
+    for i, (weight, code) in enumerate(zip(weights.tolist(), codes.tolist())):
+        expected = daily_calories.calculate_targets(weight, code)
+        assert {key: batch[key][i] for key in expected} == expected
+
+
+def test_fast_batch_is_close_to_scalar():
+    weights = np.linspace(0.5, 90.0, 500)
+    codes = np.full(500, 3)
+    exact = daily_calories.calculate_targets_batch(weights, codes)
+    fast = daily_calories.calculate_targets_batch(weights, codes, exact=False)
+    for key in exact:
+        np.testing.assert_allclose(fast[key], exact[key], rtol=1e-12)
+
+
+def test_invalid_status_codes_use_default_af():
+    af_min, af_max = daily_calories.get_AF_for_status_batch([0, 1, 13, 14, -5])
+    assert af_min.tolist() == [1.6, 2.5, 1.0, 1.6, 1.6]
+    assert af_max.tolist() == [1.8, 3.0, 1.5, 1.8, 1.8]
+    assert (1.6, 1.8) == daily_calories.get_AF_for_status('99') == daily_calories.DEFAULT_AF
+
+
+def test_benchmark_reports_no_exact_mismatches():
+    report = daily_calories.benchmark(count=2000)
+    assert report['dogs'] == 2000
+    assert report['exact_mismatches'] == 0
@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from linebot.v3.messaging import Configuration
+import daily_summary
+import dog_storage
+from line_client import LineApiClient
+
+
+class LineStandIn(BaseHTTPRequestHandler):
+    """本機的 LINE Messaging API 替身：記錄收到的 push / multicast，重複的 retry key 回 409"""
+    server_version = "LineStandIn"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            if server.fail_after is not None and len(server.calls) >= server.fail_after:
+                status = 500
+            elif self.headers.get('X-Line-Retry-Key') in server.retry_keys:
+                status = 409
+            else:
+                status = 200
+                server.retry_keys.add(self.headers.get('X-Line-Retry-Key'))
+                server.calls.append((self.path, body))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        if status != 200:
+            self.wfile.write(b'{"message": "error"}')
+        elif self.path.endswith('/push'):
+            self.wfile.write(b'{"sentMessages": [{"id": "1", "quoteToken": "q"}]}')
+        else:
+            self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def line_api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), LineStandIn)
+    server.lock = threading.Lock()
+    server.calls = []
+    server.retry_keys = set()
+    server.fail_after = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = LineApiClient(Configuration(access_token='test', host=f"http://127.0.0.1:{server.server_port}"), max_retries=0)
+    yield server, client
+    client.close()
+    server.shutdown()
+
+
+def recipients(calls):
+    return sorted(user for _, body in calls for user in body.get('to') if isinstance(body.get('to'), list)) + \
+        sorted(body['to'] for _, body in calls if isinstance(body.get('to'), str))
+
+
+def test_plan_batches_groups_identical_text_and_caps_recipients():
+    messages = [(f"U{i:04d}", 'same') for i in range(1203)] + [('U9999', 'other')]
+    batches = daily_summary.plan_batches(reversed(messages), max_recipients=500)
+    assert [(text, len(users)) for text, users in batches] == [('other', 1), ('same', 500), ('same', 500), ('same', 203)]
+    assert batches[1][1][0] == 'U0000'
+    # 重新規劃會得到相同的批次（續傳與 retry key 依賴這點）
+    assert daily_summary.plan_batches(messages, 500) == batches
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = daily_summary.RateLimiter(50)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+    assert daily_summary.RateLimiter(0).interval == 0
+
+
+def test_checkpoint_resume_after_partial_send(db_path, line_api, tmp_path):
+    server, client = line_api
+    for i in range(5):
+        dog_storage.create_dog(f"U{i}", f"Dog{i}", '2020-01-01', 5 + i, '柴犬', '結紮成年犬(1-7歲)').result()
+    checkpoint = str(tmp_path / 'checkpoint.json')
+
+    server.fail_after = 2
+    first = daily_summary.run_daily_summary(client, '2024-03-04', checkpoint, rps=0)
+    assert (first['sent_batches'], first['failed_batches']) == (2, 3)
+    sent_first = recipients(server.calls)
+    with open(checkpoint, encoding='utf-8') as f:
+        assert json.load(f) == {'date': '2024-03-04', 'sent': sent_first}
+
+    server.fail_after = None
+    second = daily_summary.run_daily_summary(client, '2024-03-04', checkpoint, rps=0)
+    assert second['skipped_users'] == 2 and second['failed_batches'] == 0
+    assert recipients(server.calls) == [f"U{i}" for i in range(5)]
+
+
+def test_already_accepted_batch_counts_as_sent(db_path, line_api):
+    server, client = line_api
+    dog_storage.create_dog('U1', 'Lucky', '2020-01-01', 10, '柴犬', '結紮成年犬(1-7歲)').result()
+    daily_summary.run_daily_summary(client, '2024-03-04', rps=0)
+    again = daily_summary.run_daily_summary(client, '2024-03-04', rps=0)
+    assert again['sent_batches'] == 1
+    assert len(server.calls) == 1
+
+
+def test_summary_uses_record_timezone(db_path, monkeypatch):
+    dog_storage.create_dog('U1', 'Lucky', '2020-01-01', 10, '柴犬', '結紮成年犬(1-7歲)').result()
+    monkeypatch.setattr(dog_storage, 'RECORD_TZ', 'Pacific/Kiritimati')
+    dog_storage.record_intake('U1', 'Lucky', 300, 100)
+    result = daily_summary.run_daily_summary(None, checkpoint_path=None, dry_run=True)
+    assert result['date'] == dog_storage.today()
+    (user_id, dogs), = daily_summary.collect_summaries(result['date'])
+    assert dogs[0][1:3] == (300, 100)
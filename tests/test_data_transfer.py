@@ -0,0 +1,34 @@
+import pytest
+import data_transfer
+import dog_storage
+
+RECORDS = [
+    {'table': 'dogs', 'user_id': 'U1', 'name': 'Lucky', 'birthday': '2020-01-01', 'weight': 10,
+     'breed': '柴犬', 'status': '結紮成年犬(1-7歲)'},
+    {'table': 'daily_records', 'user_id': 'U1', 'name': 'Lucky', 'date': '2024-03-04', 'calories': 500, 'water': 300},
+    {'table': 'daily_records', 'user_id': 'U1', 'name': 'Lucky', 'date': '2024-03-05', 'calories': 400, 'water': 200},
+]
+
+
+def crash_after(records, count):
+    for index, record in enumerate(records):
+        if index == count:
+            raise ConnectionError("client disconnected")
+        yield record
+
+
+def test_resumed_import_rebuilds_rollups_and_targets(db_path):
+    with pytest.raises(ConnectionError):
+        data_transfer.import_records(crash_after(RECORDS, 2), chunk_size=2)
+    assert data_transfer.import_records(iter(RECORDS), chunk_size=2, skip=2) == 3
+
+    targets = dog_storage.get_dog_targets('U1', 'Lucky')
+    assert targets is not None and targets['der_max'] is not None
+    history = dog_storage.get_intake_history('U1', 'Lucky', '2024-03-04', '2024-03-05', 'week')
+    assert [row[1:] for row in history] == [(900, 500, 2)]
+
+
+def test_missing_key_column_is_reported(db_path):
+    bad = dict(RECORDS[1], name=None)
+    with pytest.raises(ValueError, match="name in record 2"):
+        data_transfer.import_records(iter([RECORDS[0], bad]))
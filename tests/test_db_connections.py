@@ -0,0 +1,71 @@
+import gc
+import threading
+import time
+from db_connections import ConnectionManager
+
+
+def test_thread_exit_closes_connections(tmp_path):
+    manager = ConnectionManager(pragmas=[])
+
+    def work():
+        manager.get(str(tmp_path / 'a.db')).execute("SELECT 1")
+        manager.get(str(tmp_path / 'b.db')).execute("SELECT 1")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+
+    stats = manager.stats()
+    assert stats['open_connections'] == 0
+    assert stats['thread_exits'] == 4
+
+
+def test_sweeper_closes_idle_connections(tmp_path):
+    manager = ConnectionManager(idle_timeout=0.2, pragmas=[], sweep_interval=0.05)
+    manager.get(str(tmp_path / 'a.db')).execute("SELECT 1")
+    assert manager.stats()['open_connections'] == 1
+
+    deadline = time.monotonic() + 5
+    while manager.stats()['open_connections'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert manager.stats()['open_connections'] == 0
+    assert manager.stats()['idle_closed'] == 1
+
+    # 被關閉後再次取用會重新建立連線
+    manager.get(str(tmp_path / 'a.db')).execute("SELECT 1")
+    assert manager.stats()['misses'] == 2
+
+
+def test_reuses_connection_within_thread(tmp_path):
+    manager = ConnectionManager(pragmas=[])
+    assert manager.get(str(tmp_path / 'a.db')) is manager.get(str(tmp_path / 'a.db'))
+    assert manager.stats()['hits'] == 1
+
+
+def test_checked_out_connection_survives_idle_timeout(tmp_path):
+    manager = ConnectionManager(idle_timeout=0.2, pragmas=[], sweep_interval=0.05)
+    with manager.checkout(str(tmp_path / 'a.db')) as conn:
+        conn.execute("CREATE TABLE t (x)")
+        time.sleep(0.6)
+        conn.execute("INSERT INTO t VALUES (1)")
+        assert manager.stats()['idle_closed'] == 0
+
+    # 歸還後以歸還時間重新計算閒置，之後照常被清理
+    deadline = time.monotonic() + 5
+    while manager.stats()['open_connections'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert manager.stats()['idle_closed'] == 1
+
+
+def test_checked_out_connection_is_not_evicted(tmp_path):
+    manager = ConnectionManager(max_per_thread=1, pragmas=[])
+    with manager.checkout(str(tmp_path / 'a.db')) as conn:
+        manager.get(str(tmp_path / 'b.db')).execute("SELECT 1")
+        conn.execute("SELECT 1")
+        assert manager.stats()['evictions'] == 0
+    manager.get(str(tmp_path / 'c.db'))
+    assert manager.stats()['evictions'] == 2
+    assert manager.stats()['open_connections'] == 1
@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+import pytest
+import daily_calories
+import db_migrations
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    db_migrations.reset_cache()
+    yield
+    db_migrations.reset_cache()
+
+
+def columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def test_new_database_is_migrated_once(tmp_path):
+    path = str(tmp_path / 'dogs.db')
+    conn = sqlite3.connect(path)
+    assert db_migrations.ensure_schema(conn, path) == db_migrations.HEAD_VERSION
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == db_migrations.HEAD_VERSION
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert db_migrations.ensure_schema(conn, path) == 0
+    assert statements == []
+
+    # 其他程序（快取為空）看到的已是最新版本，不會重跑遷移
+    db_migrations.reset_cache()
+    assert db_migrations.ensure_schema(conn, path) == 0
+
+
+def test_legacy_database_is_upgraded_in_place(tmp_path):
+    path = str(tmp_path / 'dogs.db')
+    conn = sqlite3.connect(path)
+    # 導入版本號之前的資料庫：user_version 為 0、已有 status 欄位但沒有事件與彙總表
+    conn.executescript('''
+        CREATE TABLE dogs (user_id TEXT NOT NULL, name TEXT NOT NULL, birthday TEXT, weight REAL, status TEXT,
+                           PRIMARY KEY (user_id, name));
+        CREATE TABLE daily_records (user_id TEXT NOT NULL, name TEXT NOT NULL, date TEXT NOT NULL, calories REAL, water REAL,
+                                    PRIMARY KEY (user_id, name, date));
+        INSERT INTO dogs VALUES ('U1', 'Lucky', '2020-01-01', 10, '結紮成年犬(1-7歲)');
+        INSERT INTO daily_records VALUES ('U1', 'Lucky', '2024-03-04', 500, 300), ('U1', 'Lucky', '2024-03-05', 400, NULL);
+    ''')
+    assert db_migrations.ensure_schema(conn, path) == db_migrations.HEAD_VERSION
+
+    assert 'breed' in columns(conn, 'dogs')
+    assert set(db_migrations.TARGET_COLUMNS) <= set(columns(conn, 'dogs'))
+    der_max, = conn.execute("SELECT der_max FROM dogs").fetchone()
+    assert der_max == daily_calories.calculate_targets(10, 3)['der_max']
+    assert conn.execute("SELECT COUNT(*), SUM(calories) FROM intake_events WHERE source = 'migrated'").fetchone() == (2, 900)
+    assert conn.execute("SELECT week, calories, water, days FROM weekly_records").fetchall() == [('2024-03-04', 900, 300, 2)]
+    assert conn.execute("SELECT month, days FROM monthly_records").fetchall() == [('2024-03', 2)]
+
+
+def test_concurrent_processes_migrate_once(tmp_path):
+    path = str(tmp_path / 'dogs.db')
+    barrier = threading.Barrier(4)
+    applied = []
+
+    def start_process():
+        conn = sqlite3.connect(path, timeout=10)
+        barrier.wait()
+        applied.append(db_migrations.migrate(conn))
+        conn.close()
+
+    threads = [threading.Thread(target=start_process) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(applied) == [0, 0, 0, db_migrations.HEAD_VERSION]
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    def broken(conn):
+        raise RuntimeError("broken migration")
+
+    monkeypatch.setattr(db_migrations, 'MIGRATIONS', db_migrations.MIGRATIONS[:-1] + [broken])
+    path = str(tmp_path / 'dogs.db')
+    conn = sqlite3.connect(path)
+    with pytest.raises(RuntimeError):
+        db_migrations.ensure_schema(conn, path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    assert columns(conn, 'dogs') == []
+    assert path not in db_migrations._at_head
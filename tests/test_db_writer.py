@@ -0,0 +1,74 @@
+import sqlite3
+import pytest
+from db_writer import WriteBehindQueue
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'writes.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x INTEGER PRIMARY KEY)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def insert(conn, x):
+    conn.execute("INSERT INTO t (x) VALUES (?)", (x,))
+    return x
+
+
+def insert_then_fail(conn, x):
+    conn.execute("INSERT INTO t (x) VALUES (?)", (x,))
+    raise ValueError("boom")
+
+
+def rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [x for x, in conn.execute("SELECT x FROM t ORDER BY x")]
+    finally:
+        conn.close()
+
+
+def test_writes_are_group_committed(db):
+    writer = WriteBehindQueue(db, batch_ms=500, batch_size=20)
+    futures = [writer.submit(insert, x) for x in range(50)]
+    assert [future.result(5) for future in futures] == list(range(50))
+    writer.shutdown()
+
+    stats = writer.stats()
+    assert stats['writes'] == 50
+    assert stats['max_batch_size'] == 20
+    assert stats['batches'] <= 4
+    assert rows(db) == list(range(50))
+
+
+def test_failed_write_is_rolled_back_alone(db):
+    writer = WriteBehindQueue(db, batch_ms=500)
+    futures = [writer.submit(insert, 1), writer.submit(insert_then_fail, 2),
+               writer.submit(insert, 1), writer.submit(insert, 3)]
+    assert futures[0].result(5) == 1
+    with pytest.raises(ValueError, match="boom"):
+        futures[1].result(5)
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[2].result(5)
+    assert futures[3].result(5) == 3
+    writer.shutdown()
+
+    assert rows(db) == [1, 3]
+    stats = writer.stats()
+    assert stats['batches'] == 1
+    assert stats['failed_writes'] == 2
+
+
+def test_shutdown_commits_pending_writes(db):
+    # batch_ms 很長：沒有 shutdown 的話這批要等 10 秒才提交
+    writer = WriteBehindQueue(db, batch_ms=10000)
+    futures = [writer.submit(insert, x) for x in range(5)]
+    writer.shutdown()
+    assert all(future.done() for future in futures)
+    assert rows(db) == list(range(5))
+
+    with pytest.raises(RuntimeError):
+        writer.submit(insert, 9).result(1)
@@ -0,0 +1,54 @@
+import sqlite3
+import threading
+import pytest
+import daily_calories
+import dog_storage
+from db_writer import WriteBehindQueue
+
+
+def test_concurrent_intake_counts_one_day(db_path):
+    dog_storage.create_dog('U1', 'Lucky', '2020-01-01', 10, '柴犬', '結紮成年犬(1-7歲)')
+    barrier = threading.Barrier(8)
+
+    def record():
+        barrier.wait()
+        dog_storage.record_intake('U1', 'Lucky', 100, 50)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    today = dog_storage.today()
+    assert dog_storage.get_daily_record('U1', 'Lucky') == (800, 400)
+    for granularity in ('week', 'month'):
+        (_, calories, water, days), = dog_storage.get_intake_history('U1', 'Lucky', today, today, granularity)
+        assert (calories, water, days) == (800, 400, 1)
+
+
+def test_batched_write_errors_reach_the_caller(db_path, monkeypatch):
+    writer = WriteBehindQueue(db_path, batch_ms=5)
+    monkeypatch.setattr(dog_storage, 'writer', writer)
+    dog_storage.save_dog_data('U1', 'Lucky', '2020-01-01', 10)
+    with pytest.raises(sqlite3.IntegrityError):
+        dog_storage.create_dog('U1', 'Lucky', '2020-01-01', 10, None, None)
+    dog_storage.record_intake('U1', 'Lucky', 100, 50)
+    writer.shutdown()
+    assert dog_storage.get_daily_record('U1', 'Lucky') == (100, 50)
+
+
+def test_targets_are_stored_on_write_and_recomputed_on_edit(db_path):
+    status = '未結紮成年犬(1-7歲)'
+    created = dog_storage.create_dog('U1', 'Lucky', '2020-01-01', 10, '柴犬', status).result()
+    assert created == daily_calories.calculate_targets(10, daily_calories.STATUS_CODES[status])
+    assert dog_storage.get_dog_targets('U1', 'Lucky') == created
+
+    dog_storage.update_dog('U1', 'Lucky', 'Lucky', '2020-01-01', 12, '柴犬', '高齡犬')
+    assert dog_storage.get_dog_targets('U1', 'Lucky') == daily_calories.calculate_targets(12, 10)
+
+    # 沒有狀態（或狀態名稱不在清單中）時不儲存目標
+    dog_storage.save_dog_data('U1', 'Lucky', '2020-01-01', 12)
+    assert dog_storage.get_dog_targets('U1', 'Lucky') is None
+    dog_storage.update_dog('U1', 'Lucky', 'Lucky', '2020-01-01', 12, '柴犬', '不存在的狀態')
+    assert dog_storage.get_dog_targets('U1', 'Lucky') is None
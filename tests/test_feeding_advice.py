@@ -0,0 +1,97 @@
+import http.server
+import os
+import shutil
+import threading
+import pytest
+import Feeding_Advice
+from breed_repository import BREEDS_CSV, load_breeds
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'petmd')
+
+
+def read_page(slug):
+    with open(os.path.join(PAGES_DIR, slug + '.html'), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('parser', ['html.parser', Feeding_Advice.HTML_PARSER])
+def test_extract_breed_sections_stays_inside_article(parser):
+    sections = Feeding_Advice.extract_breed_sections(read_page('shiba-inu'), parser)
+    assert sections.what_to_feed == (
+        Feeding_Advice.SectionItem('paragraph', 'Feed your Shiba Inu a complete and balanced diet made for small breeds.'),
+        Feeding_Advice.SectionItem('list_item', 'High-quality animal protein'),
+        Feeding_Advice.SectionItem('list_item', 'Moderate fat'),
+    )
+    assert sections.texts()['how_to_feed'] == ['Adult Shibas do well with two meals a day.']
+    # 頁尾、側欄與巢狀在廣告區塊中的 <p> 都不屬於段落
+    assert sections.texts()['nutritional_tips'] == ['Omega-3 fatty acids support skin and coat health.']
+
+
+def test_extract_breed_sections_without_article_uses_heading_parent():
+    texts = Feeding_Advice.extract_breed_sections(read_page('beagle')).texts()
+    assert texts == {
+        'what_to_feed': ['Beagles should eat food made for medium-sized, active breeds.'],
+        'how_to_feed': ['Measure every meal; Beagles are prone to overeating.', 'Use a slow-feeder bowl',
+                        'Split food into two meals'],
+        'nutritional_tips': ['Count treats toward the daily calorie allowance.'],
+    }
+
+
+def test_extract_breed_sections_missing_heading():
+    assert Feeding_Advice.extract_breed_sections("<html><body><p>Not found</p></body></html>").texts() == {
+        'what_to_feed': [], 'how_to_feed': [], 'nutritional_tips': []}
+
+
+class SavedPageHandler(http.server.SimpleHTTPRequestHandler):
+    """以存檔的 petmd 頁面回應 /<slug>，支援 Last-Modified / If-Modified-Since"""
+
+    def translate_path(self, path):
+        return os.path.join(PAGES_DIR, path.strip('/') + '.html')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def petmd_server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), SavedPageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+@pytest.fixture
+def breeds_csv(tmp_path):
+    path = str(tmp_path / 'dog_breeds.csv')
+    shutil.copyfile(os.path.join(os.path.dirname(os.path.dirname(__file__)), BREEDS_CSV), path)
+    return path
+
+
+def test_ingest_writes_rows_from_saved_pages(petmd_server, breeds_csv, tmp_path):
+    before = load_breeds(breeds_csv)
+    result = Feeding_Advice.ingest_breeds(['柴犬', '米格魯', '柯基'], breeds_csv, petmd_server, max_workers=3,
+                                          translator=False, cache_dir=str(tmp_path / 'cache'), force=True)
+    assert sorted(result['updated']) == ['柴犬', '米格魯']
+    assert result['failed'] == ['柯基']  # 沒有存檔頁面，伺服器回 404
+
+    after = load_breeds(breeds_csv)
+    shiba = after['柴犬']
+    assert shiba.what_to_feed == ("Feed your Shiba Inu a complete and balanced diet made for small breeds.\n"
+                                  "High-quality animal protein\nModerate fat")
+    assert shiba.how_to_feed == "Adult Shibas do well with two meals a day."
+    assert shiba.nutritional_tips == "Omega-3 fatty acids support skin and coat health."
+    assert after['米格魯'].how_to_feed == ("Measure every meal; Beagles are prone to overeating.\n"
+                                           "Use a slow-feeder bowl\nSplit food into two meals")
+    # 其他欄位與其他品種不變
+    assert shiba.height == before['柴犬'].height
+    assert after['柯基'] == before['柯基']
+    assert list(after) == list(before)
+
+
+def test_ingest_skips_unchanged_pages(petmd_server, breeds_csv, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    Feeding_Advice.ingest_breeds(['柴犬'], breeds_csv, petmd_server, translator=False, cache_dir=cache_dir, force=True)
+    result = Feeding_Advice.ingest_breeds(['柴犬'], breeds_csv, petmd_server, translator=False, cache_dir=cache_dir)
+    assert result['unchanged'] == ['柴犬']
+    assert result['http']['not_modified'] == 1
@@ -0,0 +1,128 @@
+import io
+import sys
+import pytest
+from PIL import ImageEnhance
+import ocr_cache
+import packageOCR
+from fakes import OCR_EXPECTED, OCR_FIXTURES_DIR, OCR_LABELS, RecordedVisionClient, read_ocr_fixture
+from ocr_cache import OcrResultCache
+
+sys.path.insert(0, OCR_FIXTURES_DIR)
+from make_labels import LABELS as LABEL_SPECS, make_label  # noqa: E402
+
+SIZE = (1836, 2448)  # 標示寬度要放得下最長的一行
+
+
+def encode(image, quality=88):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def label_with(replacements=(), seed=0):
+    """label_a 的縮小版；replacements 為要替換的文字（例如只改一個數字）"""
+    lines = LABEL_SPECS['label_a.jpg']['lines']
+    for old, new in replacements:
+        lines = [line.replace(old, new) for line in lines]
+    return make_label(SIZE, LABEL_SPECS['label_a.jpg']['angle'], lines, seed), "\n".join(lines)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return OcrResultCache(str(tmp_path / 'ocr_cache.db'), audit_rate=0)
+
+
+def extract(content, text, cache):
+    client = RecordedVisionClient(text)
+    return packageOCR.extract_nutrition_info(content, client, cache=cache), client
+
+
+def test_same_photo_re_encoded_or_resized_is_served_from_cache(cache):
+    image, text = label_with()
+    first, client = extract(encode(image), text, cache)
+    assert client.images
+
+    variants = [encode(image, quality=60), encode(image.resize((918, 1224))),
+                encode(ImageEnhance.Brightness(image).enhance(1.1))]
+    for content in variants:
+        cached, client = extract(content, text, cache)
+        assert cached == first
+        assert client.images == []
+    stats = cache.stats()
+    assert stats['near_hits'] == 3
+    assert stats['misses'] == 1
+
+
+@pytest.mark.parametrize('replacement', [("26%", "28%"), ("15%", "16%"), ("3800", "3900"), ("10%", "12%")])
+def test_label_differing_only_in_numbers_is_not_served(cache, replacement):
+    image, text = label_with()
+    extract(encode(image), text, cache)
+    changed, changed_text = label_with([replacement])
+    # dHash 分不出只差數字的標示，會被列為候選
+    distance = ocr_cache.hamming_distance(ocr_cache.fingerprint(encode(changed)).dhash,
+                                          ocr_cache.fingerprint(encode(image)).dhash)
+    assert distance <= cache.max_distance
+
+    nutrition_info, client = extract(encode(changed), changed_text, cache)
+    assert len(client.images) == 1
+    assert replacement[1].rstrip('%') in nutrition_info.values()
+    stats = cache.stats()
+    assert stats['rejected_candidates'] == 1
+    assert stats['hits'] == 0
+
+
+def test_exact_hit_skips_preprocessing(cache, monkeypatch):
+    content = read_ocr_fixture('label_a.jpg')
+    extract(content, OCR_LABELS['label_a.jpg']['text'], cache)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("prepare_image should not run on a cache hit")
+
+    monkeypatch.setattr(packageOCR, 'prepare_image', fail)
+    nutrition_info, client = extract(content, OCR_LABELS['label_a.jpg']['text'], cache)
+    assert nutrition_info == OCR_EXPECTED['label_a.jpg']
+    assert client.images == []
+    assert cache.stats()['exact_hits'] == 1
+
+
+def test_entries_persist_and_least_recently_used_are_evicted(tmp_path):
+    path = str(tmp_path / 'ocr_cache.db')
+    cache = OcrResultCache(path, capacity=2, audit_rate=0)
+    images = [label_with(seed=seed) for seed in range(3)]
+    for image, text in images[:2]:
+        extract(encode(image), text, cache)
+    extract(encode(images[0][0]), images[0][1], cache)  # 第一張變成最近用過
+    extract(encode(images[2][0]), images[2][1], cache)
+    assert cache.stats()['evictions'] == 1
+
+    reopened = OcrResultCache(path, capacity=2, audit_rate=0)
+    assert reopened.stats()['entries'] == 2
+    _, client = extract(encode(images[0][0]), images[0][1], reopened)
+    assert client.images == []
+    _, client = extract(encode(images[1][0]), images[1][1], reopened)
+    assert len(client.images) == 1
+
+
+def test_audit_replaces_false_match(tmp_path):
+    cache = OcrResultCache(str(tmp_path / 'ocr_cache.db'), audit_rate=1)
+    image, text = label_with()
+    content = encode(image)
+    extract(content, text, cache)
+    fresh, client = extract(content, text.replace("3800", "3600"), cache)
+    assert fresh['熱量'] == '3600'
+    stats = cache.stats()
+    assert stats['audits'] == 1
+    assert stats['false_matches'] == 1
+    assert stats['recent_false_matches'][0]['cached']['熱量'] == '3800'
+
+    cache.audit_rate = 0
+    cached, client = extract(content, text, cache)
+    assert cached['熱量'] == '3600'
+    assert client.images == []
+
+
+def test_undecodable_image_only_matches_exact_bytes(cache):
+    assert ocr_cache.fingerprint(b'not an image').dhash is None
+    cache.put(ocr_cache.fingerprint(b'not an image'), {'熱量': '1'})
+    assert cache.lookup(ocr_cache.fingerprint(b'not an image'))[2] == {'熱量': '1'}
+    assert cache.lookup(ocr_cache.fingerprint(b'still not an image'))[0] is None
@@ -0,0 +1,47 @@
+import io
+import pytest
+from PIL import Image
+import packageOCR
+from fakes import OCR_LABELS, RecordedVisionClient, read_ocr_fixture
+from ocr_image import DEFAULT_IMAGE_OPTIONS, ImageOptions, prepare_image
+
+# 縮小後標示文字的最小高度（像素）；低於此高度 Vision 容易辨識錯誤
+MIN_TEXT_HEIGHT = 20
+
+
+# RecordedVisionClient 不看圖片內容，這裡只驗證送出的是哪份圖片；
+# 處理後文字是否仍可辨識由下方的文字高度檢查把關，實際辨識結果請用 packageOCR.py --compare 比較
+@pytest.mark.parametrize('name', sorted(OCR_LABELS))
+def test_vision_receives_prepared_image(name):
+    content = read_ocr_fixture(name)
+    client = RecordedVisionClient(OCR_LABELS[name]['text'])
+    packageOCR.extract_nutrition_info(content, client, image_options=None)
+    packageOCR.extract_nutrition_info(content, client)
+    original, prepared = client.images
+    assert original == content
+    assert len(prepared) < len(content)
+    assert prepared == prepare_image(content).content
+
+
+@pytest.mark.parametrize('name', sorted(OCR_LABELS))
+@pytest.mark.parametrize('options', [DEFAULT_IMAGE_OPTIONS, ImageOptions(grayscale=True, enhance_contrast=True),
+                                     ImageOptions(max_side=1024, quality=75)])
+def test_prepare_image_shrinks_and_keeps_text_legible(name, options):
+    content = read_ocr_fixture(name)
+    prepared = prepare_image(content, options)
+    assert len(prepared.content) < len(content)
+    assert max(prepared.size) <= options.max_side
+    scale = max(prepared.size) / max(prepared.original_size)
+    assert OCR_LABELS[name]['text_height'] * scale >= MIN_TEXT_HEIGHT
+    decoded = Image.open(io.BytesIO(prepared.content))
+    assert decoded.size == prepared.size
+    assert decoded.mode == ('L' if options.grayscale else 'RGB')
+
+
+def test_small_or_invalid_images_are_not_enlarged():
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 480), 'white').save(buffer, format='JPEG', quality=60)
+    prepared = prepare_image(buffer.getvalue())
+    assert prepared.size == (640, 480)
+    assert len(prepared.content) <= len(buffer.getvalue())
+    assert prepare_image(b'not an image').content == b'not an image'
@@ -0,0 +1,85 @@
+import threading
+import time
+import pytest
+from conversation import ConversationContext
+from state_store import MemoryStateStore, SqliteStateStore, StateStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'sqlite':
+        return SqliteStateStore(str(tmp_path / 'states.db'), ttl=60)
+    return MemoryStateStore(ttl=60)
+
+
+def test_state_store_is_abstract():
+    with pytest.raises(TypeError):
+        StateStore()
+
+
+def test_compare_and_set_checks_current_step(store):
+    assert store.compare_and_set_step('U1', None, {'step': 'a', 'data': [1]})
+    assert not store.compare_and_set_step('U1', None, {'step': 'b'})
+    assert not store.compare_and_set_step('U1', 'b', None)
+    assert store.get('U1') == {'step': 'a', 'data': [1]}
+
+    assert store.compare_and_set_step('U1', 'a', {'step': 'b'})
+    assert store.compare_and_set_step('U1', 'b', None)
+    assert store.get('U1') is None
+
+
+def test_only_one_concurrent_claim_wins(store):
+    store.set('U1', {'step': 'awaiting_save_confirmation'})
+    barrier = threading.Barrier(8)
+    results = []
+
+    def claim():
+        ctx = ConversationContext(None, store, None, 'U1', 'Y', store.get('U1'), None)
+        barrier.wait()
+        results.append(ctx.claim())
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [False] * 7 + [True]
+    assert store.get('U1') is None
+
+
+def test_expired_state_is_gone(tmp_path):
+    for store in (MemoryStateStore(ttl=0.05), SqliteStateStore(str(tmp_path / 'states.db'), ttl=0.05)):
+        store.set('U1', {'step': 'a'})
+        assert store.get('U1') == {'step': 'a'}
+        time.sleep(0.1)
+        assert store.get('U1') is None
+        # 過期的狀態等同沒有狀態，可以重新搶下
+        assert store.compare_and_set_step('U1', None, {'step': 'b'})
+    time.sleep(0.1)
+    assert store.purge_expired() == 1
+    assert store.stats()['entries'] == 0
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryStateStore(max_entries=2, ttl=60)
+    store.set('U1', {'step': 'a'})
+    store.set('U2', {'step': 'b'})
+    store.get('U1')
+    store.set('U3', {'step': 'c'})
+    assert store.get('U2') is None
+    assert store.get('U1') == {'step': 'a'}
+    assert store.stats()['evicted'] == 1
+
+
+def test_memory_store_counts_expired():
+    store = MemoryStateStore(ttl=0.05)
+    store.set('U1', {'step': 'a'})
+    time.sleep(0.1)
+    assert store.get('U1') is None
+    assert store.stats() == {'backend': 'memory', 'entries': 0, 'evicted': 0, 'expired': 1}
+
+
+def test_returned_state_is_a_copy(store):
+    store.set('U1', {'step': 'a'})
+    store.get('U1')['step'] = 'changed'
+    assert store.get('U1') == {'step': 'a'}
@@ -0,0 +1,49 @@
+import pytest
+from fakes import FakeTranslateClient
+from translation_memory import TranslationMemory
+
+
+@pytest.fixture
+def client():
+    return FakeTranslateClient()
+
+
+@pytest.fixture
+def memory(tmp_path, client):
+    return TranslationMemory(client, db_path=str(tmp_path / 'tm.db'))
+
+
+def test_misses_are_translated_in_one_batched_call(memory, client):
+    texts = ['Feed twice a day.', 'Protein', 'Feed twice a day.', '', 'Fat']
+    assert memory.translate_many(texts) == [
+        '[zh-TW] Feed twice a day.', '[zh-TW] Protein', '[zh-TW] Feed twice a day.', '', '[zh-TW] Fat']
+    # 重複的原文只送一次，空字串不送
+    assert client.calls == [3]
+    stats = memory.stats()
+    assert (stats['hits'], stats['misses'], stats['api_calls']) == (1, 3, 1)
+    assert stats['translated_characters'] == len('Feed twice a day.') + len('Protein') + len('Fat')
+
+
+def test_second_run_is_served_from_memory(memory, client):
+    memory.translate_many(['Protein', 'Fat'])
+    assert memory.translate_many(['Protein', 'Fat', 'Fiber']) == ['[zh-TW] Protein', '[zh-TW] Fat', '[zh-TW] Fiber']
+    assert client.calls == [2, 1]
+    stats = memory.stats()
+    assert (stats['hits'], stats['misses']) == (2, 3)
+    assert stats['hit_rate'] == 0.4
+    assert stats['saved_characters'] == len('Protein') + len('Fat')
+
+
+def test_memory_persists_across_instances(tmp_path, client):
+    path = str(tmp_path / 'tm.db')
+    TranslationMemory(client, db_path=path).translate('Protein')
+    reopened = TranslationMemory(client, db_path=path)
+    assert reopened.translate('Protein') == '[zh-TW] Protein'
+    assert client.calls == [1]
+    assert reopened.stats()['hit_rate'] == 1.0
+
+
+def test_batches_respect_size_and_character_limits(tmp_path, client):
+    memory = TranslationMemory(client, db_path=str(tmp_path / 'tm.db'), batch_size=2, max_batch_chars=10)
+    memory.translate_many(['aaaa', 'bbbb', 'cccc', 'dddddddd', 'e'])
+    assert client.calls == [2, 1, 2]
@@ -0,0 +1,159 @@
+import base64
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import types
+import pytest
+from linebot.v3.webhooks import MessageEvent, TextMessageContent, FollowEvent
+from webhook_worker import DispatchingWebhookHandler, WebhookWorkerPool, partition_by_user
+
+
+def make_event(user_id, seq):
+    return types.SimpleNamespace(source=types.SimpleNamespace(user_id=user_id), seq=seq)
+
+
+def users_on_distinct_workers(pool, count):
+    """找出分配到不同工作執行緒的使用者（hash() 每次執行結果不同）"""
+    users, shards = [], set()
+    for i in range(1000):
+        user_id = f"U{i}"
+        if pool._shard(user_id) not in shards:
+            shards.add(pool._shard(user_id))
+            users.append(user_id)
+        if len(users) == count:
+            return users
+    raise AssertionError("not enough distinct shards")
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(dispatch, **kwargs):
+        pool = WebhookWorkerPool(dispatch, **kwargs)
+        pool.start()
+        pools.append(pool)
+        return pool
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_partition_keeps_order_per_user():
+    events = [make_event(user, seq) for seq, user in enumerate(['A', 'B', 'A', None, 'B', 'A'])]
+    partitions = partition_by_user(events)
+    assert [e.seq for e in partitions['A']] == [0, 2, 5]
+    assert [e.seq for e in partitions['B']] == [1, 4]
+    assert [e.seq for e in partitions[None]] == [3]
+
+
+def test_each_user_is_handled_in_order_on_one_worker(make_pool):
+    handled = {}
+    lock = threading.Lock()
+
+    def dispatch(event):
+        time.sleep(random.random() / 1000)
+        with lock:
+            handled.setdefault(event.source.user_id, []).append((event.seq, threading.current_thread().name))
+
+    pool = make_pool(dispatch, num_workers=4)
+    users = [f"U{i}" for i in range(10)]
+    seq = 0
+    for _ in range(20):
+        events = []
+        for user_id in random.sample(users, 5):
+            events.append(make_event(user_id, seq))
+            seq += 1
+        assert pool.submit(events)
+    pool.shutdown()
+
+    assert sum(len(items) for items in handled.values()) == 100
+    for user_id, items in handled.items():
+        assert [s for s, _ in items] == sorted(s for s, _ in items)
+        assert {name for _, name in items} == {f"webhook-worker-{pool._shard(user_id)}"}
+
+
+def test_different_users_run_in_parallel(make_pool):
+    pool = WebhookWorkerPool(lambda event: None, num_workers=2)
+    first, second = users_on_distinct_workers(pool, 2)
+    barrier = threading.Barrier(2, timeout=5)
+    # 兩位使用者的事件必須同時在處理中，barrier 才會放行；依序處理時會逾時
+    pool = make_pool(lambda event: barrier.wait(), num_workers=2)
+    assert pool.submit([make_event(first, 0), make_event(second, 1)], wait=True)
+    assert pool.stats()['failed_events'] == 0
+
+
+def test_full_queue_rejects_whole_batch(make_pool):
+    release = threading.Event()
+    pool = make_pool(lambda event: release.wait(5), num_workers=1, max_queue_size=2)
+    assert pool.submit([make_event('A', 0)])
+    deadline = time.monotonic() + 5
+    while pool.stats()['queue_depth'] and time.monotonic() < deadline:
+        time.sleep(0.01)    # 等工作執行緒取走第一個分組
+
+    assert pool.submit([make_event('B', 1), make_event('C', 2)])
+    assert not pool.submit([make_event('D', 3)])
+    assert pool.stats()['rejected'] == 1
+    assert pool.stats()['queue_depth'] == 2
+    release.set()
+
+
+def test_wait_raises_first_handler_error(make_pool):
+    def dispatch(event):
+        if event.seq == 1:
+            raise ValueError("boom")
+
+    pool = make_pool(dispatch, num_workers=2)
+    with pytest.raises(ValueError, match="boom"):
+        pool.submit([make_event('A', 0), make_event('A', 1), make_event('A', 2)], wait=True)
+    stats = pool.stats()
+    assert (stats['processed_events'], stats['failed_events']) == (2, 1)
+    # 不等待時錯誤只記錄在統計中
+    assert pool.submit([make_event('A', 1)])
+
+
+def test_shutdown_drains_queued_work():
+    handled = []
+    pool = WebhookWorkerPool(lambda event: (time.sleep(0.001), handled.append(event.seq)), num_workers=2)
+    pool.start()
+    for seq in range(50):
+        assert pool.submit([make_event(f"U{seq % 7}", seq)])
+    pool.shutdown()
+    assert sorted(handled) == list(range(50))
+    assert pool.stats()['queue_depth'] == 0
+
+
+def signed(secret, payload):
+    body = json.dumps(payload)
+    signature = base64.b64encode(hmac.new(secret.encode(), body.encode(), hashlib.sha256).digest()).decode()
+    return body, signature
+
+
+def test_handler_parses_then_dispatches_by_message_type():
+    handler = DispatchingWebhookHandler('secret')
+    seen = []
+
+    @handler.add(MessageEvent, message=TextMessageContent)
+    def on_text(event):
+        seen.append(('text', event.message.text))
+
+    @handler.add(FollowEvent)
+    def on_follow(event):
+        seen.append(('follow', event.source.user_id))
+
+    base = {'mode': 'active', 'timestamp': 1, 'source': {'type': 'user', 'userId': 'U1'},
+            'webhookEventId': '01', 'deliveryContext': {'isRedelivery': False}, 'replyToken': 'r'}
+    body, signature = signed('secret', {'destination': 'U0', 'events': [
+        dict(base, type='message', message={'type': 'text', 'id': '1', 'quoteToken': 'q', 'text': '你好'}),
+        dict(base, type='follow', follow={'isUnblocked': False}),
+        dict(base, type='message', message={'type': 'sticker', 'id': '2', 'quoteToken': 'q',
+                                            'packageId': '1', 'stickerId': '1', 'stickerResourceType': 'STATIC'}),
+    ]})
+    events = handler.parse(body, signature)
+    assert len(events) == 3
+    for event in events:
+        handler.dispatch(event)
+    assert seen == [('text', '你好'), ('follow', 'U1')]
@@ -0,0 +1,132 @@
+import hashlib
+import threading
+from datetime import datetime
+from db_connections import connections
+
+# Google 翻譯 v2 單次請求最多的字串數與建議的字元數上限
+MAX_BATCH_SIZE = 128
+MAX_BATCH_CHARS = 30000
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class TranslationMemory:
+    """
+    以 SQLite 保存翻譯結果，鍵為 (原文的 SHA-256, 目標語言)
+    translate_many() 先查表，未命中的原文去除重複後分批送出多字串翻譯請求，
+    結果寫回資料表，下次重跑同一個品種時不必再付費翻譯相同的文字。
+    參數:
+        client: 具有 translate(values, target_language=...) 的翻譯客戶端（google translate_v2.Client 或 FakeTranslateClient）
+        db_path (str): SQLite 資料庫路徑
+        target_language (str): 目標語言
+        batch_size (int): 每次請求最多的字串數
+        max_batch_chars (int): 每次請求最多的字元數
+    """
+
+    def __init__(self, client, db_path='translation_memory.db', target_language='zh-TW',
+                 batch_size=MAX_BATCH_SIZE, max_batch_chars=MAX_BATCH_CHARS):
+        self.client = client
+        self.db_path = db_path
+        self.target_language = target_language
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_chars
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._saved_chars = 0
+        self._translated_chars = 0
+        self._api_calls = 0
+        conn = self._connect()
+        with conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS translations (
+                text_hash TEXT NOT NULL,
+                target_language TEXT NOT NULL,
+                source_text TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (text_hash, target_language)
+            )''')
+
+    def _connect(self):
+        return connections.get(self.db_path)
+
+    def _lookup(self, hashes):
+        found = {}
+        conn = self._connect()
+        hashes = list(hashes)
+        # SQLite 的參數數量有上限，分段查詢
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            rows = conn.execute(f"SELECT text_hash, translated_text FROM translations WHERE target_language = ? "
+                                f"AND text_hash IN ({', '.join('?' * len(chunk))})", [self.target_language] + chunk)
+            found.update(rows)
+        return found
+
+    def _batches(self, texts):
+        batch, chars = [], 0
+        for text in texts:
+            if batch and (len(batch) >= self.batch_size or chars + len(text) > self.max_batch_chars):
+                yield batch
+                batch, chars = [], 0
+            batch.append(text)
+            chars += len(text)
+        if batch:
+            yield batch
+
+    def translate_many(self, texts):
+        """
+        翻譯多段文字（空字串原樣返回）
+        參數:
+            texts (list): 原文
+        返回:
+            list: 與 texts 順序相同的譯文
+        """
+        keys = {text: text_hash(text) for text in texts if text}
+        found = self._lookup(set(keys.values()))
+        misses = [text for text, key in keys.items() if key not in found]
+
+        now = datetime.now().isoformat(timespec='seconds')
+        for batch in self._batches(misses):
+            results = self.client.translate(batch, target_language=self.target_language)
+            rows = []
+            for text, result in zip(batch, results):
+                found[keys[text]] = result['translatedText']
+                rows.append((keys[text], self.target_language, text, result['translatedText'], now))
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO translations (text_hash, target_language, source_text, translated_text, created_at) "
+                                 "VALUES (?, ?, ?, ?, ?)", rows)
+            with self._lock:
+                self._api_calls += 1
+                self._translated_chars += sum(len(text) for text in batch)
+
+        miss_set = set(misses)
+        with self._lock:
+            for text in texts:
+                if not text:
+                    continue
+                if text in miss_set:
+                    # 同一批中重複的原文只翻譯一次，之後的出現算命中
+                    miss_set.discard(text)
+                    self._misses += 1
+                else:
+                    self._hits += 1
+                    self._saved_chars += len(text)
+        return [found[keys[text]] if text else text for text in texts]
+
+    def translate(self, text):
+        return self.translate_many([text])[0]
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0,
+                'saved_characters': self._saved_chars,
+                'translated_characters': self._translated_chars,
+                'api_calls': self._api_calls,
+            }
@@ -0,0 +1,199 @@
+import logging
+import queue
+import threading
+import time
+from linebot.v3 import WebhookHandler
+from linebot.v3.webhooks import MessageEvent
+
+logger = logging.getLogger(__name__)
+
+
+class DispatchingWebhookHandler(WebhookHandler):
+    """
+    可逐一派送事件的 WebhookHandler
+    驗證簽章與派送分開進行，讓 /callback 只負責驗證後排入佇列，
+    由背景工作執行緒呼叫 dispatch() 執行已註冊的處理函數。
+    """
+
+    def __init__(self, channel_secret):
+        super().__init__(channel_secret)
+        self._routes = {}
+
+    def add(self, event, message=None):
+        register = super().add(event, message=message)
+
+        def decorator(func):
+            messages = message if isinstance(message, (list, tuple)) else [message]
+            for it in messages:
+                self._routes[(event, it)] = func
+            return register(func)
+        return decorator
+
+    def parse(self, body, signature):
+        """驗證簽章並解析出事件列表（簽章錯誤時拋出 InvalidSignatureError）"""
+        return self.parser.parse(body, signature, as_payload=True).events
+
+    def dispatch(self, event):
+        """依事件與訊息類型找出處理函數並執行"""
+        func = None
+        if isinstance(event, MessageEvent):
+            func = self._routes.get((event.__class__, event.message.__class__))
+        if func is None:
+            func = self._routes.get((event.__class__, None))
+        if func is None:
+            logger.info(f"No handler for {event.__class__.__name__}")
+            return
+        func(event)
+
+
+def partition_by_user(events):
+    """
+    依 event.source.user_id 將事件分組，保留每位使用者事件的原始順序
+    返回:
+        dict: {user_id: [event, ...]}（沒有 user_id 的事件歸在 None 之下）
+    """
+    partitions = {}
+    for event in events:
+        source = getattr(event, 'source', None)
+        user_id = getattr(source, 'user_id', None)
+        partitions.setdefault(user_id, []).append(event)
+    return partitions
+
+
+class _Batch:
+    """追蹤同一個 webhook body 的所有分組是否處理完成，並保留第一個處理失敗的例外"""
+
+    def __init__(self, pending):
+        self._pending = pending
+        self._lock = threading.Lock()
+        self.done = threading.Event()
+        self.error = None
+        if pending == 0:
+            self.done.set()
+
+    def fail(self, error):
+        with self._lock:
+            if self.error is None:
+                self.error = error
+
+    def finish_one(self):
+        with self._lock:
+            self._pending -= 1
+            if self._pending == 0:
+                self.done.set()
+
+
+class WebhookWorkerPool:
+    """
+    有上限的記憶體內工作佇列 + 固定數量的背景工作執行緒
+    同一個 webhook body 的事件依使用者分組，不同使用者的分組平行處理；
+    同一位使用者的事件固定送到同一個工作執行緒，因此會依序處理，
+    user_states 的步驟狀態不會因為平行處理而錯亂。
+    參數:
+        dispatch (callable): 處理單一事件的函數
+        num_workers (int): 工作執行緒數量
+        max_queue_size (int): 等待中的分組上限，超過時 submit() 會回傳 False
+    """
+
+    def __init__(self, dispatch, num_workers=4, max_queue_size=1000):
+        self.dispatch = dispatch
+        self.num_workers = num_workers
+        self.max_queue_size = max_queue_size
+        self._queues = [queue.Queue() for _ in range(num_workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._partitions = 0
+        self._processed = 0
+        self._failed = 0
+        self._waited = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def start(self):
+        for i, work_queue in enumerate(self._queues):
+            thread = threading.Thread(target=self._worker, args=(work_queue,), name=f"webhook-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _shard(self, user_id):
+        return hash(user_id) % self.num_workers
+
+    def submit(self, events, wait=False):
+        """
+        將同一個 webhook body 的事件依使用者分組後排入佇列
+        參數:
+            events (list): webhook 事件列表
+            wait (bool): 是否等到所有事件處理完才返回；有事件處理失敗時拋出第一個例外
+        返回:
+            bool: 佇列已滿時返回 False（整批都不會排入）
+        """
+        partitions = partition_by_user(events)
+        with self._lock:
+            if self._pending + len(partitions) > self.max_queue_size:
+                self._rejected += 1
+                return False
+            self._pending += len(partitions)
+            self._submitted += 1
+            self._partitions += len(partitions)
+
+        batch = _Batch(len(partitions))
+        enqueued_at = time.monotonic()
+        for user_id, user_events in partitions.items():
+            self._queues[self._shard(user_id)].put((enqueued_at, user_events, batch))
+        if wait:
+            batch.done.wait()
+            if batch.error is not None:
+                raise batch.error
+        return True
+
+    def _worker(self, work_queue):
+        while True:
+            job = work_queue.get()
+            if job is None:
+                break
+            enqueued_at, events, batch = job
+            waited = time.monotonic() - enqueued_at
+            with self._lock:
+                self._pending -= 1
+                self._waited += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            for event in events:
+                try:
+                    self.dispatch(event)
+                    with self._lock:
+                        self._processed += 1
+                except Exception as e:
+                    logger.exception("Error while handling webhook event")
+                    batch.fail(e)
+                    with self._lock:
+                        self._failed += 1
+            batch.finish_one()
+
+    def stats(self):
+        """回傳佇列深度、等待時間等統計資料"""
+        with self._lock:
+            return {
+                'queue_depth': self._pending,
+                'queue_depth_per_worker': [q.qsize() for q in self._queues],
+                'max_queue_size': self.max_queue_size,
+                'workers': self.num_workers,
+                'submitted': self._submitted,
+                'rejected': self._rejected,
+                'partitions': self._partitions,
+                'processed_events': self._processed,
+                'failed_events': self._failed,
+                'avg_wait_ms': round(self._wait_total / self._waited * 1000, 2) if self._waited else 0,
+                'max_wait_ms': round(self._wait_max * 1000, 2),
+            }
+
+    def shutdown(self, timeout=10):
+        """處理完佇列中剩餘的工作後停止所有工作執行緒"""
+        for work_queue in self._queues:
+            work_queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []